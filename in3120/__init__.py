@@ -3,18 +3,22 @@ from .tokenizer import SimpleTokenizer
 from .shinglegenerator import ShingleGenerator
 from .sieve import Sieve
 from .document import Document, InMemoryDocument
-from .corpus import Corpus, InMemoryCorpus
-from .dictionary import Dictionary, InMemoryDictionary
-from .posting import Posting
-from .postinglist import PostingList, InMemoryPostingList, CompressedInMemoryPostingList
-from .invertedindex import InvertedIndex, InMemoryInvertedIndex
+from .corpus import Corpus, InMemoryCorpus, StreamingCorpus, MemoryMappedCorpus
+from .dictionary import Dictionary, InMemoryDictionary, FrontCodedDictionary, PerfectHashDictionary
+from .posting import Posting, PositionalPosting
+from .postinglist import PostingList, InMemoryPostingList, CompressedInMemoryPostingList, CompressedInMemoryPositionalPostingList, BlockCompressedInMemoryPostingList
+from .invertedindex import InvertedIndex, InMemoryInvertedIndex, UpdatableInMemoryInvertedIndex, MemoryMappedInvertedIndex
 from .stringfinder import Trie, StringFinder
 from .suffixarray import SuffixArray
+from .fmindex import FMIndex
 from .postingsmerger import PostingsMerger
 from .simplesearchengine import SimpleSearchEngine
+from .phrasesearchengine import PhraseSearchEngine
 from .ranker import Ranker, SimpleRanker
 from .betterranker import BetterRanker
+from .bm25ranker import BM25Ranker
 from .naivebayesclassifier import NaiveBayesClassifier
+from .integercodec import IntegerCodec, EliasGammaCodec, EliasDeltaCodec, Simple8bCodec, PForDeltaCodec
 from .variablebytecodec import VariableByteCodec
 from .expressioncomposer import ExpressionComposer
 from .shallowcaseextractor import ShallowCaseExtractor
@@ -24,3 +28,4 @@ from .porterstemmer import PorterStemmer
 from .similaritysearchengine import SimilaritySearchEngine
 from .edittable import EditTable
 from .editsearchengine import EditSearchEngine
+from .resultcache import ResultCache
@@ -6,6 +6,9 @@ from .corpus import Corpus
 from .posting import Posting
 from .invertedindex import InvertedIndex
 import math
+import numpy as np
+from array import array
+from typing import Dict, List, Tuple
 
 
 class BetterRanker(Ranker):
@@ -17,6 +20,11 @@ class BetterRanker(Ranker):
     "static_quality_score". If the field is missing or doesn't have a value, a
     default value of 0.0 is assumed for the static document score.
 
+    The static document scores are looked up once when the ranker is created, and the IDF
+    scores are computed once per query. Scoring a posting is thus cheap. If documents are
+    added to the corpus later on, their static scores are looked up when the next query is
+    prepared.
+
     See Section 7.1.4 in https://nlp.stanford.edu/IR-book/pdf/irbookonlinereading.pdf.
     """
 
@@ -28,6 +36,46 @@ class BetterRanker(Ranker):
         self._dynamic_score_weight = 1.0
         self._static_score_weight = 1.0
         self._static_score_field_name = "static_quality_score"
+        self._idfs: Dict[str, float] = {}  # Computed per query, or lazily as needed.
+
+        # Look up the static document scores once, so that we don't have to materialize the
+        # document when scoring it. Indexed by document identifier. We never need more than single
+        # precision.
+        self._static_scores = array("f", bytes(4 * len(corpus)))
+        for (document_id, document) in enumerate(corpus):
+            self._static_scores[document_id] = document.get_field(self._static_score_field_name, 0.0)
+        self._static_upper_bound = max(self._static_scores, default=0.0)
+
+    def _refresh_static_scores(self) -> None:
+        """
+        Looks up the static scores of any documents that have been added to the corpus since we
+        last looked.
+        """
+        for document_id in range(len(self._static_scores), len(self._corpus)):
+            score = self._corpus[document_id].get_field(self._static_score_field_name, 0.0)
+            self._static_scores.append(score)
+            self._static_upper_bound = max(self._static_upper_bound, self._static_scores[-1])
+
+    def _get_idf(self, term: str) -> float:
+        """
+        Returns the IDF of the given term, computing and caching it if needed.
+        """
+        idf_score = self._idfs.get(term, None)
+        if idf_score is None:
+            # Calculate document frequency of term
+            doc_frequency = self._inverted_index.get_document_frequency(term)
+            # Calculate idf score, log of total docs / doc frequency
+            idf_score = math.log(len(self._corpus) /
+                                 doc_frequency, 2.0) if doc_frequency > 0 else 0.0
+            self._idfs[term] = idf_score
+        return idf_score
+
+    def prepare(self, terms: List[Tuple[str, int]]) -> None:
+        # Compute the idf scores once per query, and not once per posting.
+        self._refresh_static_scores()
+        self._idfs = {}
+        for (term, _) in terms:
+            self._get_idf(term)
 
     def reset(self, document_id: int) -> None:
         self._document_id = document_id
@@ -35,24 +83,27 @@ class BetterRanker(Ranker):
 
     def update(self, term: str, multiplicity: int, posting: Posting) -> None:
         assert self._document_id == posting.document_id
-        # Calculate term-frequency
-        term_frequency = posting.term_frequency
-        # Calculate document frequency of term
-        doc_frequency = self._inverted_index.get_document_frequency(term)
-        # Calculate idf score, log of total docs / doc frequency
-        idf_score = math.log(len(self._corpus) /
-                             doc_frequency, 2.0) if doc_frequency > 0 else 0.0
-
         # Multiply term-frequency with idf score to get tf-idf score
-        tf_idf = term_frequency * idf_score
-
-        self._score += tf_idf
+        self._score += posting.term_frequency * self._get_idf(term)
 
     def evaluate(self) -> float:
-        # If static_quality_score exists in document, get value, if not, set to 0.0
+        # If static_quality_score exists in document, use its value, if not, it's 0.0
         if self._document_id is not None:
-            document = self._corpus.get_document(self._document_id)
-            static_quality_score = document.get_field(
-                self._static_score_field_name, 0.0)
-            return self._score + static_quality_score
+            return self._score + self._static_scores[self._document_id]
         return self._score
+
+    def get_upper_bound(self, term: str, multiplicity: int, max_term_frequency: int) -> float:
+        # Mirror the computations in update, since the score contribution is monotonic in the
+        # term frequency.
+        return max_term_frequency * self._get_idf(term)
+
+    def get_static_upper_bound(self) -> float:
+        return self._static_upper_bound
+
+    def get_contributions(self, term: str, multiplicity: int, document_ids: np.ndarray,
+                          term_frequencies: np.ndarray) -> np.ndarray:
+        # Same as update, but for all of the term's postings at once.
+        return term_frequencies.astype(np.float32) * np.float32(self._get_idf(term))
+
+    def get_static_contributions(self, document_ids: np.ndarray) -> np.ndarray:
+        return np.frombuffer(self._static_scores, dtype=np.float32)[document_ids]
@@ -0,0 +1,99 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import math
+import numpy as np
+from array import array
+from typing import Dict, List, Tuple
+from .ranker import Ranker
+from .corpus import Corpus
+from .posting import Posting
+from .invertedindex import InvertedIndex
+
+
+class BM25Ranker(Ranker):
+    """
+    A ranker that implements Okapi BM25, see Section 11.4.3 in https://nlp.stanford.edu/IR-book/pdf/11prob.pdf.
+    A posting's contribution to a document's score is
+
+       idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl))
+
+    where dl is the length of the document and avgdl is the average document length. The IDF values are
+    computed once per query, and the length normalization term is precomputed once per document from
+    the document lengths that the inverted index records when it is built. If the inverted index is
+    updated later on, the length normalization terms are recomputed when the next query is prepared.
+
+    For multi-field indexes, the document length is the sum of the field lengths, since the inverted index
+    sums the term frequencies across fields too.
+    """
+
+    def __init__(self, corpus: Corpus, inverted_index: InvertedIndex, k1: float = 1.2, b: float = 0.75):
+        assert k1 >= 0.0
+        assert 0.0 <= b <= 1.0
+        self.__corpus = corpus
+        self.__inverted_index = inverted_index
+        self.__k1 = k1
+        self.__b = b
+        self.__idfs: Dict[str, float] = {}  # Computed per query, or lazily as needed.
+        self.__document_id = None
+        self.__score = 0.0
+        self.__compute_norms()
+
+    def __compute_norms(self) -> None:
+        """
+        Precomputes the length normalization term per document, indexed by document identifier. We never
+        need more than single precision.
+        """
+        self.__generation = self.__inverted_index.get_generation()  # The index generation the norms are for.
+        lengths = self.__inverted_index.get_document_lengths()
+        (k1, b) = (self.__k1, self.__b)
+        average = (sum(lengths) / len(lengths)) if lengths else 0.0
+        average = average if average > 0.0 else 1.0
+        self.__norms = array("f", (k1 * (1.0 - b + b * length / average) for length in lengths))
+        self.__min_norm = min(self.__norms, default=k1 * (1.0 - b))
+
+    def __get_idf(self, term: str) -> float:
+        """
+        Returns the IDF of the given term. We use the variant that is always non-negative.
+        """
+        idf = self.__idfs.get(term, None)
+        if idf is None:
+            n = len(self.__corpus)
+            df = self.__inverted_index.get_document_frequency(term)
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            self.__idfs[term] = idf
+        return idf
+
+    def prepare(self, terms: List[Tuple[str, int]]) -> None:
+        if self.__inverted_index.get_generation() != self.__generation:
+            self.__compute_norms()
+        self.__idfs = {}
+        for (term, _) in terms:
+            self.__get_idf(term)
+
+    def reset(self, document_id: int) -> None:
+        self.__document_id = document_id
+        self.__score = 0.0
+
+    def update(self, term: str, multiplicity: int, posting: Posting) -> None:
+        assert self.__document_id == posting.document_id
+        tf = posting.term_frequency
+        norm = self.__norms[posting.document_id]
+        self.__score += multiplicity * self.__get_idf(term) * tf * (self.__k1 + 1.0) / (tf + norm)
+
+    def evaluate(self) -> float:
+        return self.__score
+
+    def get_upper_bound(self, term: str, multiplicity: int, max_term_frequency: int) -> float:
+        # The contribution grows with the term frequency, and shrinks with the document length.
+        tf = max_term_frequency
+        if tf == 0:
+            return 0.0
+        return multiplicity * self.__get_idf(term) * tf * (self.__k1 + 1.0) / (tf + self.__min_norm)
+
+    def get_contributions(self, term: str, multiplicity: int, document_ids: np.ndarray,
+                          term_frequencies: np.ndarray) -> np.ndarray:
+        norms = np.frombuffer(self.__norms, dtype=np.float32)[document_ids]
+        tfs = term_frequencies.astype(np.float32)
+        weight = np.float32(multiplicity * self.__get_idf(term) * (self.__k1 + 1.0))
+        return weight * tfs / (tfs + norms)
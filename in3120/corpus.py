@@ -3,12 +3,201 @@
 
 from __future__ import annotations
 from abc import abstractmethod
-from typing import Any, List, Dict, Callable, Optional
+from array import array
+from typing import Any, BinaryIO, List, Dict, Callable, Iterator, Optional, Tuple
+import collections
 import collections.abc
+import csv
+import io
+import json
+import mmap
+import struct
+import zlib
 from .document import Document, InMemoryDocument
 from .documentpipeline import DocumentPipeline
 
 
+def _read_lines(file: BinaryIO) -> Iterator[Tuple[int, int, str]]:
+    """
+    Reads the given binary file line by line, and yields (byte offset, byte length, line) triples. The
+    lines are decoded as UTF-8, and keep their line endings. Line endings are normalized to a single "\\n".
+    """
+    offset = file.tell()
+    for line in file:
+        length = len(line)
+        if line.endswith(b"\r\n"):
+            line = line[:-2] + b"\n"
+        yield (offset, length, line.decode("utf-8"))
+        offset += length
+
+
+def _parse_text(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Parses a line from a UTF-8 encoded text file. One document per line, tab-separated fields. Empty
+    lines are ignored. The first field gets named "body", the second field (optional) gets named "meta".
+    All other fields are currently ignored.
+    """
+    anonymous_fields = line.strip().split("\t")
+    if len(anonymous_fields) == 1 and not anonymous_fields[0]:
+        return None
+    named_fields = {"body": anonymous_fields[0]}
+    if len(anonymous_fields) >= 2:
+        named_fields["meta"] = anonymous_fields[1]
+    return named_fields
+
+
+def _parse_json(line: str) -> Optional[Dict[str, Any]]:
+    """
+    Parses a line from a UTF-8 encoded JSON file. One document per line. Lines that do not start
+    with "{" and end with "}" are ignored.
+    """
+    line = line.strip()
+    if line.startswith("{") and line.endswith("}"):
+        return json.loads(line)
+    return None
+
+
+def _read_csv_or_tsv(file: BinaryIO, delimiter: str) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+    """
+    Reads documents from the given UTF-8 encoded CSV file. One document per row, where the first row
+    names the fields. Rows can span several lines, so we keep track of where each row ends.
+    """
+    start = file.tell()
+    end = start
+
+    def lines():
+        nonlocal end
+        for (offset, length, line) in _read_lines(file):
+            end = offset + length
+            yield line
+
+    reader = csv.DictReader(lines(), delimiter=delimiter)
+    if reader.fieldnames is not None:
+        start = end  # Skip past the first row, which names the fields.
+    for row in reader:
+        yield (start, end - start, dict(row))
+        start = end
+
+
+def _read_xml(file: BinaryIO) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+    """
+    Reads documents from the given XML file. The schema is assumed to be simple <doc> nodes. Each <doc>
+    node gets mapped to a single document field named "body", which holds the node's immediate text
+    content. The file is parsed incrementally, so we never hold more than a chunk of it in memory. The
+    reported length of a document runs up to where its end tag starts, or to where the node ends if it
+    has no end tag.
+    """
+    from xml.parsers import expat
+    parser = expat.ParserCreate()
+    parser.buffer_text = True
+    documents = []
+    depth = 0
+    start = None  # Where the <doc> node we're inside starts, if any.
+    document_depth = 0
+    segments = []  # The <doc> node's text, one entry per run of text between child nodes.
+    chunks = []  # The current run of text.
+    cdata = False
+
+    def flush():
+        if chunks:
+            segments.append("".join(chunks))
+            chunks.clear()
+
+    def start_element(name, _):
+        nonlocal depth, start, document_depth
+        depth += 1
+        if start is None and name == "doc":
+            (start, document_depth) = (parser.CurrentByteIndex, depth)
+        elif start is not None and depth == document_depth + 1:
+            flush()
+
+    def end_element(_):
+        nonlocal depth, start
+        if start is not None and depth == document_depth:
+            flush()
+            documents.append((start, parser.CurrentByteIndex - start, {"body": " ".join(segments)}))
+            segments.clear()
+            start = None
+        depth -= 1
+
+    def character_data(data):
+        if start is not None and depth == document_depth and not cdata:
+            chunks.append(data)
+
+    def toggle_cdata(value):
+        nonlocal cdata
+        cdata = value
+
+    parser.StartElementHandler = start_element
+    parser.EndElementHandler = end_element
+    parser.CharacterDataHandler = character_data
+    parser.StartCdataSectionHandler = lambda: toggle_cdata(True)
+    parser.EndCdataSectionHandler = lambda: toggle_cdata(False)
+    while True:
+        chunk = file.read(1 << 16)
+        parser.Parse(chunk, not chunk)
+        yield from documents
+        documents.clear()
+        if not chunk:
+            break
+
+
+def _read_records(filename: str) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+    """
+    Reads the named file, and yields (byte offset, byte length, fields) triples for each document
+    found in it. The file format is inferred from the file's extension. Reads the file incrementally,
+    so that we never hold more than a single document in memory.
+    """
+    if not filename.endswith((".txt", ".xml", ".json", ".csv", ".tsv")):
+        raise IOError("Unsupported extension")
+    with open(filename, mode="rb") as file:
+        if filename.endswith(".xml"):
+            yield from _read_xml(file)
+        elif filename.endswith((".csv", ".tsv")):
+            yield from _read_csv_or_tsv(file, "," if filename.endswith(".csv") else "\t")
+        else:
+            parse = _parse_text if filename.endswith(".txt") else _parse_json
+            for (offset, length, line) in _read_lines(file):
+                fields = parse(line)
+                if fields is not None:
+                    yield (offset, length, fields)
+
+
+def _read_fieldnames(filename: str) -> Optional[List[str]]:
+    """
+    Reads the names of the fields from the first row of the named CSV or TSV file. Returns None for other
+    file formats, or if the file is empty.
+    """
+    if not filename.endswith((".csv", ".tsv")):
+        return None
+    with open(filename, mode="rb") as file:
+        return next(csv.reader((line for (_, _, line) in _read_lines(file)),
+                               delimiter="," if filename.endswith(".csv") else "\t"), None)
+
+
+def _read_record(filename: str, file: BinaryIO, offset: int, length: int,
+                 fieldnames: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Reads and parses the document at the given byte offset and with the given byte length in the named
+    file, as reported by _read_records. The given file is assumed to be the named file, opened in binary mode.
+    CSV and TSV files need the names of the fields, as reported by _read_fieldnames.
+    """
+    file.seek(offset)
+    data = file.read(length)
+    if filename.endswith(".xml"):
+        from xml.parsers.expat import ExpatError
+        try:
+            return next(_read_xml(io.BytesIO(data + b"</doc>")))[2]
+        except ExpatError:
+            return next(_read_xml(io.BytesIO(data)))[2]  # An empty <doc/> node, which has no end tag.
+    if filename.endswith((".csv", ".tsv")):
+        assert fieldnames is not None
+        reader = csv.DictReader(io.StringIO(data.decode("utf-8").replace("\r\n", "\n")), fieldnames=fieldnames,
+                                delimiter="," if filename.endswith(".csv") else "\t")
+        return dict(next(reader))
+    return (_parse_text if filename.endswith(".txt") else _parse_json)(data.decode("utf-8"))
+
+
 class Corpus(collections.abc.Iterable):
     """
     Abstract base class representing a corpus we can index and search over,
@@ -48,24 +237,32 @@ class InMemoryCorpus(Corpus):
     document collections.
 
     Document identifiers are assigned on a first-come first-serve basis.
+
+    If the pipeline is expensive, loading can be sped up by running the pipeline across several
+    worker processes. The resulting corpus is the same, except that the pipeline's processors then
+    see documents numbered by their position in the file, since which documents get dropped isn't
+    known up front. The documents that make it through are renumbered afterwards.
     """
 
-    def __init__(self, filename: Optional[str] = None, pipeline: Optional[DocumentPipeline] = None):
+    def __init__(self, filename: Optional[str] = None, pipeline: Optional[DocumentPipeline] = None,
+                 workers: int = 1):
+        assert workers > 0
         self._documents = []
         pipeline = DocumentPipeline([]) if pipeline is None else pipeline
-        if filename:
-            if filename.endswith(".txt"):
-                self.__load_text(filename, pipeline)
-            elif filename.endswith(".xml"):
-                self.__load_xml(filename, pipeline)
-            elif filename.endswith(".json"):
-                self.__load_json(filename, pipeline)
-            elif filename.endswith(".csv"):
-                self.__load_csv_or_tsv(filename, ",", pipeline)
-            elif filename.endswith(".tsv"):
-                self.__load_csv_or_tsv(filename, "\t", pipeline)
-            else:
-                raise IOError("Unsupported extension")
+        if filename and workers > 1:
+            documents = (InMemoryDocument(i, fields) for (i, (_, _, fields)) in enumerate(_read_records(filename)))
+            for (document_id, document) in enumerate(pipeline.map(documents, workers)):
+                if document.document_id != document_id:
+                    fields = {name: document.get_field(name, None) for name in document.get_field_names()}
+                    document = InMemoryDocument(document_id, fields)
+                self.add_document(document)
+        elif filename:
+            document_id = 0
+            for (_, _, fields) in _read_records(filename):
+                document = pipeline(InMemoryDocument(document_id, fields))
+                if document:
+                    self.add_document(document)
+                    document_id += 1
 
     def __iter__(self):
         return iter(self._documents)
@@ -105,76 +302,194 @@ class InMemoryCorpus(Corpus):
                 splits[value].add_document(document, False)
         return splits
 
-    def __load_text(self, filename: str, pipeline: DocumentPipeline) -> None:
+
+class StreamingCorpus(Corpus):
+    """
+    A corpus that is backed by a file, and that never holds more than a single document in memory.
+    Supports the same file formats as InMemoryCorpus, and assigns the same document identifiers.
+
+    Iterating over the corpus streams through the file and parses the documents as we go. To allow for
+    random access by document identifier, we keep a table of where each document resides in the file,
+    and look up a document by seeking to it and parsing it again. The table takes up a few bytes per
+    document, regardless of how large the documents are.
+
+    The documents are run through the pipeline each time they're parsed, so the pipeline needs to be
+    deterministic. The file must not change while the corpus is in use.
+    """
+
+    def __init__(self, filename: str, pipeline: Optional[DocumentPipeline] = None):
+        self.__filename = filename
+        self.__pipeline = DocumentPipeline([]) if pipeline is None else pipeline
+        self.__offsets = array("Q")  # Where each document starts in the file.
+        self.__lengths = array("Q")  # How many bytes each document occupies in the file.
+        self.__fieldnames = _read_fieldnames(filename)  # The names of the fields, for CSV and TSV files.
+        for (offset, length, _) in self.__read_documents():
+            self.__offsets.append(offset)
+            self.__lengths.append(length)
+
+    def __read_documents(self) -> Iterator[Tuple[int, int, Document]]:
         """
-        Loads documents from the given UTF-8 encoded text file. One document per line,
-        tab-separated fields. Empty lines are ignored. The first field gets named "body",
-        the second field (optional) gets named "meta". All other fields are currently ignored.
+        Streams through the file, and yields (byte offset, byte length, document) triples for all the
+        documents that make it through the pipeline.
         """
         document_id = 0
-        with open(filename, mode="r", encoding="utf-8") as file:
-            for line in file:
-                anonymous_fields = line.strip().split("\t")
-                if len(anonymous_fields) == 1 and not anonymous_fields[0]:
-                    continue
-                named_fields = {"body": anonymous_fields[0]}
-                if len(anonymous_fields) >= 2:
-                    named_fields["meta"] = anonymous_fields[1]
-                document = pipeline(InMemoryDocument(document_id, named_fields))
-                if document:
-                    self.add_document(document)
-                    document_id += 1
+        for (offset, length, fields) in _read_records(self.__filename):
+            document = self.__pipeline(InMemoryDocument(document_id, fields))
+            if document:
+                yield (offset, length, document)
+                document_id += 1
+
+    def __iter__(self):
+        return (document for (_, _, document) in self.__read_documents())
+
+    def size(self) -> int:
+        return len(self.__offsets)
+
+    def get_document(self, document_id: int) -> Document:
+        assert 0 <= document_id < len(self.__offsets)
+        with open(self.__filename, mode="rb") as file:
+            fields = _read_record(self.__filename, file, self.__offsets[document_id], self.__lengths[document_id],
+                                  self.__fieldnames)
+        document = self.__pipeline(InMemoryDocument(document_id, fields))
+        assert document is not None, "Pipeline is not deterministic"
+        return document
+
+
+class MemoryMappedCorpus(Corpus):
+    """
+    A read-only corpus that resides in a single file on disk, and that is accessed via memory mapping.
+    Only a small table of block offsets and a few decompressed blocks are held in memory, so we can serve
+    documents from corpora that are far larger than the available RAM.
+
+    The documents are grouped into blocks of a fixed number of consecutive documents, and each block is
+    compressed as a unit. Compressing several documents together gives much better compression ratios
+    than compressing each document by itself, since short documents have little redundancy on their own.
+    Looking up a document means locating its block via the offsets table and decompressing that block.
+    Since search results tend to exhibit locality, we keep a small LRU cache of decompressed blocks.
+
+    The file layout, with all integers little-endian, is as follows:
+
+       [header]    Magic, version, document count, block size, block count, and the offset of the table.
+       [blocks]    The blocks, each a zlib compressed JSON array of the documents' fields.
+       [offsets]   Where each block starts in the file, plus where the last block ends.
+    """
+
+    __magic = b"IN3120DS"
+    __version = 1
+    __header = struct.Struct("<8sIIIIQ")  # Magic, version, document count, block size, block count, and table offset.
+    __offset = struct.Struct("<Q")
+
+    def __init__(self, filename: str, cache_size: int = 8):
+        assert cache_size > 0
+        with open(filename, mode="rb") as file:
+            self.__data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            (magic, version, self.__size, self.__block_size, self.__block_count, self.__table_offset) = \
+                __class__.__header.unpack_from(self.__data, 0)
+            if magic != __class__.__magic or version != __class__.__version:
+                raise IOError("Unsupported corpus format")
+        except (IOError, struct.error):
+            self.__data.close()
+            raise
+        self.__cache_size = cache_size
+        self.__cache = collections.OrderedDict()  # Maps block numbers to lists of decompressed documents' fields.
+
+    def __enter__(self) -> "MemoryMappedCorpus":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
 
-    def __load_xml(self, filename: str, pipeline: DocumentPipeline) -> None:
+    def close(self) -> None:
         """
-        Loads documents from the given XML file. The schema is assumed to be
-        simple <doc> nodes. Each <doc> node gets mapped to a single document field
-        named "body".
+        Releases the memory mapping. The corpus can't be used afterwards, but documents that have
+        already been returned remain valid.
         """
-        from xml.dom.minidom import parse
+        self.__cache.clear()
+        self.__data.close()
 
-        def __get_text(nodes):
-            data = []
-            for node in nodes:
-                if node.nodeType == node.TEXT_NODE:
-                    data.append(node.data)
-            return " ".join(data)
+    @staticmethod
+    def write(filename: str, corpus: Corpus, block_size: int = 64, level: int = 6) -> None:
+        """
+        Serializes the given corpus to the named file, so that it can later be opened and memory
+        mapped. The documents are written in blocks of the given number of documents, and compressed
+        at the given zlib compression level. Larger blocks compress better, but make each lookup
+        decompress more data. The field values must be JSON serializable.
+        """
+        assert block_size > 0
+        offsets = []
+        size = 0
+        with open(filename, mode="wb") as file:
 
-        dom = parse(filename)
-        document_id = 0
-        for body in (__get_text(n.childNodes) for n in dom.getElementsByTagName("doc")):
-            document = pipeline(InMemoryDocument(document_id, {"body": body}))
-            if document:
-                self.add_document(document)
-                document_id += 1
+            # We don't know the table offset until we've written the blocks, so reserve room
+            # for the header now and fill it in at the end.
+            file.write(bytes(__class__.__header.size))
 
-    def __load_csv_or_tsv(self, filename: str, delimiter: str, pipeline: DocumentPipeline) -> None:
+            # The blocks. Compress one block at a time, to bound memory usage.
+            def flush(block: List[Dict[str, Any]]) -> None:
+                offsets.append(file.tell())
+                file.write(zlib.compress(json.dumps(block, ensure_ascii=False).encode("utf-8"), level))
+
+            block = []
+            for document in corpus:
+                assert document.document_id == size
+                block.append({name: document.get_field(name, None) for name in document.get_field_names()})
+                size += 1
+                if len(block) == block_size:
+                    flush(block)
+                    block = []
+            if block:
+                flush(block)
+
+            # The offsets table. The extra entry tells where the last block ends.
+            table_offset = file.tell()
+            offsets.append(table_offset)
+            for offset in offsets:
+                file.write(__class__.__offset.pack(offset))
+
+            # Go back and fill in the header.
+            file.seek(0)
+            file.write(__class__.__header.pack(__class__.__magic, __class__.__version, size, block_size,
+                                               len(offsets) - 1, table_offset))
+
+    def __decompress(self, block: int) -> List[Dict[str, Any]]:
         """
-        Loads documents from the given UTF-8 encoded CSV file. One document per line.
+        Decompresses the given block, and returns the fields of the documents it contains.
         """
-        import csv
-        document_id = 0
-        with open(filename, mode="r", encoding="utf-8") as file:
-            reader = csv.DictReader(file, delimiter=delimiter)
-            for row in reader:
-                document = pipeline(InMemoryDocument(document_id, dict(row)))
-                if document:
-                    self.add_document(document)
-                    document_id += 1
+        (start,) = __class__.__offset.unpack_from(self.__data, self.__table_offset + block * __class__.__offset.size)
+        (end,) = __class__.__offset.unpack_from(self.__data, self.__table_offset + (block + 1) * __class__.__offset.size)
+        return json.loads(zlib.decompress(self.__data[start:end]).decode("utf-8"))
 
-    def __load_json(self, filename: str, pipeline: DocumentPipeline) -> None:
+    def __get_block(self, block: int) -> List[Dict[str, Any]]:
         """
-        Loads documents from the given UTF-8 encoded JSON file. One document per line.
-        Lines that do not start with "{" and end with "}" are ignored.
+        Returns the fields of the documents in the given block, via the LRU cache.
         """
-        from json import loads
-        document_id = 0
-        with open(filename, mode="r", encoding="utf-8") as file:
-            for line in file:
-                line = line.strip()
-                if line.startswith("{") and line.endswith("}"):
-                    named_fields = loads(line)
-                    document = pipeline(InMemoryDocument(document_id, named_fields))
-                    if document:
-                        self.add_document(document)
-                        document_id += 1
+        fields = self.__cache.get(block, None)
+        if fields is not None:
+            self.__cache.move_to_end(block)
+            return fields
+        fields = self.__decompress(block)
+        self.__cache[block] = fields
+        if len(self.__cache) > self.__cache_size:
+            self.__cache.popitem(last=False)
+        return fields
+
+    def __iter__(self):
+        # Bypass the cache, so that a full scan doesn't evict the blocks that lookups benefit from.
+        for block in range(self.__block_count):
+            for (i, fields) in enumerate(self.__decompress(block)):
+                yield InMemoryDocument(block * self.__block_size + i, fields)
+
+    def size(self) -> int:
+        return self.__size
+
+    def get_document(self, document_id: int) -> Document:
+        assert 0 <= document_id < self.__size
+        (block, i) = divmod(document_id, self.__block_size)
+        return InMemoryDocument(document_id, dict(self.__get_block(block)[i]))
+
+    def get_cached_block_count(self) -> int:
+        """
+        Returns the number of decompressed blocks currently held in the cache. Facilitates testing.
+        """
+        return len(self.__cache)
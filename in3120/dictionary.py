@@ -3,7 +3,13 @@
 
 from abc import abstractmethod
 import collections.abc
-from typing import Optional
+import hashlib
+import itertools
+import mmap
+import struct
+from array import array
+from typing import Iterable, Iterator, List, Optional, Tuple
+from .integercodec import IntegerCodec
 
 
 class Dictionary(collections.abc.Iterable):
@@ -79,3 +85,372 @@ class InMemoryDictionary(Dictionary):
 
     def get_term_id(self, term: str) -> Optional[int]:
         return self._terms.get(term, None)
+
+
+class FrontCodedDictionary(Dictionary):
+    """
+    A read-only dictionary where the terms are kept sorted and front coded, see Section 5.2.2 in
+    https://nlp.stanford.edu/IR-book/pdf/05comp.pdf. The term identifiers are the terms' ranks in
+    sorted order, so the terms that share a given prefix have consecutive term identifiers. That
+    enables, e.g., wildcard queries like "foo*" to be expanded without scanning the vocabulary.
+
+    The terms are UTF-8 encoded and sorted in byte order, and divided into blocks of a fixed number
+    of terms. The first term in a block is stored in full. Each of the remaining terms is stored as
+    the length of the prefix it shares with the preceding term, followed by the remaining suffix. A
+    lookup does a binary search over the blocks' first terms, and then decodes a single block.
+
+    Everything lives in a single buffer with the layout below, with all integers little-endian, so
+    that the dictionary can be written to a file and later memory mapped:
+
+       [header]    Magic, version, term count, block size, and block count.
+       [offsets]   The offset of each block, relative to the start of the buffer.
+       [blocks]    The front coded terms, with all lengths variable-byte encoded.
+    """
+
+    __magic = b"IN3120FC"
+    __version = 1
+    __header = struct.Struct("<8sIIII")  # Magic, version, term count, block size, and block count.
+    __offset = struct.Struct("<Q")
+
+    def __init__(self, terms: Iterable[str], block_size: int = 16):
+        assert block_size > 0
+        terms = sorted(set(term.encode("utf-8") for term in terms))
+        block_count = -(-len(terms) // block_size)
+        blocks = bytearray()
+        offsets = []
+        previous = b""
+        for (i, term) in enumerate(terms):
+            if i % block_size == 0:
+                offsets.append(len(blocks))
+                IntegerCodec.encode_length(len(term), blocks)
+                blocks.extend(term)
+            else:
+                shared = 0
+                limit = min(len(previous), len(term))
+                while shared < limit and previous[shared] == term[shared]:
+                    shared += 1
+                IntegerCodec.encode_length(shared, blocks)
+                IntegerCodec.encode_length(len(term) - shared, blocks)
+                blocks.extend(term[shared:])
+            previous = term
+        start = __class__.__header.size + block_count * __class__.__offset.size
+        data = bytearray(__class__.__header.pack(__class__.__magic, __class__.__version, len(terms), block_size,
+                                                 block_count))
+        for offset in offsets:
+            data.extend(__class__.__offset.pack(start + offset))
+        data.extend(blocks)
+        self.__attach(bytes(data))
+
+    def __attach(self, data) -> None:
+        """
+        Makes the dictionary use the given buffer, after having validated its header.
+        """
+        (magic, version, self.__size, self.__block_size, self.__block_count) = __class__.__header.unpack_from(data, 0)
+        if magic != __class__.__magic or version != __class__.__version:
+            raise IOError("Unsupported dictionary format")
+        self.__data = data
+
+    def __iter__(self):
+        return self.__decode(0, self.__size)
+
+    def __repr__(self):
+        return str(dict(self))
+
+    @staticmethod
+    def read(filename: str) -> "FrontCodedDictionary":
+        """
+        Opens a dictionary that has previously been written to the named file. The file is memory mapped
+        and not read into memory.
+        """
+        with open(filename, mode="rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        dictionary = FrontCodedDictionary([])
+        dictionary.__attach(data)
+        return dictionary
+
+    def write(self, filename: str) -> None:
+        """
+        Writes the dictionary to the named file, so that it can later be memory mapped.
+        """
+        with open(filename, mode="wb") as file:
+            file.write(self.__data)
+
+    def __get_block_offset(self, block: int) -> int:
+        """
+        Returns the offset of the given block in the buffer.
+        """
+        return __class__.__offset.unpack_from(self.__data, __class__.__header.size + block * __class__.__offset.size)[0]
+
+    def __get_first_term(self, block: int) -> bytes:
+        """
+        Returns the first term in the given block, as UTF-8 encoded bytes.
+        """
+        where = self.__get_block_offset(block)
+        (length, consumed) = IntegerCodec.decode_length(self.__data, where)
+        return self.__data[(where + consumed):(where + consumed + length)]
+
+    def __decode_raw(self, start: int, end: int) -> Iterator[bytes]:
+        """
+        Yields the UTF-8 encoded terms having term identifiers in the range [start, end), in order.
+        """
+        data = self.__data
+        if start >= end:
+            return
+        block = start // self.__block_size
+        where = self.__get_block_offset(block)
+        term = b""
+        for term_id in range(block * self.__block_size, end):
+            if term_id % self.__block_size == 0:
+                (length, consumed) = IntegerCodec.decode_length(data, where)
+                where += consumed
+                term = data[where:(where + length)]
+                where += length
+            else:
+                (shared, consumed) = IntegerCodec.decode_length(data, where)
+                where += consumed
+                (length, consumed) = IntegerCodec.decode_length(data, where)
+                where += consumed
+                term = term[:shared] + data[where:(where + length)]
+                where += length
+            if term_id >= start:
+                yield term
+
+    def __decode(self, start: int, end: int) -> Iterator[Tuple[str, int]]:
+        """
+        Yields the (term, term identifier) pairs for the term identifiers in the range [start, end), in order.
+        """
+        return ((term.decode("utf-8"), term_id) for (term_id, term) in enumerate(self.__decode_raw(start, end), start))
+
+    def __lower_bound(self, needle: bytes) -> int:
+        """
+        Returns the term identifier of the first term that is not less than the given UTF-8 encoded needle,
+        or the size of the dictionary if there is no such term. Binary searches over the blocks' first terms,
+        and then scans a single block.
+        """
+        left = 0
+        right = self.__block_count
+        while left < right:
+            middle = (left + right) // 2
+            if self.__get_first_term(middle) <= needle:
+                left = middle + 1
+            else:
+                right = middle
+        if left == 0:
+            return 0
+        start = (left - 1) * self.__block_size
+        end = min(start + self.__block_size, self.__size)
+        for (term_id, term) in enumerate(self.__decode_raw(start, end), start):
+            if term >= needle:
+                return term_id
+        return end
+
+    def size(self) -> int:
+        return self.__size
+
+    def add_if_absent(self, term: str) -> int:
+        term_id = self.get_term_id(term)
+        if term_id is None:
+            raise TypeError("Front coded dictionary is read-only.")
+        return term_id
+
+    def get_term_id(self, term: str) -> Optional[int]:
+        needle = term.encode("utf-8")
+        term_id = self.__lower_bound(needle)
+        if term_id < self.__size and next(self.__decode_raw(term_id, term_id + 1)) == needle:
+            return term_id
+        return None
+
+    def get_term(self, term_id: int) -> str:
+        """
+        Returns the term that has the given term identifier. The inverse of get_term_id.
+        """
+        assert 0 <= term_id < self.__size
+        return next(self.__decode_raw(term_id, term_id + 1)).decode("utf-8")
+
+    def prefix_range(self, prefix: str) -> Tuple[int, int]:
+        """
+        Returns the range [start, end) of the term identifiers of the terms that start with the given prefix.
+        The range is empty if no terms start with the prefix.
+        """
+        needle = prefix.encode("utf-8")
+        start = self.__lower_bound(needle)
+        # No UTF-8 encoded string contains the byte 0xFF, so all terms that start with the prefix sort before this.
+        end = self.__lower_bound(needle + b"\xff")
+        return (start, end)
+
+    def get_prefix_matches(self, prefix: str) -> Iterator[Tuple[str, int]]:
+        """
+        Yields the (term, term identifier) pairs for all terms that start with the given prefix, in order.
+        """
+        return self.__decode(*self.prefix_range(prefix))
+
+
+class PerfectHashDictionary(Dictionary):
+    """
+    A read-only dictionary that is built from a finished vocabulary, and that maps the terms to the integer
+    set {0, .., N - 1} using a minimal perfect hash function. Lookups don't need the terms themselves, so
+    the lookup structures only take up a few bytes per term.
+
+    The construction follows the "hash, displace, and compress" (CHD) idea by Belazzougui et al. Each term
+    is hashed once, into a bucket and a pair of values (f, g). The buckets are processed in order of
+    decreasing size, and for each bucket we search for a displacement d such that the slots (f + d * g) mod N
+    are all free for the terms in the bucket. Buckets with a single term are simply given one of the
+    remaining free slots. Per bucket, we only need to store the displacement or the directly assigned slot.
+
+    A term that was not in the vocabulary would be mapped to some arbitrary slot. To reject such terms, we
+    store a 16-bit fingerprint per slot. Hence there is a small chance, about one in 65536, that an
+    out-of-vocabulary term is mistaken for a vocabulary term. The terms are only kept so that the dictionary
+    can be iterated over, length-prefixed and in slot order, and are never touched by lookups.
+
+    Everything lives in a single buffer with the layout below, with all integers little-endian, so
+    that the dictionary can be written to a file and later memory mapped:
+
+       [header]         Magic, version, term count, bucket count, and hash seed.
+       [displacements]  One signed 32-bit entry per bucket.
+       [fingerprints]   One unsigned 16-bit entry per slot.
+       [terms]          The UTF-8 encoded terms in slot order, each prefixed by its variable-byte length.
+    """
+
+    __magic = b"IN3120PH"
+    __version = 2
+    __header = struct.Struct("<8sIIII")  # Magic, version, term count, bucket count, and seed.
+    __displacement = struct.Struct("<i")
+    __fingerprint = struct.Struct("<H")
+
+    def __init__(self, terms: Iterable[str], bucket_size: int = 4):
+        assert bucket_size > 0
+        terms = list(set(term.encode("utf-8") for term in terms))
+        size = len(terms)
+        bucket_count = max(1, -(-size // bucket_size))
+        for seed in itertools.count():
+            tables = self.__build(terms, bucket_count, seed)
+            if tables is not None:
+                break
+        (displacements, fingerprints, slots) = tables
+        data = bytearray(__class__.__header.pack(__class__.__magic, __class__.__version, size, bucket_count, seed))
+        for displacement in displacements:
+            data.extend(__class__.__displacement.pack(displacement))
+        for fingerprint in fingerprints:
+            data.extend(__class__.__fingerprint.pack(fingerprint))
+        for term in slots:
+            IntegerCodec.encode_length(len(term), data)
+            data.extend(term)
+        self.__attach(bytes(data))
+
+    @staticmethod
+    def __hash(term: bytes, size: int, bucket_count: int, seed: int) -> Tuple[int, int, int, int]:
+        """
+        Hashes the given UTF-8 encoded term, and returns its bucket, the (f, g) values that determine its
+        candidate slots, and its fingerprint.
+        """
+        digest = hashlib.blake2b(term, digest_size=16, salt=seed.to_bytes(4, "little")).digest()
+        (a, b, c, fingerprint) = struct.unpack("<IIIH", digest[:14])
+        return (a % bucket_count, b % max(1, size), 1 + c % max(1, size - 1), fingerprint)
+
+    @staticmethod
+    def __build(terms: List[bytes], bucket_count: int, seed: int) -> Optional[Tuple[array, array, List[bytes]]]:
+        """
+        Tries to construct the displacement and fingerprint tables for the given terms, using the given
+        hash seed, together with the terms in slot order. Returns None if that didn't work out, in which
+        case we should try another seed.
+        """
+        size = len(terms)
+        buckets = [[] for _ in range(bucket_count)]
+        for term in terms:
+            (bucket, f, g, fingerprint) = __class__.__hash(term, size, bucket_count, seed)
+            buckets[bucket].append((f, g, fingerprint, term))
+        occupied = bytearray(size)
+        slots = [b""] * size
+        displacements = array("i", bytes(4 * bucket_count))  # Zero means that the bucket is empty.
+        fingerprints = array("H", bytes(2 * size))
+        singletons = []
+
+        # Place the largest buckets first, while there's still lots of room.
+        for bucket in sorted(range(bucket_count), key=lambda i: len(buckets[i]), reverse=True):
+            entries = buckets[bucket]
+            if len(entries) <= 1:
+                if entries:
+                    singletons.append(bucket)
+                continue
+            for d in range(16 * size):
+                candidates = {(f + d * g) % size for (f, g, _, _) in entries}
+                if len(candidates) == len(entries) and not any(occupied[slot] for slot in candidates):
+                    break
+            else:
+                return None
+            displacements[bucket] = d + 1
+            for (f, g, fingerprint, term) in entries:
+                slot = (f + d * g) % size
+                occupied[slot] = 1
+                fingerprints[slot] = fingerprint
+                slots[slot] = term
+
+        # Buckets with a single term can go anywhere. We encode the slot as a negative number, to tell it
+        # apart from a displacement.
+        free = (slot for slot in range(size) if not occupied[slot])
+        for (bucket, slot) in zip(singletons, free):
+            displacements[bucket] = -(slot + 1)
+            fingerprints[slot] = buckets[bucket][0][2]
+            slots[slot] = buckets[bucket][0][3]
+        return (displacements, fingerprints, slots)
+
+    def __attach(self, data) -> None:
+        """
+        Makes the dictionary use the given buffer, after having validated its header.
+        """
+        (magic, version, self.__size, self.__bucket_count, self.__seed) = __class__.__header.unpack_from(data, 0)
+        if magic != __class__.__magic or version != __class__.__version:
+            raise IOError("Unsupported dictionary format")
+        self.__fingerprints_offset = __class__.__header.size + self.__bucket_count * __class__.__displacement.size
+        self.__data = data
+
+    def __iter__(self):
+        where = self.__fingerprints_offset + self.__size * __class__.__fingerprint.size
+        for slot in range(self.__size):
+            (length, consumed) = IntegerCodec.decode_length(self.__data, where)
+            where += consumed
+            yield (bytes(self.__data[where:(where + length)]).decode("utf-8"), slot)
+            where += length
+
+    @staticmethod
+    def read(filename: str) -> "PerfectHashDictionary":
+        """
+        Opens a dictionary that has previously been written to the named file. The file is memory mapped
+        and not read into memory.
+        """
+        with open(filename, mode="rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        dictionary = PerfectHashDictionary([])
+        dictionary.__attach(data)
+        return dictionary
+
+    def write(self, filename: str) -> None:
+        """
+        Writes the dictionary to the named file, so that it can later be memory mapped.
+        """
+        with open(filename, mode="wb") as file:
+            file.write(self.__data)
+
+    def size(self) -> int:
+        return self.__size
+
+    def add_if_absent(self, term: str) -> int:
+        term_id = self.get_term_id(term)
+        if term_id is None:
+            raise TypeError("Perfect hash dictionary is read-only.")
+        return term_id
+
+    def get_term_id(self, term: str) -> Optional[int]:
+        if self.__size == 0:
+            return None
+        (bucket, f, g, fingerprint) = __class__.__hash(term.encode("utf-8"), self.__size, self.__bucket_count,
+                                                       self.__seed)
+        displacement = __class__.__displacement.unpack_from(self.__data, __class__.__header.size +
+                                                            bucket * __class__.__displacement.size)[0]
+        if displacement == 0:
+            return None
+        slot = -displacement - 1 if displacement < 0 else (f + (displacement - 1) * g) % self.__size
+        offset = self.__fingerprints_offset + slot * __class__.__fingerprint.size
+        if __class__.__fingerprint.unpack_from(self.__data, offset)[0] != fingerprint:
+            return None
+        return slot
@@ -1,10 +1,20 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-from typing import List, Optional, Callable
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Callable
 from .document import Document
 
 
+def _process_chunk(pipeline: "DocumentPipeline", documents: List[Document]) -> List[Optional[Document]]:
+    """
+    Worker function for parallel document processing. Runs the pipeline over a chunk of documents,
+    and returns the results in the same order. Needs to live at module level so that it can be pickled.
+    """
+    return [pipeline.process_document(document) for document in documents]
+
+
 class DocumentPipeline:
     """
     A simple document processing pipeline. Applies a sequence of operations to the document
@@ -34,3 +44,25 @@ class DocumentPipeline:
                 return None
             document = processor(document)
         return document
+
+    def map(self, documents: Iterable[Document], workers: int = 1, chunk_size: int = 64) -> Iterator[Document]:
+        """
+        Applies all processors to all the given documents, and yields back the documents that are not
+        dropped. The documents are yielded back in the same order as they were given.
+
+        If more than one worker is requested, the documents are processed in chunks across a pool of
+        processes. That requires the processors and the documents to be picklable, i.e., lambdas are
+        not allowed, and processors that have side-effects will have them in the worker processes and
+        not in this one. Larger chunks amortize the cost of shipping documents back and forth better,
+        but give coarser load balancing across the workers.
+        """
+        assert workers > 0
+        assert chunk_size > 0
+        if workers == 1:
+            yield from (document for document in map(self.process_document, documents) if document is not None)
+            return
+        iterator = iter(documents)
+        chunks = iter(lambda: list(itertools.islice(iterator, chunk_size)), [])
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for results in executor.map(_process_chunk, itertools.repeat(self), chunks):
+                yield from (document for document in results if document is not None)
@@ -0,0 +1,276 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import heapq
+import itertools
+import numpy as np
+from array import array
+from bisect import bisect_right
+from collections import Counter
+from typing import Any, Dict, Iterator, Iterable, List, Tuple
+from .corpus import Corpus
+from .normalizer import Normalizer
+from .tokenizer import Tokenizer
+from .suffixarray import _normalize, _read_texts, _sort_suffixes
+
+
+class _BitVector:
+    """
+    A static bit vector that supports rank queries, i.e., counting how many bits that are set before a given
+    position. We keep how many bits that are set before each block of 512 bits, and count the bits within a
+    block on demand. That adds 32 bits of overhead per 512 bits.
+    """
+
+    def __init__(self, bits: np.ndarray):
+        blocks = bits.size // 512 + 1
+        padded = np.zeros(blocks * 512, dtype=np.uint8)
+        padded[:bits.size] = bits
+        counts = padded.reshape(blocks, 512).sum(axis=1, dtype=np.int64)
+        self.__bits = np.packbits(padded, bitorder="little").tobytes()  # The bits, eight to a byte.
+        self.__samples = array("i", itertools.accumulate(counts[:-1].tolist(), initial=0))  # Set before each block.
+
+    def __getitem__(self, i: int) -> int:
+        return (self.__bits[i >> 3] >> (i & 7)) & 1
+
+    def rank(self, i: int) -> int:
+        """
+        Returns how many of the first i bits that are set.
+        """
+        (block, bit) = (i >> 9, i & 511)
+        rank = self.__samples[block]
+        if bit:
+            start = block << 6
+            word = int.from_bytes(self.__bits[start:(start + ((bit + 7) >> 3))], "little")
+            rank += bin(word & ((1 << bit) - 1)).count("1")
+        return rank
+
+
+class _WaveletTree:
+    """
+    A Huffman-shaped wavelet tree over a sequence of integer symbols, see "Wavelet trees for all" by Navarro.
+    Each node splits the symbols below it in two, and has a bit vector that tells which side each symbol in
+    its subsequence goes to. The tree has the shape of a Huffman tree, so that frequent symbols have short
+    paths. The bit vectors then hold about as many bits as the zero-order entropy of the sequence dictates.
+    """
+
+    def __init__(self, sequence: np.ndarray):
+        symbols = np.unique(sequence)
+        frequencies = dict(zip(symbols.tolist(), np.bincount(np.searchsorted(symbols, sequence)).tolist()))
+        if len(frequencies) < 2:
+            frequencies[max(frequencies, default=0) + 1] = 0  # Ensure that there's at least one node.
+        self.__vectors: List[_BitVector] = []  # The bit vector of each node. The root comes first.
+        self.__children = array("i")  # The children of each node. A leaf is encoded as ~symbol.
+        self.__paths: Dict[int, List[Tuple[_BitVector, int]]] = {}  # The nodes and bits from the root to each leaf.
+        self.__build(__class__.__build_huffman_tree(frequencies), sequence, [])
+
+    @staticmethod
+    def __build_huffman_tree(frequencies: Dict[int, int]) -> Any:
+        """
+        Builds a Huffman tree over the given symbols. A leaf is a symbol, and an inner node is a pair of trees.
+        """
+        heap = [(frequency, i, symbol) for (i, (symbol, frequency)) in enumerate(sorted(frequencies.items()))]
+        heapq.heapify(heap)
+        tiebreaker = len(heap)
+        while len(heap) > 1:
+            (frequency0, _, tree0) = heapq.heappop(heap)
+            (frequency1, _, tree1) = heapq.heappop(heap)
+            heapq.heappush(heap, (frequency0 + frequency1, tiebreaker, (tree0, tree1)))
+            tiebreaker += 1
+        return heap[0][2]
+
+    @staticmethod
+    def __get_symbols(tree: Any) -> List[int]:
+        """
+        Returns the symbols at the leaves of the given Huffman tree.
+        """
+        if not isinstance(tree, tuple):
+            return [tree]
+        return __class__.__get_symbols(tree[0]) + __class__.__get_symbols(tree[1])
+
+    def __build(self, tree: Any, sequence: np.ndarray, path: List[Tuple[_BitVector, int]]) -> int:
+        """
+        Builds the nodes for the given Huffman tree, for the given subsequence. Returns the identifier of the
+        root node, or the encoded symbol if the tree is a leaf.
+        """
+        if not isinstance(tree, tuple):
+            self.__paths[tree] = path
+            return ~tree
+        bits = ~np.isin(sequence, __class__.__get_symbols(tree[0]))
+        node = len(self.__vectors)
+        vector = _BitVector(bits)
+        self.__vectors.append(vector)
+        self.__children.extend([0, 0])
+        self.__children[2 * node] = self.__build(tree[0], sequence[~bits], path + [(vector, 0)])
+        self.__children[2 * node + 1] = self.__build(tree[1], sequence[bits], path + [(vector, 1)])
+        return node
+
+    def rank(self, symbol: int, i: int) -> int:
+        """
+        Returns how many times the given symbol occurs among the first i symbols in the sequence.
+        """
+        path = self.__paths.get(symbol, None)
+        if path is None:
+            return 0
+        for (vector, bit) in path:
+            rank = vector.rank(i)
+            i = rank if bit else i - rank
+        return i
+
+    def access(self, i: int) -> Tuple[int, int]:
+        """
+        Returns the symbol at position i in the sequence, and how many times that symbol occurs before it.
+        """
+        node = 0
+        while True:
+            vector = self.__vectors[node]
+            bit = vector[i]
+            rank = vector.rank(i)
+            i = rank if bit else i - rank
+            child = self.__children[2 * node + bit]
+            if child < 0:
+                return (~child, i)
+            node = child
+
+
+class FMIndex:
+    """
+    A compressed full-text index, as an alternative to a suffix array. Allows us to conduct efficient substring
+    searches, using a fraction of the memory. See "Opportunistic data structures with applications" by
+    Ferragina and Manzini, and "Compressed full-text indexes" by Navarro and Mäkinen for an overview.
+
+    The normalized contents of all documents are concatenated into a single UTF-8 encoded text, as for the
+    suffix array. We don't keep the text itself, but its Burrows-Wheeler transform (BWT): Sort all suffixes
+    of the text, and take the byte that precedes each suffix. The BWT is stored in a wavelet tree, so that we
+    can count how many times a byte occurs in any prefix of it. The suffixes that start with a given pattern
+    form a range of rows, and we can find the range for a pattern from the range for the pattern without its
+    first byte. A search therefore only takes a couple of rank operations per byte in the query, and the size
+    of the range is the number of matches.
+
+    To find where a match is in the text, we step backwards through the text using the BWT until we reach a
+    suffix whose position we have sampled. We sample every k-th position, which trades space for speed.
+
+    Every document starts with a space, so that requiring that a match starts on a token boundary is the same
+    as requiring that it is preceded by a space.
+
+    Counting matches is fast, but locating them costs up to k steps per match, each a handful of rank operations.
+    That makes ranking slow for patterns that occur very often, e.g., common words or single letters, where the
+    suffix array just reads off the matches. Clients can opt in to bounding the cost, by locating at most a
+    given number of evenly spaced matches per query and extrapolating the occurrence counts from these. The
+    scores are then estimates, and documents with few occurrences may be missed. By default, all matches are
+    located and the results are the same as for the suffix array.
+    """
+
+    def __init__(self, corpus: Corpus, fields: Iterable[str], normalizer: Normalizer, tokenizer: Tokenizer,
+                 sample_rate: int = 32):
+        assert sample_rate > 0
+        self.__corpus = corpus
+        self.__normalizer = normalizer
+        self.__tokenizer = tokenizer
+        self.__sample_rate = sample_rate
+        self.__offsets = array("i")  # Where each document starts in the text.
+        self.__document_ids = array("i")  # The identifier of each document in the text.
+        self.__counts = array("i")  # The number of rows that sort before those starting with each byte.
+        self.__bwt = None  # The Burrows-Wheeler transform of the text, in a wavelet tree.
+        self.__marks = None  # Which rows have sampled positions.
+        self.__samples = array("i")  # The sampled positions, in row order.
+        self.__build_index(fields)
+
+    def __build_index(self, fields: Iterable[str]) -> None:
+        """
+        Builds the index from the set of named fields in the document collection. The index allows us to search
+        across all named fields in one go.
+        """
+        # Build the text, and note where each document starts.
+        pieces = []
+        length = 0
+        for (document_id, _, piece) in _read_texts(self.__corpus, fields, self.__normalizer, self.__tokenizer):
+            self.__offsets.append(length)
+            self.__document_ids.append(document_id)
+            pieces.append(b" " + piece)
+            length += len(piece) + 1
+        text = np.frombuffer(b"".join(pieces), dtype=np.uint8)
+        del pieces
+
+        # Conceptually, the text ends with a unique symbol that is smaller than all bytes. The suffix that
+        # consists of just that symbol sorts first, and that symbol precedes the suffix that is the whole text.
+        n = text.size
+        suffixes = np.concatenate(([n], _sort_suffixes(text)))
+        end = 256
+        bwt = np.full(n + 1, end, dtype=np.int64)
+        bwt[suffixes > 0] = text[suffixes[suffixes > 0] - 1]
+        self.__counts = array("i", itertools.accumulate(np.bincount(text, minlength=256).tolist(), initial=1))
+        self.__bwt = _WaveletTree(bwt)
+        del bwt
+        marks = suffixes % self.__sample_rate == 0
+        self.__marks = _BitVector(marks)
+        self.__samples = array("i", suffixes[marks].tolist())
+
+    def __get_range(self, query: str) -> Tuple[int, int]:
+        """
+        Returns the range of rows that start with the normalized query, preceded by a space. This is the
+        "backward search" of Ferragina and Manzini. The empty query matches nothing, not everything.
+        """
+        needle = _normalize(query, self.__normalizer, self.__tokenizer).encode("utf-8")
+        if not needle:
+            return (0, 0)
+        (start, end) = (0, self.__counts[-1])
+        for byte in reversed(b" " + needle):
+            count = self.__counts[byte]
+            (start, end) = (count + self.__bwt.rank(byte, start), count + self.__bwt.rank(byte, end))
+            if start >= end:
+                return (0, 0)
+        return (start, end)
+
+    def __locate(self, row: int) -> int:
+        """
+        Returns the position in the text of the suffix in the given row. We step backwards through the text
+        until we reach a sampled position. Each step takes us from the row of a suffix to the row of the
+        suffix that starts one position earlier, and is called "LF mapping".
+        """
+        steps = 0
+        while not self.__marks[row]:
+            (byte, rank) = self.__bwt.access(row)
+            row = self.__counts[byte] + rank
+            steps += 1
+        return self.__samples[self.__marks.rank(row)] + steps
+
+    def count(self, query: str) -> int:
+        """
+        Returns how many times the query phrase occurs in the indexed fields, i.e., the total number of matches
+        across all documents. This doesn't require locating the matches.
+        """
+        (start, end) = self.__get_range(query)
+        return end - start
+
+    def evaluate(self, query: str, options: dict) -> Iterator[Dict[str, Any]]:
+        """
+        Evaluates the given query, doing a "phrase prefix search", exactly as SuffixArray does. The matching
+        documents are ranked according to how many times the query substring occurs in the document, and
+        only the "best" matches are yielded back to the client. Ties are resolved arbitrarily.
+
+        The client can supply a dictionary of options that controls this query evaluation process: The maximum
+        number of documents to return to the client is controlled via the "hit_count" (int) option. The most
+        matches to locate can be limited via the "locate_limit" (int) option. If there are more matches than
+        that, the scores are estimated from an evenly spaced sample of them. There's no limit by default.
+
+        The results yielded back to the client are dictionaries having the keys "score" (int) and
+        "document" (Document).
+        """
+        (start, end) = self.__get_range(query)
+        limit = options.get("locate_limit", None)
+        assert limit is None or limit > 0
+        rows = range(start, end)
+        if limit is not None and len(rows) > limit:
+            rows = [start + (i * (end - start)) // limit for i in range(limit)]
+        positions = [self.__locate(row) + 1 for row in rows]
+        debug = options.get("debug", False)
+        if debug:
+            for position in positions:
+                print("*** MATCH", position)
+
+        # A document in the haystack might contain multiple occurrences of the needle. Rank according to
+        # occurrence count, and emit in ranked order.
+        counter = Counter(bisect_right(self.__offsets, position) - 1 for position in positions)
+        scale = (end - start) / len(rows) if rows else 1.0
+        for (index, count) in counter.most_common(max(1, min(100, options.get("hit_count", 10)))):
+            yield {"score": round(count * scale), "document": self.__corpus[self.__document_ids[index]]}
@@ -0,0 +1,325 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+from abc import ABC, abstractmethod
+from array import array
+from typing import Iterable, List, Tuple
+
+
+class IntegerCodec(ABC):
+    """
+    Abstract base class for codecs that compress sequences of non-negative integers, e.g.,
+    the gaps and term frequencies that make up a posting list. Codecs are stateless and
+    used via their static methods, and operate on whole sequences at a time. That allows
+    codecs that pack several integers together, and codecs that are not byte-aligned.
+
+    See Chapter 5 in https://nlp.stanford.edu/IR-book/pdf/05comp.pdf, and the paper
+    "Decoding billions of integers per second through vectorization" by Lemire and Boytsov
+    for an overview of the space of techniques.
+    """
+
+    @staticmethod
+    @abstractmethod
+    def encode_many(numbers: Iterable[int], destination: bytearray) -> int:
+        """
+        Encodes all the given numbers, and appends the resulting bytes to the given
+        destination buffer. Returns the number of bytes that were appended.
+        """
+        pass
+
+    @staticmethod
+    @abstractmethod
+    def decode_many(source: bytearray, count: int, start: int = 0) -> Tuple[array, int]:
+        """
+        Starting at the given position in the source buffer, decodes the next count numbers.
+        Returns a pair comprised of an array holding the decoded numbers, and the number of
+        bytes read from the source buffer. The decoded numbers are assumed to fit in 32 bits.
+        """
+        pass
+
+    @staticmethod
+    def encode_length(length: int, destination: bytearray) -> int:
+        """
+        Encodes a single length, and appends the resulting bytes to the given destination buffer.
+        Returns the number of bytes that were appended. Used by codecs that are not byte-aligned,
+        that prefix the encoded bits with their length in bytes so that we know where they end, and
+        by other byte-oriented data structures. A simple variable-byte encoding, identical to what
+        VariableByteCodec does. Unlike VariableByteCodec, the encoded length need not follow other
+        variable-byte encoded numbers.
+        """
+        values = [length & 127]
+        length >>= 7
+        while length:
+            values.append(length & 127)
+            length >>= 7
+        values.reverse()
+        values[-1] += 128
+        destination.extend(values)
+        return len(values)
+
+    @staticmethod
+    def decode_length(source: bytearray, start: int) -> Tuple[int, int]:
+        """
+        The inverse of encode_length. Returns a pair comprised of the decoded length, and the
+        number of bytes read from the source buffer.
+        """
+        length = 0
+        where = start
+        while True:
+            byte = source[where]
+            where += 1
+            if byte < 128:
+                length = (length << 7) | byte
+            else:
+                return ((length << 7) | (byte - 128), where - start)
+
+
+class EliasGammaCodec(IntegerCodec):
+    """
+    Elias-gamma coding. A number x >= 1 is coded as its binary representation, preceded by
+    as many zero bits as there are bits following the leading one bit. Since we also want to
+    be able to code zeros, we code x + 1. See Section 5.3.2 in
+    https://nlp.stanford.edu/IR-book/pdf/05comp.pdf for details.
+
+    Optimal for small numbers, since a number x costs 2 * floor(log2(x + 1)) + 1 bits.
+    """
+
+    @staticmethod
+    def encode_many(numbers: Iterable[int], destination: bytearray) -> int:
+        assert destination is not None
+        bits = []
+        for number in numbers:
+            assert number >= 0
+            binary = bin(number + 1)[2:]
+            bits.append("0" * (len(binary) - 1))
+            bits.append(binary)
+        return _write_bits("".join(bits), destination)
+
+    @staticmethod
+    def decode_many(source: bytearray, count: int, start: int = 0) -> Tuple[array, int]:
+        assert source is not None
+        assert count >= 0
+        (bits, consumed) = _read_bits(source, start)
+        numbers = array("I")
+        where = 0
+        for _ in range(count):
+            one = bits.index("1", where)
+            width = one - where + 1
+            numbers.append(int(bits[one:(one + width)], 2) - 1)
+            where = one + width
+        return (numbers, consumed)
+
+
+class EliasDeltaCodec(IntegerCodec):
+    """
+    Elias-delta coding. A number x >= 1 is coded as the Elias-gamma code of its length in
+    bits, followed by its binary representation without the leading one bit. Since we also
+    want to be able to code zeros, we code x + 1.
+
+    Asymptotically better than Elias-gamma coding, since the length prefix grows slower.
+    """
+
+    @staticmethod
+    def encode_many(numbers: Iterable[int], destination: bytearray) -> int:
+        assert destination is not None
+        bits = []
+        for number in numbers:
+            assert number >= 0
+            binary = bin(number + 1)[2:]
+            length = bin(len(binary))[2:]
+            bits.append("0" * (len(length) - 1))
+            bits.append(length)
+            bits.append(binary[1:])
+        return _write_bits("".join(bits), destination)
+
+    @staticmethod
+    def decode_many(source: bytearray, count: int, start: int = 0) -> Tuple[array, int]:
+        assert source is not None
+        assert count >= 0
+        (bits, consumed) = _read_bits(source, start)
+        numbers = array("I")
+        where = 0
+        for _ in range(count):
+            one = bits.index("1", where)
+            width = one - where + 1
+            length = int(bits[one:(one + width)], 2)
+            where = one + width
+            numbers.append(int("1" + bits[where:(where + length - 1)], 2) - 1)
+            where += length - 1
+        return (numbers, consumed)
+
+
+def _write_bits(bits: str, destination: bytearray) -> int:
+    """
+    Appends the given string of "0" and "1" characters to the given destination buffer,
+    as a length-prefixed sequence of bytes. The last byte is padded with zeros.
+    """
+    bits += "0" * (-len(bits) % 8)
+    size = len(bits) // 8
+    payload = int(bits, 2).to_bytes(size, "big") if bits else b""
+    written = IntegerCodec.encode_length(size, destination)
+    destination.extend(payload)
+    return written + size
+
+
+def _read_bits(source: bytearray, start: int) -> Tuple[str, int]:
+    """
+    The inverse of _write_bits. Returns a pair comprised of the string of "0" and "1"
+    characters, and the number of bytes read from the source buffer.
+    """
+    (size, consumed) = IntegerCodec.decode_length(source, start)
+    payload = bytes(source[(start + consumed):(start + consumed + size)])
+    bits = bin(int.from_bytes(payload, "big"))[2:].zfill(8 * size) if size else ""
+    return (bits, consumed + size)
+
+
+class Simple8bCodec(IntegerCodec):
+    """
+    Simple-8b coding, as described in "Index compression using 64-bit words" by Anh and
+    Moffat. Numbers are packed into 64-bit words. Each word has a 4-bit selector that tells
+    how the remaining 60 bits are divided up, e.g., 60 numbers of 1 bit each or 3 numbers
+    of 20 bits each. The encoder greedily packs as many numbers as it can into each word.
+
+    Word-aligned codes like this one are quick to decode. Since the last word might be only
+    partially filled, decode exactly as many numbers as were encoded.
+    """
+
+    # The (count, width) pair for each selector. The two first selectors encode runs of zeros.
+    __selectors = [(240, 0), (120, 0), (60, 1), (30, 2), (20, 3), (15, 4), (12, 5), (10, 6),
+                   (8, 7), (7, 8), (6, 10), (5, 12), (4, 15), (3, 20), (2, 30), (1, 60)]
+
+    @staticmethod
+    def encode_many(numbers: Iterable[int], destination: bytearray) -> int:
+        assert destination is not None
+        numbers = list(numbers)
+        widths = [number.bit_length() for number in numbers]
+        assert all(number >= 0 for number in numbers)
+        assert all(width <= 60 for width in widths)
+        words = []
+        where = 0
+        while where < len(numbers):
+            for (selector, (count, width)) in enumerate(__class__.__selectors):
+                # A selector is usable if all the numbers it would cover fit. The last word
+                # might cover fewer numbers than the selector allows for, and that's fine.
+                if max(widths[where:(where + count)]) <= width:
+                    word = selector << 60
+                    for (i, number) in enumerate(numbers[where:(where + count)]):
+                        word |= number << (i * width)
+                    words.append(word.to_bytes(8, "little"))
+                    where += count
+                    break
+        data = b"".join(words)
+        destination.extend(data)
+        return len(data)
+
+    @staticmethod
+    def decode_many(source: bytearray, count: int, start: int = 0) -> Tuple[array, int]:
+        assert source is not None
+        assert count >= 0
+        numbers = array("I")
+        where = start
+        while len(numbers) < count:
+            word = int.from_bytes(source[where:(where + 8)], "little")
+            where += 8
+            (n, width) = __class__.__selectors[word >> 60]
+            n = min(n, count - len(numbers))
+            if width == 0:
+                numbers.extend([0] * n)
+            else:
+                mask = (1 << width) - 1
+                numbers.extend([(word >> (i * width)) & mask for i in range(n)])
+        return (numbers, where - start)
+
+
+class PForDeltaCodec(IntegerCodec):
+    """
+    Patched frame-of-reference coding, in the spirit of PForDelta/OptPFD as described in, e.g.,
+    "Performance of compressed inverted list caching in search engines" by Zhang et al. Numbers
+    are processed in blocks of 128. Per block we subtract the block's minimum (the frame of
+    reference), and pick the bit width b that minimizes the block's encoded size. All numbers
+    get their b low bits bit-packed, and the few numbers that don't fit in b bits (the
+    exceptions) get their remaining high bits stored separately and patched in when decoding.
+
+    The input is expected to already be gap encoded, hence the "delta" part of the name.
+
+    The layout of a block is as follows, with all header fields variable-byte encoded:
+
+       [count] [base] [b] [exception count] [bit-packed low bits] [exception positions] [exception high bits]
+    """
+
+    __block_size = 128
+
+    @staticmethod
+    def encode_many(numbers: Iterable[int], destination: bytearray) -> int:
+        assert destination is not None
+        numbers = list(numbers)
+        assert all(number >= 0 for number in numbers)
+        written = 0
+        for where in range(0, len(numbers), __class__.__block_size):
+            written += __class__.__encode_block(numbers[where:(where + __class__.__block_size)], destination)
+        return written
+
+    @staticmethod
+    def __encode_block(block: List[int], destination: bytearray) -> int:
+        base = min(block)
+        values = [value - base for value in block]
+        widths = sorted(value.bit_length() for value in values)
+
+        # Estimate the cost of each candidate width b. We estimate the cost of an exception to be
+        # one byte for its position and one byte per 7 high bits, which is what the VB encoding
+        # of these costs.
+        best_width = widths[-1]
+        best_cost = (len(values) * best_width + 7) // 8
+        for width in range(widths[-1]):
+            cost = (len(values) * width + 7) // 8
+            cost += sum(1 + ((w - width + 6) // 7) for w in widths if w > width)
+            if cost < best_cost:
+                (best_width, best_cost) = (width, cost)
+        mask = (1 << best_width) - 1
+        exceptions = [i for (i, value) in enumerate(values) if value > mask]
+
+        # Emit the block.
+        header = bytearray()
+        for field in (len(values), base, best_width, len(exceptions)):
+            IntegerCodec.encode_length(field, header)
+        packed = 0
+        for (i, value) in enumerate(values):
+            packed |= (value & mask) << (i * best_width)
+        payload = bytearray(packed.to_bytes((len(values) * best_width + 7) // 8, "little"))
+        for i in exceptions:
+            IntegerCodec.encode_length(i, payload)
+        for i in exceptions:
+            IntegerCodec.encode_length(values[i] >> best_width, payload)
+        destination.extend(header)
+        destination.extend(payload)
+        return len(header) + len(payload)
+
+    @staticmethod
+    def decode_many(source: bytearray, count: int, start: int = 0) -> Tuple[array, int]:
+        assert source is not None
+        assert count >= 0
+        numbers = array("I")
+        where = start
+        while len(numbers) < count:
+            fields = []
+            for _ in range(4):
+                (field, consumed) = IntegerCodec.decode_length(source, where)
+                fields.append(field)
+                where += consumed
+            (n, base, width, exception_count) = fields
+            size = (n * width + 7) // 8
+            packed = int.from_bytes(source[where:(where + size)], "little")
+            where += size
+            mask = (1 << width) - 1
+            values = [(packed >> (i * width)) & mask for i in range(n)]
+            positions = []
+            for _ in range(exception_count):
+                (position, consumed) = IntegerCodec.decode_length(source, where)
+                positions.append(position)
+                where += consumed
+            for position in positions:
+                (high, consumed) = IntegerCodec.decode_length(source, where)
+                values[position] |= high << width
+                where += consumed
+            numbers.extend([value + base for value in values[:(count - len(numbers))]])
+        return (numbers, where - start)
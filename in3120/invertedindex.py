@@ -2,15 +2,101 @@
 # -*- coding: utf-8 -*-
 
 import itertools
+import mmap
+import struct
+import threading
 from abc import ABC, abstractmethod
+from array import array
 from collections import Counter
-from typing import Iterable, Iterator, List
-from .dictionary import InMemoryDictionary
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Type
+from .dictionary import Dictionary, FrontCodedDictionary, InMemoryDictionary
+from .integercodec import IntegerCodec
 from .normalizer import Normalizer
 from .tokenizer import Tokenizer
 from .corpus import Corpus
-from .posting import Posting
-from .postinglist import CompressedInMemoryPostingList, InMemoryPostingList, PostingList
+from .document import Document
+from .posting import Posting, PositionalPosting
+from .postinglist import BlockCompressedInMemoryPostingList, CompressedInMemoryPostingList, \
+    CompressedInMemoryPositionalPostingList, InMemoryPostingList, PostingList
+from .variablebytecodec import VariableByteCodec
+
+
+def _get_terms(buffer: str, normalizer: Normalizer, tokenizer: Tokenizer) -> Iterator[str]:
+    """
+    Processes the given text buffer and returns an iterator that yields normalized terms.
+    Shared by the index implementations below, so that they all process text identically.
+    """
+    tokens = tokenizer.strings(normalizer.canonicalize(buffer))
+    return (normalizer.normalize(t) for t in tokens)
+
+
+def _get_postings(document_id: int, values: Iterable[str], normalizer: Normalizer, tokenizer: Tokenizer,
+                  positional: bool) -> Tuple[Iterator[Tuple[str, Posting]], List[int]]:
+    """
+    Processes the given field values of a document, and returns a pair comprised of an iterator that yields
+    (term, posting) pairs for all unique terms in the document, and the number of terms in each field. Terms
+    are reported in the order they first appear.
+
+    Note that we currently don't keep track of which field each term occurs in. If we were to allow
+    fielded searches (e.g., "find documents that contain 'foo' in the 'title' field") then we would have
+    to keep track of that, either as a synthetic term in the dictionary (e.g., 'foo.title') or as extra
+    data in the posting. For positional postings, we leave a one-position hole between fields so that a
+    phrase cannot match across a field boundary.
+    """
+    lengths = []
+    if not positional:
+        term_frequencies = Counter()
+        total = 0
+        for value in values:
+            term_frequencies.update(_get_terms(value, normalizer, tokenizer))
+            lengths.append(sum(term_frequencies.values()) - total)
+            total += lengths[-1]
+        return (((term, Posting(document_id, tf)) for (term, tf) in term_frequencies.items()), lengths)
+    positions = {}
+    position = 0
+    for value in values:
+        start = position
+        for term in _get_terms(value, normalizer, tokenizer):
+            positions.setdefault(term, []).append(position)
+            position += 1
+        lengths.append(position - start)
+        position += 1
+    return (((term, PositionalPosting(document_id, p)) for (term, p) in positions.items()), lengths)
+
+
+def _invert_shard(documents: List[Tuple[int, List[str]]], normalizer: Normalizer, tokenizer: Tokenizer,
+                  positional: bool) -> Tuple[Dict[str, List[Posting]], List[Tuple[int, List[int]]]]:
+    """
+    Worker function for parallel index construction. Builds partial, uncompressed posting lists
+    for the given shard of (document identifier, field values) pairs, and collects the field lengths
+    of each document. Terms are reported in the order they first appear in the shard. Needs to live
+    at module level so that it can be pickled.
+    """
+    postings = {}
+    lengths = []
+    for (document_id, values) in documents:
+        (document_postings, document_lengths) = _get_postings(document_id, values, normalizer, tokenizer, positional)
+        for (term, posting) in document_postings:
+            postings.setdefault(term, []).append(posting)
+        lengths.append((document_id, document_lengths))
+    return (postings, lengths)
+
+
+def _set_document_lengths(document_lengths: List[array], document_id: int, lengths: List[int]) -> None:
+    """
+    Records the number of terms in each field of the given document, given one array of lengths per
+    field. To keep the lengths compact, we use the narrowest array type that can hold them, and widen
+    it if needed.
+    """
+    for (i, length) in enumerate(lengths):
+        field_lengths = document_lengths[i]
+        if length >= 1 << (8 * field_lengths.itemsize):
+            field_lengths = array("H" if length < (1 << 16) else "I", field_lengths)
+            document_lengths[i] = field_lengths
+        if document_id >= len(field_lengths):
+            field_lengths.extend(itertools.repeat(0, document_id + 1 - len(field_lengths)))
+        field_lengths[document_id] = length
 
 
 class InvertedIndex(ABC):
@@ -48,43 +134,140 @@ class InvertedIndex(ABC):
         """
         pass
 
+    def get_postings_arrays(self, term: str) -> Tuple[array, array]:
+        """
+        Returns the term's associated posting list as a pair of parallel arrays, holding the document
+        identifiers and the term frequencies, respectively. Useful for clients that process complete
+        posting lists at a time, e.g., using vectorized operations.
+        """
+        document_ids = array("I")
+        term_frequencies = array("I")
+        for posting in self.get_postings_iterator(term):
+            document_ids.append(posting.document_id)
+            term_frequencies.append(posting.term_frequency)
+        return (document_ids, term_frequencies)
+
+    def get_document_lengths(self, field: Optional[str] = None) -> array:
+        """
+        Returns an array that holds the length of each indexed document in the given field, as measured
+        in number of terms and indexed by document identifier. If no field is given, the lengths across
+        all indexed fields are returned. Useful for rankers that do length normalization.
+        """
+        raise NotImplementedError("Inverted index does not keep track of document lengths.")
+
+    def snapshot(self) -> "InvertedIndex":
+        """
+        Returns a read-only view of the index as it is right now, that is unaffected by later changes to
+        the index. Clients that do several lookups that need to be mutually consistent, e.g., when evaluating
+        a query, should do these against a snapshot. The default implementation is for indexes that never
+        change after having been built, and just returns the index itself.
+        """
+        return self
+
+    def get_generation(self) -> int:
+        """
+        Returns a number that changes whenever the index changes, so that clients that cache results derived
+        from the index know when to discard these. The default implementation is for indexes that never change
+        after having been built.
+        """
+        return 0
+
+    def get_max_term_frequency(self, term: str) -> int:
+        """
+        Returns the largest term frequency in the given term's posting list, or 0 for out-of-vocabulary
+        terms. Implementations that know this number up front should override this method, since the
+        default implementation has to traverse the complete posting list.
+        """
+        return max((posting.term_frequency for posting in self.get_postings_iterator(term)), default=0)
+
 
 class InMemoryInvertedIndex(InvertedIndex):
     """
     A simple in-memory implementation of an inverted index, suitable for small corpora.
 
     In a serious application we'd have configuration to allow for field-specific NLP,
-    scale beyond current memory constraints, have a positional index, and so on.
+    scale beyond current memory constraints, and so on.
+
+    If index compression is enabled, only the posting lists are compressed. If skips are enabled
+    too, the compressed posting lists are divided into blocks with skip pointers, which speeds up
+    intersections. The codec used to compress the blocks can be specified, and defaults to
+    variable-byte encoding.
+
+    The dictionary can be compressed separately, by having it front coded once the index has been
+    built. That assigns the terms identifiers in sorted order, and allows for efficient prefix lookups.
+
+    If the index is positional, the postings also hold the positions within the document
+    where the term occurs, which enables phrase and proximity queries. Positional posting
+    lists can be compressed, but do not currently support skips or alternative codecs.
+
+    If more than one worker is specified, the corpus is sharded by document identifier range
+    and the shards are processed in parallel across a pool of processes. The resulting index
+    is identical to the one we'd get from a serial build.
 
-    If index compression is enabled, only the posting lists are compressed. Dictionary
-    compression is currently not supported.
+    The number of terms in each field of each document is recorded, for length normalization.
     """
 
-    def __init__(self, corpus: Corpus, fields: Iterable[str], normalizer: Normalizer, tokenizer: Tokenizer, compressed: bool = False):
+    def __init__(self, corpus: Corpus, fields: Iterable[str], normalizer: Normalizer, tokenizer: Tokenizer,
+                 compressed: bool = False, workers: int = 1, skips: bool = False,
+                 codec: Optional[Type[IntegerCodec]] = None, positional: bool = False, front_coded: bool = False):
+        assert workers > 0
+        assert codec is None or compressed
+        assert not positional or not (skips or codec)
         self.__corpus = corpus
         self.__normalizer = normalizer
         self.__tokenizer = tokenizer
+        self.__compressed = compressed
+        self.__skips = skips
+        self.__codec = codec
+        self.__positional = positional
         self.__posting_lists: List[PostingList] = []
-        self.__dictionary = InMemoryDictionary()
-        self.__build_index(fields, compressed)
+        self.__dictionary: Dictionary = InMemoryDictionary()
+        self.__fields = list(fields)
+        self.__document_lengths = [array("B") for _ in self.__fields]  # Number of terms per document, per field.
+        if workers > 1:
+            self.__build_index_in_parallel(self.__fields, workers)
+        else:
+            self.__build_index(self.__fields)
+        if front_coded:
+            self.__front_code_dictionary()
 
     def __repr__(self):
         return str({term: self.__posting_lists[term_id] for (term, term_id) in self.__dictionary})
 
-    def __build_index(self, fields: Iterable[str], compressed: bool) -> None:
+    def __create_posting_list(self) -> PostingList:
+        """
+        Creates a new and empty posting list, of the type we've been configured to use.
+        """
+        if self.__compressed:
+            if self.__positional:
+                return CompressedInMemoryPositionalPostingList()
+            if self.__skips or self.__codec:
+                return BlockCompressedInMemoryPostingList(codec=self.__codec or VariableByteCodec)
+            return CompressedInMemoryPostingList()
+        return InMemoryPostingList()
+
+    def __front_code_dictionary(self) -> None:
+        """
+        Replaces the dictionary with a front coded one. Since that reassigns all term identifiers, the
+        posting lists have to be reordered accordingly.
+        """
+        dictionary = FrontCodedDictionary(term for (term, _) in self.__dictionary)
+        posting_lists = self.__posting_lists[:]
+        for (term, term_id) in self.__dictionary:
+            posting_lists[dictionary.get_term_id(term)] = self.__posting_lists[term_id]
+        self.__dictionary = dictionary
+        self.__posting_lists = posting_lists
+
+    def __build_index(self, fields: List[str]) -> None:
         for document in self.__corpus:
 
-            # Compute TF values for all unique terms in the document. Note that we
-            # currently don't keep track of which field each term occurs in.
-            # If we were to allow fielded searches (e.g., "find documents that
-            # contain 'foo' in the 'title' field") then we would have to keep
-            # track of that, either as a synthetic term in the dictionary
-            # (e.g., 'foo.title') or as extra data in the posting.
-            all_terms = itertools.chain.from_iterable(
-                self.get_terms(document.get_field(f, "")) for f in fields)
-            term_frequencies = Counter(all_terms)
+            # Compute TF values (and positions, if needed) for all unique terms in the document.
+            values = [document.get_field(f, "") for f in fields]
+            (postings, lengths) = _get_postings(document.document_id, values, self.__normalizer, self.__tokenizer,
+                                                self.__positional)
+            _set_document_lengths(self.__document_lengths, document.document_id, lengths)
 
-            for (term, term_frequency) in term_frequencies.items():
+            for (term, posting) in postings:
 
                 # Assign the term an identifier, if needed. First come, first serve.
                 term_id = self.__dictionary.add_if_absent(term)
@@ -92,26 +275,69 @@ class InMemoryInvertedIndex(InvertedIndex):
                 # Locate the posting list for this term. Create it, if needed.
                 if term_id >= len(self.__posting_lists):
                     assert term_id == len(self.__posting_lists)
-                    self.__posting_lists.append(
-                        CompressedInMemoryPostingList() if compressed else InMemoryPostingList())
+                    self.__posting_lists.append(self.__create_posting_list())
                 posting_list = self.__posting_lists[term_id]
 
                 # Append the posting to the posting list. The posting lists
                 # must be kept sorted so that we can efficiently traverse and
                 # merge them when querying the inverted index.
-                posting_list.append_posting(
-                    Posting(document.document_id, term_frequency))
+                posting_list.append_posting(posting)
+
+        # Implementations may or may not need to tie up any loose ends.
+        for posting_list in self.__posting_lists:
+            posting_list.finalize_postings()
+
+    def __build_index_in_parallel(self, fields: List[str], workers: int) -> None:
+        # Shard the corpus into contiguous document identifier ranges, one shard per worker. We
+        # only ship the fields we index to the workers, and not the complete documents.
+        documents = [(d.document_id, [d.get_field(f, "") for f in fields]) for d in self.__corpus]
+        shard_size = max(1, -(-len(documents) // workers))
+        shards = [documents[i:(i + shard_size)] for i in range(0, len(documents), shard_size)]
+
+        # Each worker produces partial posting lists for its shard. We consume the shards in
+        # document identifier order, so merging the partial posting lists for a term reduces to
+        # appending them one after the other. Since the workers report terms in order of first
+        # appearance, assigning term identifiers as we go reproduces the serial assignment.
+        with ProcessPoolExecutor(max_workers=min(workers, max(1, len(shards)))) as executor:
+            arguments = (shards, itertools.repeat(self.__normalizer), itertools.repeat(self.__tokenizer),
+                         itertools.repeat(self.__positional))
+            for (shard, lengths) in executor.map(_invert_shard, *arguments):
+                for (document_id, document_lengths) in lengths:
+                    _set_document_lengths(self.__document_lengths, document_id, document_lengths)
+                for (term, postings) in shard.items():
+                    term_id = self.__dictionary.add_if_absent(term)
+                    if term_id >= len(self.__posting_lists):
+                        assert term_id == len(self.__posting_lists)
+                        self.__posting_lists.append(self.__create_posting_list())
+                    posting_list = self.__posting_lists[term_id]
+                    for posting in postings:
+                        posting_list.append_posting(posting)
 
         # Implementations may or may not need to tie up any loose ends.
         for posting_list in self.__posting_lists:
             posting_list.finalize_postings()
 
+    def get_vocabulary(self) -> Iterator[str]:
+        """
+        Returns an iterator over all the terms that have been indexed, in the order
+        they were assigned term identifiers.
+        """
+        return (term for (term, _) in self.__dictionary)
+
+    def get_prefix_matches(self, prefix: str) -> Iterator[str]:
+        """
+        Returns an iterator over all the terms that have been indexed and that start with the given
+        prefix, e.g., for expanding wildcard queries. Unless the dictionary is front coded, this
+        requires scanning the complete vocabulary.
+        """
+        if isinstance(self.__dictionary, FrontCodedDictionary):
+            return (term for (term, _) in self.__dictionary.get_prefix_matches(prefix))
+        return (term for term in self.get_vocabulary() if term.startswith(prefix))
+
     def get_terms(self, buffer: str) -> Iterator[str]:
         # In a serious large-scale application there could be field-specific tokenizers.
         # We choose to keep it simple here.
-        tokens = self.__tokenizer.strings(
-            self.__normalizer.canonicalize(buffer))
-        return (self.__normalizer.normalize(t) for t in tokens)
+        return _get_terms(buffer, self.__normalizer, self.__tokenizer)
 
     def get_postings_iterator(self, term: str) -> Iterator[Posting]:
         # Assume that everything fits in memory. This would not be the case in a serious
@@ -125,3 +351,528 @@ class InMemoryInvertedIndex(InvertedIndex):
         # themselves. Imagine if the posting lists don't even reside in memory!
         term_id = self.__dictionary.get_term_id(term)
         return 0 if term_id is None else self.__posting_lists[term_id].get_length()
+
+    def get_document_lengths(self, field: Optional[str] = None) -> array:
+        if field is not None:
+            assert field in self.__fields
+            return self.__document_lengths[self.__fields.index(field)]
+        return array("I", map(sum, zip(*self.__document_lengths))) if self.__fields else array("I")
+
+    def get_fields(self) -> List[str]:
+        """
+        Returns the names of the indexed fields.
+        """
+        return list(self.__fields)
+
+    def get_postings_arrays(self, term: str) -> Tuple[array, array]:
+        term_id = self.__dictionary.get_term_id(term)
+        return (array("I"), array("I")) if term_id is None else self.__posting_lists[term_id].get_arrays()
+
+    def get_max_term_frequency(self, term: str) -> int:
+        term_id = self.__dictionary.get_term_id(term)
+        return 0 if term_id is None else self.__posting_lists[term_id].get_max_term_frequency()
+
+
+class UpdatableInMemoryInvertedIndex(InvertedIndex):
+    """
+    An in-memory inverted index that can be updated after it has been built, i.e., documents can be added
+    and deleted. The design is log-structured, similar to what, e.g., Lucene does.
+
+    Newly added documents are inverted straight into a small mutable delta segment, and are searchable as soon
+    as add_document returns. When the delta segment holds enough documents it is sealed, and becomes an
+    immutable segment. Deleted documents are tracked in a bitmap and filtered out when traversing posting
+    lists, and are physically purged when the segments they reside in get merged. Segments are merged in the
+    background by a worker thread, using a logarithmic merge policy: Whenever a number of adjacent segments
+    are of the same size class, they are merged into a single segment of the next size class. That keeps the
+    number of segments logarithmic in the size of the corpus, while each posting only gets rewritten a
+    logarithmic number of times.
+
+    Clients should do their lookups against a snapshot, which is unaffected by later updates and merges.
+    SimpleSearchEngine does this for every query.
+
+    Documents must be added in order of increasing document identifiers, just like for InMemoryCorpus. To
+    update a document, delete it and add it again under a new document identifier. The index only holds the
+    postings, so clients need to keep the corpus up to date themselves. Document frequencies include deleted
+    documents until these have been purged.
+    """
+
+    class Snapshot(InvertedIndex):
+        """
+        A read-only and consistent view of an UpdatableInMemoryInvertedIndex, at some point in time.
+        """
+
+        def __init__(self, normalizer: Normalizer, tokenizer: Tokenizer,
+                     segments: Tuple[Tuple[int, int, Dict[str, PostingList]], ...], delta: Dict[str, List[Posting]],
+                     end: int, deleted: bytearray, fields: List[str], document_lengths: List[array]):
+            self.__normalizer = normalizer
+            self.__tokenizer = tokenizer
+            self.__segments = segments  # Immutable segments, ordered by document identifier.
+            self.__delta = delta  # Might get appended to later, so ignore postings at or beyond the end.
+            self.__end = end  # Documents with identifiers from here and on were added after the snapshot.
+            self.__deleted = deleted  # Never changed in place, so we can share it.
+            self.__has_deletions = any(deleted)
+            self.__fields = fields
+            self.__document_lengths = document_lengths
+
+        def __get_delta(self, term: str) -> List[Posting]:
+            """
+            Returns the term's postings in the delta segment, as seen from the snapshot.
+            """
+            postings = self.__delta.get(term, [])
+            count = len(postings)
+            while count > 0 and postings[count - 1].document_id >= self.__end:
+                count -= 1
+            return postings[:count] if count < len(postings) else postings
+
+        def is_deleted(self, document_id: int) -> bool:
+            """
+            Returns True iff the given document had been deleted when the snapshot was taken.
+            """
+            i = document_id >> 3
+            return i < len(self.__deleted) and bool(self.__deleted[i] & (1 << (document_id & 7)))
+
+        def get_terms(self, buffer: str) -> Iterator[str]:
+            return _get_terms(buffer, self.__normalizer, self.__tokenizer)
+
+        def get_postings_iterator(self, term: str) -> Iterator[Posting]:
+            # The segments cover consecutive document identifier ranges, so we can just chain them.
+            iterators = [iter(postings[term]) for (_, _, postings) in self.__segments if term in postings]
+            iterators.append(iter(self.__get_delta(term)))
+            postings = itertools.chain(*iterators)
+            if not self.__has_deletions:
+                return postings
+            return (posting for posting in postings if not self.is_deleted(posting.document_id))
+
+        def get_document_frequency(self, term: str) -> int:
+            frequencies = (postings[term].get_length() for (_, _, postings) in self.__segments if term in postings)
+            return sum(frequencies) + len(self.__get_delta(term))
+
+        def get_document_lengths(self, field: Optional[str] = None) -> array:
+            if field is not None:
+                assert field in self.__fields
+                return self.__document_lengths[self.__fields.index(field)]
+            return array("I", map(sum, zip(*self.__document_lengths))) if self.__fields else array("I")
+
+        def get_max_term_frequency(self, term: str) -> int:
+            frequencies = [postings[term].get_max_term_frequency() for (_, _, postings) in self.__segments
+                           if term in postings]
+            frequencies.extend(posting.term_frequency for posting in self.__get_delta(term))
+            return max(frequencies, default=0)
+
+    def __init__(self, corpus: Corpus, fields: Iterable[str], normalizer: Normalizer, tokenizer: Tokenizer,
+                 compressed: bool = False, buffer_size: int = 1000, merge_factor: int = 4):
+        assert buffer_size > 0
+        assert merge_factor > 1
+        self.__normalizer = normalizer
+        self.__tokenizer = tokenizer
+        self.__compressed = compressed
+        self.__buffer_size = buffer_size
+        self.__merge_factor = merge_factor
+        self.__fields = list(fields)
+        self.__lock = threading.Lock()  # Guards all the state below.
+        self.__segments: List[Tuple[int, int, Dict[str, PostingList]]] = []  # (Start, end, posting lists) triples.
+        self.__delta: Dict[str, List[Posting]] = {}  # Only ever appended to, so that snapshots can share it.
+        self.__delta_start = 0  # The smallest document identifier the delta segment can hold.
+        self.__delta_size = 0  # The number of documents in the delta segment.
+        self.__end = 0  # One past the largest document identifier added so far.
+        self.__deleted = bytearray()  # One bit per document. Copied on write, so that snapshots can share it.
+        self.__document_lengths = [array("B") for _ in self.__fields]  # Number of terms per document, per field.
+        self.__executor = ThreadPoolExecutor(max_workers=1)  # A single worker, so that merges never overlap.
+        self.__merges: List[Future] = []  # Merges that are scheduled or running.
+        self.__generation = 0  # Bumped on every change, including merges since these purge deleted documents.
+
+        # The initial corpus goes into a single segment.
+        with self.__lock:
+            for document in corpus:
+                self.__add_document(document)
+            self.__seal()
+
+    def __repr__(self):
+        snapshot = self.snapshot()
+        return str({term: list(snapshot[term]) for term in self.get_vocabulary()})
+
+    def __create_posting_list(self) -> PostingList:
+        """
+        Creates a new and empty posting list, of the type we've been configured to use.
+        """
+        return CompressedInMemoryPostingList() if self.__compressed else InMemoryPostingList()
+
+    def __add_document(self, document: Document) -> None:
+        """
+        Inverts the given document into the delta segment. Assumes that we hold the lock.
+        """
+        assert document.document_id >= self.__end
+        values = [document.get_field(f, "") for f in self.__fields]
+        (postings, lengths) = _get_postings(document.document_id, values, self.__normalizer, self.__tokenizer, False)
+        _set_document_lengths(self.__document_lengths, document.document_id, lengths)
+        for (term, posting) in postings:
+            self.__delta.setdefault(term, []).append(posting)
+        self.__delta_size += 1
+        self.__end = document.document_id + 1
+        self.__generation += 1
+
+    def __seal(self) -> None:
+        """
+        Turns the delta segment into an immutable segment, and starts afresh with an empty delta segment.
+        Assumes that we hold the lock.
+        """
+        if self.__delta_size > 0:
+            postings = {}
+            for (term, delta) in self.__delta.items():
+                posting_list = self.__create_posting_list()
+                for posting in delta:
+                    posting_list.append_posting(posting)
+                posting_list.finalize_postings()
+                postings[term] = posting_list
+            self.__segments.append((self.__delta_start, self.__end, postings))
+        self.__delta = {}
+        self.__delta_start = self.__end
+        self.__delta_size = 0
+
+    def __get_size_class(self, segment: Tuple[int, int, Dict[str, PostingList]]) -> int:
+        """
+        Returns the size class of the given segment, i.e., roughly the logarithm of its size. A sealed delta
+        segment is in size class 0, and merging segments of size class k produces a segment of size class k + 1.
+        """
+        (start, end, _) = segment
+        (size_class, size) = (0, self.__buffer_size)
+        while end - start > size:
+            size_class += 1
+            size *= self.__merge_factor
+        return size_class
+
+    def __find_merge(self) -> Optional[List[Tuple[int, int, Dict[str, PostingList]]]]:
+        """
+        Applies the merge policy, and returns the segments to merge next, if any. Assumes that we hold the lock.
+        """
+        size_classes = [self.__get_size_class(segment) for segment in self.__segments]
+        for i in range(len(size_classes) - self.__merge_factor + 1):
+            if len(set(size_classes[i:(i + self.__merge_factor)])) == 1:
+                return self.__segments[i:(i + self.__merge_factor)]
+        return None
+
+    def __merge(self) -> None:
+        """
+        Merges segments until the merge policy is satisfied. Runs on the worker thread. We don't hold the
+        lock while doing the actual merging, so queries and updates can proceed meanwhile.
+        """
+        while True:
+            with self.__lock:
+                segments = self.__find_merge()
+                if segments is None:
+                    return
+                snapshot = self.__snapshot()
+
+            # Since the segments cover consecutive document identifier ranges, merging the posting lists for
+            # a term reduces to appending them one after the other. Purge deleted documents while we're at it.
+            postings = {}
+            for term in set(itertools.chain.from_iterable(p.keys() for (_, _, p) in segments)):
+                posting_list = self.__create_posting_list()
+                for (_, _, p) in segments:
+                    for posting in p.get(term, []):
+                        if not snapshot.is_deleted(posting.document_id):
+                            posting_list.append_posting(posting)
+                posting_list.finalize_postings()
+                if posting_list.get_length() > 0:
+                    postings[term] = posting_list
+            merged = (segments[0][0], segments[-1][1], postings)
+
+            # Only the worker thread removes segments, so the merged ones are still where we found them.
+            with self.__lock:
+                i = next(i for (i, segment) in enumerate(self.__segments) if segment is segments[0])
+                self.__segments[i:(i + len(segments))] = [merged]
+                self.__generation += 1
+
+    def __schedule_merges(self) -> None:
+        """
+        Asks the worker thread to merge segments, if needed. Assumes that we hold the lock.
+        """
+        self.__merges = [merge for merge in self.__merges if not merge.done()]
+        if self.__find_merge() is not None:
+            self.__merges.append(self.__executor.submit(self.__merge))
+
+    def add_document(self, document: Document) -> None:
+        """
+        Adds the given document to the index. The document is searchable as soon as this method returns.
+        Documents must be added in order of increasing document identifiers.
+        """
+        assert document is not None
+        with self.__lock:
+            self.__add_document(document)
+            if self.__delta_size >= self.__buffer_size:
+                self.__seal()
+                self.__schedule_merges()
+
+    def delete_document(self, document_id: int) -> None:
+        """
+        Deletes the given document from the index. Deleting a document that doesn't exist has no effect.
+        """
+        assert document_id >= 0
+        with self.__lock:
+            if document_id < self.__end:
+                deleted = bytearray(self.__deleted)
+                if (document_id >> 3) >= len(deleted):
+                    deleted.extend(bytes((document_id >> 3) + 1 - len(deleted)))
+                deleted[document_id >> 3] |= 1 << (document_id & 7)
+                self.__deleted = deleted
+                self.__generation += 1
+
+    def flush(self) -> None:
+        """
+        Seals the delta segment, regardless of how many documents it holds, and merges segments if needed.
+        """
+        with self.__lock:
+            self.__seal()
+            self.__schedule_merges()
+
+    def wait_for_merges(self) -> None:
+        """
+        Blocks until all merges that have been scheduled have completed. Facilitates testing.
+        """
+        while True:
+            with self.__lock:
+                merges = [merge for merge in self.__merges if not merge.done()]
+            if not merges:
+                return
+            for merge in merges:
+                merge.result()
+
+    def close(self) -> None:
+        """
+        Waits for any ongoing merges to complete, and shuts down the worker thread.
+        """
+        self.__executor.shutdown(wait=True)
+
+    def get_generation(self) -> int:
+        with self.__lock:
+            return self.__generation
+
+    def get_segment_count(self) -> int:
+        """
+        Returns the number of immutable segments that the index currently consists of.
+        """
+        with self.__lock:
+            return len(self.__segments)
+
+    def __snapshot(self) -> InvertedIndex:
+        """
+        Takes a snapshot of the index. Assumes that we hold the lock.
+        """
+        return __class__.Snapshot(self.__normalizer, self.__tokenizer, tuple(self.__segments), self.__delta,
+                                  self.__end, self.__deleted, self.__fields, self.__document_lengths)
+
+    def snapshot(self) -> InvertedIndex:
+        with self.__lock:
+            return self.__snapshot()
+
+    def get_vocabulary(self) -> Iterator[str]:
+        """
+        Returns an iterator over all the terms that have been indexed, sorted. Includes terms that only
+        occur in deleted documents that have not yet been purged.
+        """
+        with self.__lock:
+            terms = set(self.__delta.keys())
+            for (_, _, postings) in self.__segments:
+                terms.update(postings.keys())
+        return iter(sorted(terms))
+
+    def get_terms(self, buffer: str) -> Iterator[str]:
+        return _get_terms(buffer, self.__normalizer, self.__tokenizer)
+
+    def get_postings_iterator(self, term: str) -> Iterator[Posting]:
+        return self.snapshot().get_postings_iterator(term)
+
+    def get_document_frequency(self, term: str) -> int:
+        return self.snapshot().get_document_frequency(term)
+
+    def get_document_lengths(self, field: Optional[str] = None) -> array:
+        return self.snapshot().get_document_lengths(field)
+
+    def get_max_term_frequency(self, term: str) -> int:
+        return self.snapshot().get_max_term_frequency(term)
+
+
+class MemoryMappedInvertedIndex(InvertedIndex):
+    """
+    A read-only inverted index that resides in a single file on disk, and that is accessed
+    via memory mapping. Opening the index is O(1) in the size of the indexed corpus, and
+    resident memory is bounded by the operating system's page cache rather than by the
+    Python object overhead of posting lists.
+
+    The file layout, with all integers little-endian, is as follows:
+
+       [header]       Magic, version, term count, and the offsets of the three segments below.
+       [dictionary]   All terms, UTF-8 encoded and concatenated, sorted in byte order.
+       [postings]     All posting lists, concatenated. Each posting list is gap encoded and
+                      variable-byte encoded, identically to CompressedInMemoryPostingList.
+       [offsets]      One fixed-width entry per term, in dictionary order, that locates the
+                      term and its posting list, and that holds the term's document frequency.
+       [lengths]      The number of fields and documents, the length-prefixed UTF-8 encoded
+                      field names, and then the number of terms per document for each field,
+                      as 32-bit integers.
+
+    Since the offsets table has fixed-width entries and the terms are sorted, term lookups
+    are done by binary search directly over the mapped file.
+    """
+
+    __magic = b"IN3120MI"
+    __version = 2
+    __header = struct.Struct("<8sIIQQQQ")  # Magic, version, term count, and segment offsets.
+    __counts = struct.Struct("<II")  # The number of fields and documents in the lengths segment.
+    __length = struct.Struct("<I")  # The length of a field name.
+    __entry = struct.Struct("<QIQQI")  # Term offset and length, postings offset and length, and df.
+
+    def __init__(self, filename: str, normalizer: Normalizer, tokenizer: Tokenizer):
+        self.__normalizer = normalizer
+        self.__tokenizer = tokenizer
+        with open(filename, mode="rb") as file:
+            self.__data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.__term_count, _, _, self.__table_offset, offset) = \
+            __class__.__header.unpack_from(self.__data, 0)
+        if magic != __class__.__magic or version != __class__.__version:
+            self.close()
+            raise IOError("Unsupported index format")
+        (field_count, self.__document_count) = __class__.__counts.unpack_from(self.__data, offset)
+        offset += __class__.__counts.size
+        self.__fields = []  # The names of the indexed fields.
+        for _ in range(field_count):
+            (length,) = __class__.__length.unpack_from(self.__data, offset)
+            offset += __class__.__length.size
+            self.__fields.append(self.__data[offset:(offset + length)].decode("utf-8"))
+            offset += length
+        self.__lengths_offset = offset  # Where the document lengths of the first field start.
+
+    def __repr__(self):
+        return str({term: list(self.get_postings_iterator(term)) for term in self.get_vocabulary()})
+
+    def __enter__(self) -> "MemoryMappedInvertedIndex":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Releases the memory mapping. The index can't be used afterwards, and any posting list
+        iterators obtained from it need to have been released first.
+        """
+        self.__data.close()
+
+    @staticmethod
+    def write(filename: str, index: InMemoryInvertedIndex) -> None:
+        """
+        Serializes the given inverted index to the named file, so that it can later be
+        opened and memory mapped. Only the dictionary and the posting lists are written,
+        i.e., the normalizer and tokenizer need to be supplied again when opening the file.
+        """
+        terms = sorted((term.encode("utf-8") for term in index.get_vocabulary()))
+        entries = []
+        with open(filename, mode="wb") as file:
+
+            # We don't know the segment offsets until we've written the segments, so
+            # reserve room for the header now and fill it in at the end.
+            file.write(bytes(__class__.__header.size))
+
+            # The dictionary segment.
+            terms_offset = file.tell()
+            for term in terms:
+                entries.append([file.tell(), len(term)])
+                file.write(term)
+
+            # The postings segment. Encode one posting list at a time, to bound memory usage.
+            postings_offset = file.tell()
+            for (term, entry) in zip(terms, entries):
+                numbers = []
+                previous_document_id = 0
+                for posting in index.get_postings_iterator(term.decode("utf-8")):
+                    numbers.extend((posting.document_id - previous_document_id, posting.term_frequency))
+                    previous_document_id = posting.document_id
+                data = bytearray()
+                VariableByteCodec.encode_many(numbers, data)
+                entry.extend((file.tell(), len(data), len(numbers) // 2))
+                file.write(data)
+
+            # The offsets table.
+            table_offset = file.tell()
+            for entry in entries:
+                file.write(__class__.__entry.pack(*entry))
+
+            # The document lengths, per field.
+            lengths_offset = file.tell()
+            fields = index.get_fields()
+            document_count = len(index.get_document_lengths())
+            file.write(__class__.__counts.pack(len(fields), document_count))
+            for field in fields:
+                name = field.encode("utf-8")
+                file.write(__class__.__length.pack(len(name)))
+                file.write(name)
+            for field in fields:
+                lengths = index.get_document_lengths(field)
+                file.write(struct.pack(f"<{document_count}I", *lengths, *([0] * (document_count - len(lengths)))))
+
+            # Go back and fill in the header.
+            file.seek(0)
+            file.write(__class__.__header.pack(__class__.__magic, __class__.__version, len(terms),
+                                               terms_offset, postings_offset, table_offset, lengths_offset))
+
+    def __get_entry(self, i: int) -> Tuple[int, int, int, int, int]:
+        """
+        Returns the i-th entry in the offsets table.
+        """
+        return __class__.__entry.unpack_from(self.__data, self.__table_offset + i * __class__.__entry.size)
+
+    def __get_term(self, entry: Tuple[int, int, int, int, int]) -> bytes:
+        """
+        Returns the UTF-8 encoded term that the given offsets table entry refers to.
+        """
+        return self.__data[entry[0]:(entry[0] + entry[1])]
+
+    def __lookup(self, term: str) -> Optional[Tuple[int, int, int, int, int]]:
+        """
+        Locates the offsets table entry for the given term, if any. Does a binary search
+        directly over the memory mapped file, since terms are stored sorted.
+        """
+        needle = term.encode("utf-8")
+        left = 0
+        right = self.__term_count
+        while left < right:
+            middle = (left + right) // 2
+            if self.__get_term(self.__get_entry(middle)) < needle:
+                left = middle + 1
+            else:
+                right = middle
+        if left < self.__term_count:
+            entry = self.__get_entry(left)
+            if self.__get_term(entry) == needle:
+                return entry
+        return None
+
+    def get_vocabulary(self) -> Iterator[str]:
+        """
+        Returns an iterator over all the terms that have been indexed, sorted.
+        """
+        return (self.__get_term(self.__get_entry(i)).decode("utf-8") for i in range(self.__term_count))
+
+    def get_terms(self, buffer: str) -> Iterator[str]:
+        return _get_terms(buffer, self.__normalizer, self.__tokenizer)
+
+    def get_postings_iterator(self, term: str) -> Iterator[Posting]:
+        # Decode straight out of the mapped file. The memory view slice doesn't copy anything.
+        entry = self.__lookup(term)
+        if entry is None:
+            return iter([])
+        data = memoryview(self.__data)[entry[2]:(entry[2] + entry[3])]
+        return CompressedInMemoryPostingList.CompressedInMemoryPostingListIterator(data)
+
+    def get_document_frequency(self, term: str) -> int:
+        # Stored explicitly in the offsets table, so we don't need to touch the posting list.
+        entry = self.__lookup(term)
+        return 0 if entry is None else entry[4]
+
+    def get_document_lengths(self, field: Optional[str] = None) -> array:
+        if field is None:
+            fields = [self.get_document_lengths(f) for f in self.__fields]
+            return array("I", map(sum, zip(*fields))) if fields else array("I")
+        assert field in self.__fields
+        start = self.__lengths_offset + 4 * self.__document_count * self.__fields.index(field)
+        return array("I", struct.unpack_from(f"<{self.__document_count}I", self.__data, start))
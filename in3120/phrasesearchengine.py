@@ -0,0 +1,82 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import re
+from typing import Iterator, Dict, Any, List
+from .sieve import Sieve
+from .corpus import Corpus
+from .invertedindex import InvertedIndex
+from .posting import PositionalPosting
+from .postingsmerger import PostingsMerger
+
+
+class PhraseSearchEngine:
+    """
+    Realizes a query evaluator for phrase and proximity queries over a positional inverted index. The
+    query language is simple:
+
+       "a b c"                   The phrase "a b c". The quotes are optional.
+       "a b" NEAR/k "c d"        The phrases "a b" and "c d", starting at most k positions apart, in
+                                 either order. Operators can be chained, and are evaluated left to right.
+
+    As opposed to the SuffixArray class, we don't need a copy of the normalized corpus to answer
+    phrase queries, and evaluation time is proportional to the lengths of the involved posting lists
+    and not to the length of the text. The inverted index must have been built with positions.
+    """
+
+    # Splits a query into its operands and the distances for the NEAR operators in between.
+    __near = re.compile(r"\s+NEAR/(\d+)\s+")
+
+    def __init__(self, corpus: Corpus, inverted_index: InvertedIndex):
+        self.__corpus = corpus
+        self.__inverted_index = inverted_index
+
+    def __phrase(self, buffer: str) -> Iterator[PositionalPosting]:
+        """
+        Returns an iterator over the positional postings for the phrase in the given buffer, where the
+        positions are the positions where the phrase starts. The empty phrase matches nothing.
+        """
+        terms = list(self.__inverted_index.get_terms(buffer.strip().strip('"')))
+        if not terms:
+            return iter([])
+        postings = self.__inverted_index[terms[0]]
+        for term in terms[1:]:
+            postings = PostingsMerger.positional_intersection(postings, self.__inverted_index[term], 1)
+        if len(terms) == 1:
+            return postings
+        shift = len(terms) - 1
+        return (PositionalPosting(p.document_id, [i - shift for i in p.positions]) for p in postings)
+
+    def __parse(self, query: str) -> Iterator[PositionalPosting]:
+        """
+        Parses the given query and returns an iterator over the positional postings that match it.
+        """
+        parts: List[str] = __class__.__near.split(query)
+        postings = self.__phrase(parts[0])
+        for i in range(1, len(parts), 2):
+            k = int(parts[i])
+            if k == 0:
+                return iter([])
+            postings = PostingsMerger.positional_intersection(postings, self.__phrase(parts[i + 1]), k, False)
+        return postings
+
+    def evaluate(self, query: str, options: dict) -> Iterator[Dict[str, Any]]:
+        """
+        Evaluates the given phrase or proximity query. The matching documents are ranked according to how
+        many times the query matches in the document, and only the "best" matches are yielded back to the
+        client. Ties are resolved arbitrarily.
+
+        The client can supply a dictionary of options that controls this query evaluation process: The maximum
+        number of documents to return to the client is controlled via the "hit_count" (int) option.
+
+        The results yielded back to the client are dictionaries having the keys "score" (int) and
+        "document" (Document).
+        """
+        debug = options.get("debug", False)
+        sieve = Sieve(max(1, min(100, options.get("hit_count", 10))))
+        for posting in self.__parse(query):
+            if debug:
+                print("*** MATCH", posting)
+            sieve.sift(posting.term_frequency, posting.document_id)
+        for (score, document_id) in sieve.winners():
+            yield {"score": score, "document": self.__corpus.get_document(document_id)}
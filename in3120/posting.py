@@ -1,14 +1,18 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-from typing import Dict, Any
+from typing import Any, Dict, List
 
 
 class Posting:
     """
     A very simple posting entry in a non-positional inverted index.
+
+    Posting lists may hold huge numbers of postings, so we avoid a per-instance dictionary.
     """
 
+    __slots__ = ("document_id", "term_frequency")
+
     def __init__(self, document_id: int, term_frequency: int):
         self.document_id = document_id
         self.term_frequency = term_frequency
@@ -24,3 +28,23 @@ class Posting:
         Facilitates JSON serialization.
         """
         return {"document_id": self.document_id, "term_frequency": self.term_frequency}
+
+
+class PositionalPosting(Posting):
+    """
+    A posting entry in a positional inverted index. In addition to the document identifier,
+    we keep track of the sorted positions within the document where the term occurs. The term
+    frequency is implied by the number of positions.
+    """
+
+    __slots__ = ("positions",)
+
+    def __init__(self, document_id: int, positions: List[int]):
+        super().__init__(document_id, len(positions))
+        self.positions = positions
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Facilitates JSON serialization.
+        """
+        return {"document_id": self.document_id, "term_frequency": self.term_frequency, "positions": self.positions}
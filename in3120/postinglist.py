@@ -1,9 +1,14 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import sys
 from abc import ABC, abstractmethod
-from typing import Iterator, List
-from .posting import Posting
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Iterator, List, Optional, Tuple, Type
+from .integercodec import IntegerCodec
+from .posting import Posting, PositionalPosting
 from .variablebytecodec import VariableByteCodec
 
 
@@ -12,6 +17,8 @@ class PostingList(ABC):
     Abstract base class for a simple posting list.
     """
 
+    __slots__ = ()
+
     def __iter__(self):
         return self.get_iterator()
 
@@ -25,6 +32,14 @@ class PostingList(ABC):
         """
         pass
 
+    @abstractmethod
+    def get_max_term_frequency(self) -> int:
+        """
+        Returns the largest term frequency across all postings in the posting list, or 0 if the
+        posting list is empty. Useful for computing upper bounds on score contributions.
+        """
+        pass
+
     @abstractmethod
     def get_iterator(self) -> Iterator[Posting]:
         """
@@ -32,6 +47,20 @@ class PostingList(ABC):
         """
         pass
 
+    def get_arrays(self) -> Tuple[array, array]:
+        """
+        Returns the posting list as a pair of parallel arrays, holding the document identifiers and
+        the term frequencies, respectively. Useful for clients that process complete posting lists
+        at a time. Implementations that store their postings column-wise should override this method,
+        since the default implementation has to materialize every posting.
+        """
+        document_ids = array("I")
+        term_frequencies = array("I")
+        for posting in self.get_iterator():
+            document_ids.append(posting.document_id)
+            term_frequencies.append(posting.term_frequency)
+        return (document_ids, term_frequencies)
+
     @abstractmethod
     def append_posting(self, posting: Posting) -> None:
         """
@@ -52,23 +81,51 @@ class PostingList(ABC):
 class InMemoryPostingList(PostingList):
     """
     A simple in-memory implementation of a posting list.
+
+    Rather than keeping a Posting object per posting, the document identifiers and the term
+    frequencies are stored column-wise in parallel arrays, at 8 bytes per posting. Posting objects
+    are only created on the fly when the posting list is iterated over. If positional postings are
+    appended, their positions are kept in a separate list.
     """
 
+    __slots__ = ("__document_ids", "__term_frequencies", "__positions", "__max_term_frequency")
+
     def __init__(self):
-        self.__postings : List[Posting] = []
+        self.__document_ids = array("I")
+        self.__term_frequencies = array("I")
+        self.__positions: Optional[List[List[int]]] = None  # Only present if the postings are positional.
+        self.__max_term_frequency = 0  # The largest term frequency seen so far.
 
     def get_length(self) -> int:
-        return len(self.__postings)
+        return len(self.__document_ids)
+
+    def get_max_term_frequency(self) -> int:
+        return self.__max_term_frequency
 
     def get_iterator(self) -> Iterator[Posting]:
-        return iter(self.__postings)
+        if self.__positions is not None:
+            return map(PositionalPosting, self.__document_ids, self.__positions)
+        return map(Posting, self.__document_ids, self.__term_frequencies)
+
+    def get_arrays(self) -> Tuple[array, array]:
+        # No copying. Clients must not modify the arrays.
+        return (self.__document_ids, self.__term_frequencies)
 
     def append_posting(self, posting: Posting) -> None:
-        assert len(self.__postings) == 0 or self.__postings[-1].document_id < posting.document_id
-        self.__postings.append(posting)
+        assert len(self.__document_ids) == 0 or self.__document_ids[-1] < posting.document_id
+        assert (self.__positions is not None) == isinstance(posting, PositionalPosting) or not self.__document_ids
+        self.__document_ids.append(posting.document_id)
+        self.__term_frequencies.append(posting.term_frequency)
+        self.__max_term_frequency = max(self.__max_term_frequency, posting.term_frequency)
+        if isinstance(posting, PositionalPosting):
+            if self.__positions is None:
+                self.__positions = []
+            self.__positions.append(posting.positions)
 
     def finalize_postings(self) -> None:
-        pass
+        # The arrays overallocate as they grow. Copying them gets rid of the slack.
+        self.__document_ids = array("I", self.__document_ids)
+        self.__term_frequencies = array("I", self.__term_frequencies)
 
 
 class CompressedInMemoryPostingList(PostingList):
@@ -82,42 +139,274 @@ class CompressedInMemoryPostingList(PostingList):
         A custom iterator that decodes the compressed integers as we traverse the underlying byte
         array. The decoding logic needs to mirror the encoding logic that happens when postings are
         appended to the byte array.
+
+        Rather than decoding one integer at a time, we decode a chunk of postings in one pass and
+        serve subsequent postings from the decoded chunk.
         """
 
+        # The number of postings we decode in one go.
+        __chunk_size = 128
+
         def __init__(self, data: bytearray):
             self.__data = data  # The buffer holding all the compressed posting data.
             self.__where = 0  # Our current position in the buffer.
             self.__document_id = 0  # We encoded the gaps, so accumulate them when decoding.
+            self.__numbers = array("I")  # The current decoded chunk, as alternating (gap, term frequency) pairs.
+            self.__position = 0  # Our current position in the decoded chunk.
 
         def __next__(self) -> Posting:
-            if self.__where < len(self.__data):
-                (gap, increment) = VariableByteCodec.decode(self.__data, self.__where)
-                self.__where += increment
-                self.__document_id += gap
-                (term_frequency, increment) = VariableByteCodec.decode(self.__data, self.__where)
+            if self.__position >= len(self.__numbers):
+                if self.__where >= len(self.__data):
+                    raise StopIteration
+                (self.__numbers, increment) = VariableByteCodec.decode_many(self.__data, 2 * __class__.__chunk_size,
+                                                                            self.__where)
                 self.__where += increment
-                return Posting(self.__document_id, term_frequency)
-            else:
-                raise StopIteration
+                self.__position = 0
+            self.__document_id += self.__numbers[self.__position]
+            term_frequency = self.__numbers[self.__position + 1]
+            self.__position += 2
+            return Posting(self.__document_id, term_frequency)
 
     def __init__(self):
         self.__logical_length = 0  # The number of posting entries encoded in the byte array.
         self.__previous_document_id = 0  # So that we can gap encode.
+        self.__max_term_frequency = 0  # The largest term frequency seen so far.
         self.__data = bytearray()  # All posting entries, compressed.
 
     def get_length(self) -> int:
         return self.__logical_length
 
+    def get_max_term_frequency(self) -> int:
+        return self.__max_term_frequency
+
     def get_iterator(self) -> Iterator[Posting]:
         return __class__.CompressedInMemoryPostingListIterator(self.__data)
 
     def append_posting(self, posting: Posting) -> None:
         assert self.__logical_length == 0 or posting.document_id > self.__previous_document_id
         gap = posting.document_id - self.__previous_document_id
-        VariableByteCodec.encode(gap, self.__data)
-        VariableByteCodec.encode(posting.term_frequency, self.__data)
+        VariableByteCodec.encode_many((gap, posting.term_frequency), self.__data)
+        self.__logical_length += 1
+        self.__previous_document_id = posting.document_id
+        self.__max_term_frequency = max(self.__max_term_frequency, posting.term_frequency)
+
+    def finalize_postings(self) -> None:
+        pass
+
+
+class CompressedInMemoryPositionalPostingList(PostingList):
+    """
+    A compressed posting list for a positional inverted index. Each posting is encoded as
+    its document identifier gap and its term frequency, followed by the gap encoded positions
+    within the document. All numbers are variable-byte encoded. See Section 5.3.1 in
+    https://nlp.stanford.edu/IR-book/pdf/05comp.pdf for why gap encoding positions pays off.
+    """
+
+    class CompressedInMemoryPositionalPostingListIterator(Iterator[PositionalPosting]):
+        """
+        A custom iterator that decodes the compressed integers as we traverse the underlying byte
+        array. The decoding logic needs to mirror the encoding logic that happens when postings are
+        appended to the byte array.
+        """
+
+        def __init__(self, data: bytearray, length: int):
+            self.__data = data  # The buffer holding all the compressed posting data.
+            self.__remaining = length  # The number of postings we have yet to decode.
+            self.__where = 0  # Our current position in the buffer.
+            self.__document_id = 0  # We encoded the gaps, so accumulate them when decoding.
+
+        def __next__(self) -> PositionalPosting:
+            if self.__remaining == 0:
+                raise StopIteration
+            ((gap, term_frequency), increment) = VariableByteCodec.decode_many(self.__data, 2, self.__where)
+            self.__where += increment
+            (gaps, increment) = VariableByteCodec.decode_many(self.__data, term_frequency, self.__where)
+            self.__where += increment
+            self.__remaining -= 1
+            self.__document_id += gap
+            return PositionalPosting(self.__document_id, list(accumulate(gaps)))
+
+    def __init__(self):
+        self.__logical_length = 0  # The number of posting entries encoded in the byte array.
+        self.__previous_document_id = 0  # So that we can gap encode.
+        self.__max_term_frequency = 0  # The largest term frequency seen so far.
+        self.__data = bytearray()  # All posting entries, compressed.
+
+    def get_length(self) -> int:
+        return self.__logical_length
+
+    def get_max_term_frequency(self) -> int:
+        return self.__max_term_frequency
+
+    def get_iterator(self) -> Iterator[PositionalPosting]:
+        return __class__.CompressedInMemoryPositionalPostingListIterator(self.__data, self.__logical_length)
+
+    def append_posting(self, posting: PositionalPosting) -> None:
+        assert self.__logical_length == 0 or posting.document_id > self.__previous_document_id
+        assert len(posting.positions) == posting.term_frequency
+        gap = posting.document_id - self.__previous_document_id
+        numbers = [gap, posting.term_frequency]
+        numbers.extend(b - a for (a, b) in zip([0] + posting.positions, posting.positions))
+        VariableByteCodec.encode_many(numbers, self.__data)
         self.__logical_length += 1
         self.__previous_document_id = posting.document_id
+        self.__max_term_frequency = max(self.__max_term_frequency, posting.term_frequency)
 
     def finalize_postings(self) -> None:
         pass
+
+
+class BlockCompressedInMemoryPostingList(PostingList):
+    """
+    A compressed posting list that is divided into fixed-size blocks of postings, to support
+    skipping. Within a block, postings are gap encoded, and the gaps followed by the term
+    frequencies are compressed using a pluggable integer codec. Variable-byte encoding is used
+    by default. In addition, we keep a small header per block that holds the block's last
+    document identifier, the block's largest term frequency, and where in the byte array the
+    block starts.
+
+    The block headers act as skip pointers: To advance to a given document identifier we can
+    binary search the headers to locate the right block, and then only decode that block. See
+    Section 2.3 in https://nlp.stanford.edu/IR-book/pdf/02voc.pdf for more on skip pointers.
+
+    Since some codecs need to see a whole block at a time, postings are buffered until the
+    block fills up or until the posting list is finalized.
+
+    The largest term frequency per block enables block-max pruning during query evaluation,
+    as described in "Faster top-k document retrieval using block-max indexes" by Ding and Suel.
+    """
+
+    class BlockCompressedInMemoryPostingListIterator(Iterator[Posting]):
+        """
+        A custom iterator that decodes one block at a time as we traverse the underlying byte
+        array, and that can make use of the block headers to skip ahead.
+        """
+
+        def __init__(self, data: bytearray, last_document_ids: array, max_term_frequencies: array, offsets: array,
+                     length: int, block_size: int, codec: Type[IntegerCodec], pending: Tuple[List[int], List[int]]):
+            self.__data = data  # The buffer holding all the compressed posting data.
+            self.__last_document_ids = last_document_ids  # The last document identifier in each block.
+            self.__max_term_frequencies = max_term_frequencies  # The largest term frequency in each block.
+            self.__offsets = offsets  # Where in the buffer each block starts.
+            self.__length = length  # The number of postings we can iterate over.
+            self.__block_size = block_size  # The number of postings per block.
+            self.__codec = codec  # How the blocks are compressed.
+            self.__pending = pending  # The (gaps, term frequencies) in the last block, if not yet compressed.
+            self.__block_count = -(-length // block_size)  # The number of blocks we can iterate over.
+            self.__block = -1  # The block we have currently decoded, if any.
+            self.__document_ids = []  # The document identifiers in the current block.
+            self.__term_frequencies = array("I")  # The term frequencies in the current block.
+            self.__position = 0  # Our current position in the current block.
+
+        def __next__(self) -> Posting:
+            if self.__position >= len(self.__document_ids):
+                if self.__block + 1 >= self.__block_count:
+                    raise StopIteration
+                self.__decode_block(self.__block + 1)
+            posting = Posting(self.__document_ids[self.__position], self.__term_frequencies[self.__position])
+            self.__position += 1
+            return posting
+
+        def __decode_block(self, block: int) -> None:
+            """
+            Decodes the given block in one pass. The first gap in a block is relative to the last
+            document identifier in the previous block.
+            """
+            count = min(self.__block_size, self.__length - block * self.__block_size)
+            if block < len(self.__offsets) and (block + 1 < self.__block_count or not self.__pending[0]):
+                (numbers, _) = self.__codec.decode_many(self.__data, 2 * count, self.__offsets[block])
+                (gaps, term_frequencies) = (numbers[:count], numbers[count:])
+            else:
+                (gaps, term_frequencies) = self.__pending
+            base = self.__last_document_ids[block - 1] if block > 0 else 0
+            self.__document_ids = list(accumulate(gaps[:count], initial=base))[1:]
+            self.__term_frequencies = term_frequencies[:count]
+            self.__block = block
+            self.__position = 0
+
+        def skip_to(self, document_id: int) -> Optional[Posting]:
+            """
+            Advances the iterator and returns the first remaining posting having a document identifier
+            that is greater than or equal to the given one. Returns None if there is no such posting.
+            Blocks that cannot contain the target document identifier are skipped without being decoded.
+            """
+            block = max(self.__block, 0)
+            if block < self.__block_count and self.__last_document_ids[block] < document_id:
+                block = bisect_left(self.__last_document_ids, document_id, block + 1, self.__block_count)
+            if block >= self.__block_count:
+                self.__block = self.__block_count
+                self.__document_ids = []
+                return None
+            if block != self.__block:
+                self.__decode_block(block)
+            self.__position = bisect_left(self.__document_ids, document_id, self.__position)
+            return next(self, None)
+
+        def get_block_bound(self, document_id: int) -> Tuple[int, int]:
+            """
+            Locates the first remaining block that could contain the given document identifier, without
+            advancing the iterator or decoding anything. Returns a pair comprised of the last document
+            identifier in that block, and the largest term frequency in that block. If there is no such
+            block, we return (sys.maxsize, 0).
+            """
+            block = max(self.__block, 0)
+            block = bisect_left(self.__last_document_ids, document_id, block, self.__block_count)
+            if block >= self.__block_count:
+                return (sys.maxsize, 0)
+            return (self.__last_document_ids[block], self.__max_term_frequencies[block])
+
+    def __init__(self, block_size: int = 128, codec: Type[IntegerCodec] = VariableByteCodec):
+        assert block_size > 0
+        assert codec is not None
+        self.__block_size = block_size  # The number of postings per block.
+        self.__codec = codec  # How the blocks are compressed.
+        self.__logical_length = 0  # The number of posting entries, compressed or pending.
+        self.__previous_document_id = 0  # So that we can gap encode.
+        self.__data = bytearray()  # All posting entries in completed blocks, compressed.
+        self.__last_document_ids = array("I")  # Block headers, part 1: The last document identifier per block.
+        self.__max_term_frequencies = array("I")  # Block headers, part 2: The largest term frequency per block.
+        self.__offsets = array("I")  # Block headers, part 3: Where in the byte array each block starts.
+        self.__gaps = []  # The gaps in the current block, not yet compressed.
+        self.__term_frequencies = []  # The term frequencies in the current block, not yet compressed.
+
+    def get_length(self) -> int:
+        return self.__logical_length
+
+    def get_max_term_frequency(self) -> int:
+        return max(self.__max_term_frequencies, default=0)
+
+    def get_iterator(self) -> Iterator[Posting]:
+        pending = (list(self.__gaps), list(self.__term_frequencies))
+        return __class__.BlockCompressedInMemoryPostingListIterator(self.__data, self.__last_document_ids,
+                                                                     self.__max_term_frequencies, self.__offsets,
+                                                                     self.__logical_length, self.__block_size,
+                                                                     self.__codec, pending)
+
+    def append_posting(self, posting: Posting) -> None:
+        assert self.__logical_length == 0 or posting.document_id > self.__previous_document_id
+        # Keep the block headers up to date as we go, so that the list can be traversed at any time.
+        if self.__logical_length % self.__block_size == 0:
+            self.__offsets.append(len(self.__data))
+            self.__last_document_ids.append(posting.document_id)
+            self.__max_term_frequencies.append(posting.term_frequency)
+        else:
+            self.__last_document_ids[-1] = posting.document_id
+            self.__max_term_frequencies[-1] = max(self.__max_term_frequencies[-1], posting.term_frequency)
+        self.__gaps.append(posting.document_id - self.__previous_document_id)
+        self.__term_frequencies.append(posting.term_frequency)
+        self.__logical_length += 1
+        self.__previous_document_id = posting.document_id
+        if len(self.__gaps) == self.__block_size:
+            self.__compress_block()
+
+    def __compress_block(self) -> None:
+        """
+        Compresses the current block and appends it to the byte array.
+        """
+        self.__codec.encode_many(self.__gaps + self.__term_frequencies, self.__data)
+        self.__gaps = []
+        self.__term_frequencies = []
+
+    def finalize_postings(self) -> None:
+        if self.__gaps:
+            self.__compress_block()
@@ -1,8 +1,8 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-from typing import Iterator
-from .posting import Posting
+from typing import Iterator, List, Optional
+from .posting import Posting, PositionalPosting
 
 
 class PostingsMerger:
@@ -16,6 +16,23 @@ class PostingsMerger:
     a new one that produces an averaged value, or something else.
     """
 
+    @staticmethod
+    def skip_to(p: Iterator[Posting], document_id: int) -> Optional[Posting]:
+        """
+        Advances the given posting list iterator and returns the first remaining posting
+        having a document identifier that is greater than or equal to the given one, or
+        None if there is no such posting.
+
+        If the iterator has skip pointers, i.e., if it has a skip_to method of its own,
+        then that is used. Otherwise, we fall back to a linear scan.
+        """
+        if hasattr(p, "skip_to"):
+            return p.skip_to(document_id)
+        posting = next(p, None)
+        while posting is not None and posting.document_id < document_id:
+            posting = next(p, None)
+        return posting
+
     @staticmethod
     def intersection(p1: Iterator[Posting], p2: Iterator[Posting]) -> Iterator[Posting]:
         """
@@ -23,7 +40,8 @@ class PostingsMerger:
         iterators over these.
 
         The posting lists are assumed sorted in increasing order according
-        to the document identifiers.
+        to the document identifiers. If the iterators have skip pointers,
+        these are used so that we can avoid touching every posting.
         """
         posting1 = next(p1, None)
         posting2 = next(p2, None)
@@ -34,9 +52,9 @@ class PostingsMerger:
                 posting1 = next(p1, None)
                 posting2 = next(p2, None)
             elif posting1.document_id < posting2.document_id:
-                posting1 = next(p1, None)
+                posting1 = __class__.skip_to(p1, posting2.document_id)
             elif posting2.document_id < posting1.document_id:
-                posting2 = next(p2, None)
+                posting2 = __class__.skip_to(p2, posting1.document_id)
 
     @staticmethod
     def union(p1: Iterator[Posting], p2: Iterator[Posting]) -> Iterator[Posting]:
@@ -69,3 +87,55 @@ class PostingsMerger:
         while posting2 is not None:
             yield posting2
             posting2 = next(p2, None)
+
+    @staticmethod
+    def positional_intersection(p1: Iterator[PositionalPosting], p2: Iterator[PositionalPosting],
+                                k: int, ordered: bool = True) -> Iterator[PositionalPosting]:
+        """
+        A generator that yields a positional AND of two positional posting lists, given iterators
+        over these. See Figure 2.12 in https://nlp.stanford.edu/IR-book/pdf/02voc.pdf.
+
+        A position in the second posting list matches if there is a position in the first posting
+        list at most k positions before it. If the match is not ordered, the position in the first
+        posting list can also be at most k positions after it. For each document where there is at
+        least one match, we yield a posting holding the matching positions from the second posting
+        list. I.e., a phrase query "a b c" can be evaluated by chaining intersections with k = 1.
+
+        The posting lists are assumed sorted in increasing order according to the document
+        identifiers. If the iterators have skip pointers, these are used.
+        """
+        assert k > 0
+        posting1 = next(p1, None)
+        posting2 = next(p2, None)
+
+        while posting1 is not None and posting2 is not None:
+            if posting1.document_id == posting2.document_id:
+                positions = __class__.__match_positions(posting1.positions, posting2.positions, k, ordered)
+                if positions:
+                    yield PositionalPosting(posting2.document_id, positions)
+                posting1 = next(p1, None)
+                posting2 = next(p2, None)
+            elif posting1.document_id < posting2.document_id:
+                posting1 = __class__.skip_to(p1, posting2.document_id)
+            elif posting2.document_id < posting1.document_id:
+                posting2 = __class__.skip_to(p2, posting1.document_id)
+
+    @staticmethod
+    def __match_positions(positions1: List[int], positions2: List[int], k: int, ordered: bool) -> List[int]:
+        """
+        Returns the positions in the second list that have a position in the first list within
+        the allowed window. Both lists are sorted, so the window start only ever moves forward.
+        """
+        matches = []
+        i = 0
+        for position2 in positions2:
+            while i < len(positions1) and positions1[i] < position2 - k:
+                i += 1
+            limit = position2 - 1 if ordered else position2 + k
+            j = i
+            while j < len(positions1) and positions1[j] <= limit:
+                if positions1[j] != position2:
+                    matches.append(position2)
+                    break
+                j += 1
+        return matches
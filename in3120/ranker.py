@@ -1,7 +1,10 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import math
+import numpy as np
 from abc import ABC, abstractmethod
+from typing import List, Tuple
 from .posting import Posting
 
 
@@ -10,6 +13,15 @@ class Ranker(ABC):
     Abstract base class for rankers used together with document-at-a-time traversal.
     """
 
+    def prepare(self, terms: List[Tuple[str, int]]) -> None:
+        """
+        Prepares the ranker for evaluating a new query, given as (term, multiplicity) pairs for
+        the query's unique terms. Invoked once per query before any documents are evaluated, so
+        that per-term computations need not be repeated per posting. The default implementation
+        does nothing.
+        """
+        pass
+
     @abstractmethod
     def reset(self, document_id: int) -> None:
         """
@@ -36,6 +48,42 @@ class Ranker(ABC):
         """
         pass
 
+    def get_upper_bound(self, term: str, multiplicity: int, max_term_frequency: int) -> float:
+        """
+        Returns an upper bound on how much a posting for the given query term can contribute
+        to a document's relevancy score, given an upper bound on the posting's term frequency.
+        Used for dynamic pruning, where documents that provably can't make it into the result
+        set are skipped. The default implementation returns infinity, i.e., no pruning.
+        """
+        return math.inf
+
+    def get_static_upper_bound(self) -> float:
+        """
+        Returns an upper bound on how much a document's relevancy score can exceed the sum of
+        its terms' contributions, e.g., due to a static document score. Used for dynamic pruning
+        together with get_upper_bound.
+        """
+        return 0.0
+
+    def get_contributions(self, term: str, multiplicity: int, document_ids: np.ndarray,
+                          term_frequencies: np.ndarray) -> np.ndarray:
+        """
+        Returns how much each of the postings for the given query term contributes to the relevancy
+        scores of the documents they refer to, given as parallel arrays. Used for term-at-a-time
+        evaluation, where a document's relevancy score is the sum of the contributions from each
+        query term, plus its static contribution. Only rankers whose scores decompose that way can
+        support this.
+        """
+        raise NotImplementedError("Ranker does not support term-at-a-time evaluation.")
+
+    def get_static_contributions(self, document_ids: np.ndarray) -> np.ndarray:
+        """
+        Returns how much each of the given documents' relevancy scores exceeds the sum of their terms'
+        contributions, e.g., due to a static document score. Used for term-at-a-time evaluation
+        together with get_contributions.
+        """
+        return np.zeros(len(document_ids), dtype=np.float32)
+
 
 class SimpleRanker(Ranker):
     """
@@ -56,3 +104,10 @@ class SimpleRanker(Ranker):
 
     def evaluate(self) -> float:
         return self.__score
+
+    def get_upper_bound(self, term: str, multiplicity: int, max_term_frequency: int) -> float:
+        return multiplicity * max_term_frequency
+
+    def get_contributions(self, term: str, multiplicity: int, document_ids: np.ndarray,
+                          term_frequencies: np.ndarray) -> np.ndarray:
+        return multiplicity * term_frequencies.astype(np.float32)
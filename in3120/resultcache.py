@@ -0,0 +1,184 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, Optional, Tuple
+from .invertedindex import InvertedIndex
+from .normalizer import Normalizer
+from .tokenizer import Tokenizer
+
+
+class ResultCache:
+    """
+    A cache of query results, that sits in front of a search engine. Query logs are heavily skewed, and
+    search-as-you-type interfaces send the same prefixes over and over again, so caching results is one
+    of the most effective optimizations there is. See, e.g., "The impact of caching on search engines" by
+    Baeza-Yates et al. for an overview.
+
+    Works with any engine that has an evaluate(query, options, ...) method that returns an iterator over
+    results, e.g., SimpleSearchEngine, SuffixArray, EditSearchEngine and SimilaritySearchEngine. Results are
+    keyed on the query, the options, and any additional arguments such as the ranker. If a normalizer and
+    a tokenizer are supplied, queries are keyed on their normalized terms, so that, e.g., "Foo  bar" and
+    "foo bar" share an entry. That's only correct if the engine treats such queries the same.
+
+    The cache holds at most a given number of entries, and evicts either the least recently used (LRU) or
+    the least frequently used (LFU) entry to make room for new ones. LFU ties are broken by recency. LFU
+    keeps popular queries around in spite of bursts of one-off queries, whereas LRU adapts faster to
+    changes in popularity. Entries can also be given a time to live, after which they are discarded.
+
+    If we're given the inverted index that the engine uses, the cache is invalidated whenever the index
+    changes. The cache can also be invalidated explicitly. The cache is thread-safe.
+    """
+
+    def __init__(self, engine: Any, capacity: int = 1000, policy: str = "lru", ttl: Optional[float] = None,
+                 normalizer: Optional[Normalizer] = None, tokenizer: Optional[Tokenizer] = None,
+                 inverted_index: Optional[InvertedIndex] = None, clock: Callable[[], float] = time.monotonic):
+        assert engine is not None
+        assert capacity > 0
+        assert policy in ("lru", "lfu")
+        assert ttl is None or ttl > 0
+        assert (normalizer is None) == (tokenizer is None)
+        self.__engine = engine
+        self.__capacity = capacity
+        self.__lfu = policy == "lfu"
+        self.__ttl = ttl
+        self.__normalizer = normalizer
+        self.__tokenizer = tokenizer
+        self.__inverted_index = inverted_index
+        self.__clock = clock
+        self.__lock = threading.Lock()  # Guards all the state below.
+        self.__entries: Dict[Hashable, list] = OrderedDict()  # Maps keys to [results, expiry, frequency]. In LRU order.
+        self.__buckets: Dict[int, OrderedDict] = {}  # Maps frequencies to the keys having them, in LRU order.
+        self.__minimum_frequency = 0  # The smallest frequency of any entry, if the cache isn't empty.
+        self.__generation = None if inverted_index is None else inverted_index.get_generation()
+        self.__statistics = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def __len__(self):
+        with self.__lock:
+            return len(self.__entries)
+
+    def __get_key(self, query: str, options: dict, args: Tuple[Any, ...]) -> Hashable:
+        """
+        Computes the cache key for the given query. Option values need not be hashable.
+        """
+        if self.__normalizer is not None:
+            canonicalized = self.__normalizer.canonicalize(query)
+            query = tuple(self.__normalizer.normalize(t) for t in self.__tokenizer.strings(canonicalized))
+        return (query, tuple(sorted((k, repr(v)) for (k, v) in options.items())), args)
+
+    def __touch(self, key: Hashable, entry: list) -> None:
+        """
+        Records that the given entry has been used. Assumes that we hold the lock.
+        """
+        if not self.__lfu:
+            self.__entries.move_to_end(key)
+            return
+        bucket = self.__buckets[entry[2]]
+        del bucket[key]
+        if not bucket:
+            del self.__buckets[entry[2]]
+            if self.__minimum_frequency == entry[2]:
+                self.__minimum_frequency += 1
+        entry[2] += 1
+        self.__buckets.setdefault(entry[2], OrderedDict())[key] = None
+
+    def __remove(self, key: Hashable) -> None:
+        """
+        Removes the given entry. Assumes that we hold the lock.
+        """
+        entry = self.__entries.pop(key)
+        if self.__lfu:
+            bucket = self.__buckets[entry[2]]
+            del bucket[key]
+            if not bucket:
+                del self.__buckets[entry[2]]
+                if self.__minimum_frequency == entry[2] and self.__buckets:
+                    self.__minimum_frequency = min(self.__buckets.keys())
+
+    def __insert(self, key: Hashable, results: Tuple[Dict[str, Any], ...]) -> None:
+        """
+        Adds a new entry, evicting another entry if needed. Assumes that we hold the lock.
+        """
+        if len(self.__entries) >= self.__capacity:
+            if self.__lfu:
+                self.__remove(next(iter(self.__buckets[self.__minimum_frequency])))
+            else:
+                self.__remove(next(iter(self.__entries)))
+            self.__statistics["evictions"] += 1
+        expiry = None if self.__ttl is None else self.__clock() + self.__ttl
+        self.__entries[key] = [results, expiry, 1]
+        if self.__lfu:
+            self.__buckets.setdefault(1, OrderedDict())[key] = None
+            self.__minimum_frequency = 1
+
+    def __check_generation(self) -> Optional[int]:
+        """
+        Invalidates the cache if the inverted index has changed. Returns the index' current generation.
+        """
+        if self.__inverted_index is None:
+            return None
+        generation = self.__inverted_index.get_generation()
+        with self.__lock:
+            if generation != self.__generation:
+                self.__clear()
+                self.__generation = generation
+        return generation
+
+    def __clear(self) -> None:
+        """
+        Removes all entries. Assumes that we hold the lock.
+        """
+        self.__entries.clear()
+        self.__buckets.clear()
+        self.__minimum_frequency = 0
+        self.__statistics["invalidations"] += 1
+
+    def evaluate(self, query: str, options: dict, *args: Any) -> Iterator[Dict[str, Any]]:
+        """
+        Evaluates the given query using the wrapped engine, unless the results are already in the cache.
+        Additional arguments are passed on to the engine, and are part of the cache key, so they must be
+        hashable. Rankers are hashed by identity, i.e., two different ranker objects give separate entries.
+        """
+        generation = self.__check_generation()
+        key = self.__get_key(query, options, args)
+        with self.__lock:
+            entry = self.__entries.get(key, None)
+            if entry is not None and entry[1] is not None and entry[1] <= self.__clock():
+                self.__remove(key)
+                self.__statistics["expirations"] += 1
+                entry = None
+            if entry is not None:
+                self.__statistics["hits"] += 1
+                self.__touch(key, entry)
+                return iter(entry[0])
+            self.__statistics["misses"] += 1
+
+        # Evaluate the query without holding the lock, so that other threads can use the cache meanwhile. If
+        # the index changed while we evaluated the query, the results might be stale and we don't cache them.
+        results = tuple(self.__engine.evaluate(query, options, *args))
+        changed = self.__inverted_index is not None and self.__inverted_index.get_generation() != generation
+        with self.__lock:
+            if key not in self.__entries and not changed and generation == self.__generation:
+                self.__insert(key, results)
+        return iter(results)
+
+    def invalidate(self) -> None:
+        """
+        Removes all entries from the cache, e.g., because the underlying data has changed.
+        """
+        with self.__lock:
+            self.__clear()
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """
+        Returns statistics about how well the cache is doing, i.e., the number of hits, misses, evictions,
+        expirations and invalidations, the current number of entries, and the hit rate.
+        """
+        with self.__lock:
+            statistics = dict(self.__statistics)
+            statistics["size"] = len(self.__entries)
+        lookups = statistics["hits"] + statistics["misses"]
+        statistics["hit_rate"] = statistics["hits"] / lookups if lookups else 0.0
+        return statistics
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import heapq
-from typing import Iterator, Any, Union, Tuple
+from typing import Iterator, Any, Optional, Union, Tuple
 
 # Not strictly needed, but left for clarity. PEP 484 explcitly specifies that
 # "when an argument is annotated as having type float, an argument of type int
@@ -40,6 +40,14 @@ class Sieve:
             if root_score < score:
                 heapq.heapreplace(self.__heap, (score, item))
 
+    def threshold(self) -> Optional[Number]:
+        """
+        Returns the score that a candidate item has to beat in order to make the cut, i.e., the
+        score of "the worst of the best". Returns None if the sieve is not yet full, since then
+        every candidate item makes the cut.
+        """
+        return self.__heap[0][0] if len(self.__heap) >= self.__size else None
+
     def winners(self) -> Iterator[Tuple[Number, Any]]:
         """
         Returns the highest-scoring items that have been sifted through the sieve, sorted
@@ -1,14 +1,92 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import heapq
+import itertools
+import sys
+import numpy as np
+from array import array
 from collections import Counter
-from typing import Iterator, Dict, Any
-from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Iterable, Dict, Any, List, Tuple, Callable, Optional
 from .sieve import Sieve
-from .ranker import Ranker, SimpleRanker
+from .posting import Posting
+from .postingsmerger import PostingsMerger
+from .ranker import Ranker
 from .corpus import Corpus
 from .invertedindex import InvertedIndex
-import sys
+
+
+def _evaluate_term_at_a_time(get_postings: Callable[[str], Tuple[np.ndarray, np.ndarray]], size: int,
+                             unique_terms: List[Tuple[str, int]], n: int, ranker: Ranker,
+                             hit_count: int) -> List[Tuple[float, int]]:
+    """
+    Term-at-a-time N-out-of-M evaluation, see Section 7.1.2 in https://nlp.stanford.edu/IR-book/pdf/07system.pdf.
+    For each query term in turn, we add the term's score contributions for all documents in its posting list to
+    a dense score accumulator, and we count how many query terms each document contains. All of this is done
+    with vectorized NumPy operations, so that we avoid calling into the ranker once per posting. Returns the
+    (score, document identifier) pairs for the best matches, sorted by descending score. Ties are resolved
+    arbitrarily. The posting lists are looked up via the given function, as NumPy arrays.
+    """
+    scores = np.zeros(size, dtype=np.float32)
+    counts = np.zeros(size, dtype=np.uint16)
+    for term, multiplicity in unique_terms:
+        (document_ids, term_frequencies) = get_postings(term)
+        if document_ids.size == 0:
+            continue
+
+        # Document identifiers are unique within a posting list, so fancy indexing does the right thing.
+        scores[document_ids] += ranker.get_contributions(term, multiplicity, document_ids, term_frequencies)
+        counts[document_ids] += 1
+
+    # Select the matching documents, and add any static contributions to their scores.
+    candidates = np.flatnonzero(counts >= n)
+    candidate_scores = scores[candidates] + ranker.get_static_contributions(candidates)
+
+    # Find the best matches without sorting all the candidates.
+    if candidates.size > hit_count:
+        best = np.argpartition(-candidate_scores, hit_count - 1)[:hit_count]
+        candidates = candidates[best]
+        candidate_scores = candidate_scores[best]
+    ordering = np.argsort(-candidate_scores, kind="stable")
+    return [(float(candidate_scores[i]), int(candidates[i])) for i in ordering]
+
+
+def _get_match_threshold(unique_terms: List[Tuple[str, int]], options: dict) -> int:
+    """
+    Computes N, i.e., the number of unique query terms that a matching document needs to contain.
+    """
+    m = len(unique_terms)
+    return max(1, min(m, int(options['match_threshold']*m)))
+
+
+# The ranker used by a worker process during batch evaluation. Created once per worker process.
+_batch_ranker: Optional[Ranker] = None
+
+
+def _initialize_batch_worker(ranker_factory: Callable[[], Ranker]) -> None:
+    """
+    Initializer for the worker processes used for batch evaluation.
+    """
+    global _batch_ranker
+    _batch_ranker = ranker_factory()
+
+
+def _evaluate_batch_chunk(queries: List[Tuple[Tuple[str, int], ...]],
+                          postings: Dict[str, Tuple[np.ndarray, np.ndarray]], size: int,
+                          options: dict) -> List[List[Tuple[float, int]]]:
+    """
+    Worker function for parallel batch evaluation. Evaluates a chunk of normalized queries, given the
+    posting lists for all the terms that occur in the chunk. Needs to live at module level so that it
+    can be pickled.
+    """
+    results = []
+    for unique_terms in queries:
+        _batch_ranker.prepare(list(unique_terms))
+        results.append(_evaluate_term_at_a_time(postings.__getitem__, size, list(unique_terms),
+                                                _get_match_threshold(unique_terms, options), _batch_ranker,
+                                                options['hit_count']))
+    return results
 
 
 class SimpleSearchEngine:
@@ -45,56 +123,277 @@ class SimpleSearchEngine:
         The client can supply a dictionary of options that controls the query evaluation process: The value of
         N is inferred from the query via the "match_threshold" (float) option, and the maximum number of documents
         to return to the client is controlled via the "hit_count" (int) option.
+
+        Dynamic pruning can be enabled via the "pruning" (str) option, as either "wand" or "bmw". Documents that
+        provably can't make it into the result set are then skipped without being scored. This requires that the
+        ranker can provide upper bounds on score contributions. The result set is the same as without pruning.
+
+        Posting lists are traversed document-at-a-time by default. Term-at-a-time traversal can be selected by
+        setting the "traversal" (str) option to "taat". This requires that the ranker can score whole posting
+        lists at a time, and that the corpus has dense document identifiers. Setting the "traversal" option to
+        "scan" selects a document-at-a-time traversal that scans all M cursors to locate the lowest document
+        identifier, instead of keeping the cursors in a heap. That is O(M) rather than O(log M) per step, and
+        is mainly useful as a baseline.
         """
-        normalized_and_tokenized_query_terms = self.__inverted_index.get_terms(
+        # Do all lookups against the same snapshot, in case the index is updated while we evaluate the query.
+        inverted_index = self.__inverted_index.snapshot()
+        normalized_and_tokenized_query_terms = inverted_index.get_terms(
             query)
         unique_terms = list(
             Counter(normalized_and_tokenized_query_terms).items())
 
-        # Assign M
-        m = len(unique_terms)
         # Assign N
-        n = max(1, min(m, int(options['match_threshold']*m)))
+        n = _get_match_threshold(unique_terms, options)
         max_number_of_documents = options['hit_count']
+        ranker.prepare(unique_terms)
+
+        if options.get("traversal", "daat") == "taat":
+            assert not options.get("pruning", None)
+            def get_postings(term: str) -> Tuple[np.ndarray, np.ndarray]:
+                return __class__.__as_numpy(inverted_index.get_postings_arrays(term))
+
+            for doc_score, document in _evaluate_term_at_a_time(get_postings, self.__corpus.size(), unique_terms, n,
+                                                                ranker, max_number_of_documents):
+                yield {"score": doc_score, "document": self.__corpus.get_document(document)}
+            return
+
+        pruning = options.get("pruning", None)
+        if pruning:
+            assert pruning in ("wand", "bmw")
+            sieve = Sieve(max_number_of_documents)
+            self.__evaluate_with_pruning(inverted_index, unique_terms, n, ranker, sieve, pruning == "bmw")
+            for doc_score, document in sieve.winners():
+                yield {"score": doc_score, "document": self.__corpus.get_document(document)}
+            return
 
         posting_list = []
         for term, _ in unique_terms:
-            postings = self.__inverted_index[term]
+            postings = inverted_index[term]
             posting_list.append(postings)
         all_cursors = [next(p, None) for p in posting_list]
-        active_cursors = [
-            cursor for cursor in all_cursors if cursor is not None]
         sieve = Sieve(max_number_of_documents)
-        # Set frontier to 0, which is the variable that keeps track of similar doc ids
 
-        frontier = 0
+        if options.get("traversal", "daat") == "scan":
+            self.__evaluate_by_scanning(posting_list, all_cursors, unique_terms, n, ranker, sieve)
+            for doc_score, document in sieve.winners():
+                yield {"score": doc_score, "document": self.__corpus.get_document(document)}
+            return
+
+        # Keep the active cursors in a min-heap keyed on (document identifier, term index), so that locating
+        # the lowest document identifier is O(1) and advancing a cursor is O(log M). Since ties are broken by
+        # term index, the cursors positioned at the same document come off the heap in query term order.
+        heap = [(cursor.document_id, i) for i, cursor in enumerate(all_cursors) if cursor is not None]
+        heapq.heapify(heap)
+        skippers = [hasattr(p, "skip_to") for p in posting_list]
+        skippable = any(skippers)
+
+        while len(heap) >= n:
+            lowest_id = heap[0][0]
+            popped = []
+            while heap and heap[0][0] == lowest_id:
+                popped.append(heapq.heappop(heap)[1])
+            frontier = len(popped)
+
+            if frontier >= n:
+                ranker.reset(lowest_id)
+                for i in popped:
+                    current_term, multiplicity = unique_terms[i]
+                    ranker.update(current_term, multiplicity, all_cursors[i])
+                score = ranker.evaluate()
+                sieve.sift(score, lowest_id)
+
+            # Advance the cursors. A document can only be a match if at least N cursors are positioned at
+            # or before it, so if we know that nothing below some target document can be a match then we
+            # can use skip pointers (if the posting lists have them) to jump straight to the target. Locating
+            # the target means popping the N cursors positioned furthest behind.
+            target = lowest_id + 1
+            if frontier < n and skippable:
+                while len(popped) < n:
+                    popped.append(heapq.heappop(heap)[1])
+                target = all_cursors[popped[-1]].document_id
+
+            for i in popped:
+                cursor = all_cursors[i]
+                if cursor.document_id < target:
+                    if skippers[i]:
+                        cursor = posting_list[i].skip_to(target)
+                    elif cursor.document_id == lowest_id:
+                        cursor = next(posting_list[i], None)
+                    all_cursors[i] = cursor
+                if cursor is not None:
+                    heapq.heappush(heap, (cursor.document_id, i))
+
+        for doc_score, document in sieve.winners():
+            yield {"score": doc_score, "document": self.__corpus.get_document(document)}
+
+    def evaluate_batch(self, queries: Iterable[str], options: dict, ranker_factory: Callable[[], Ranker],
+                       workers: int = 1, chunk_size: int = 256) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Evaluates a batch of queries, and yields back one list of results per query, in the same order as the
+        queries were given. The results and the options are as for evaluate(), using term-at-a-time traversal.
+        That requires that the rankers can score whole posting lists at a time. The ranker factory is used to
+        create the rankers, since rankers are stateful.
+
+        Doing a batch at a time lets us share work between the queries. All queries are normalized up front,
+        and queries that normalize to the same terms are evaluated only once. Each posting list is decoded only
+        once for the whole batch, no matter how many queries it is needed for. The queries can optionally be
+        evaluated across a pool of worker processes. In that case queries that share terms are grouped into
+        the same chunks, so that each posting list needs to be shipped to as few workers as possible. The
+        ranker factory then needs to be picklable.
+        """
+        assert workers > 0
+        assert chunk_size > 0
+
+        # Normalize all queries up front, and find the distinct ones.
+        inverted_index = self.__inverted_index.snapshot()
+        distinct = {}  # Maps normalized queries to their position in the list of results.
+        positions = [distinct.setdefault(tuple(Counter(inverted_index.get_terms(query)).items()), len(distinct))
+                     for query in queries]
+        results = [None] * len(distinct)
+
+        # Decode each needed posting list at most once.
+        cache = {}
+
+        def get_postings(term: str) -> Tuple[np.ndarray, np.ndarray]:
+            if term not in cache:
+                cache[term] = __class__.__as_numpy(inverted_index.get_postings_arrays(term))
+            return cache[term]
+
+        if workers == 1:
+            ranker = ranker_factory()
+            for (unique_terms, i) in distinct.items():
+                ranker.prepare(list(unique_terms))
+                results[i] = _evaluate_term_at_a_time(get_postings, self.__corpus.size(), list(unique_terms),
+                                                      _get_match_threshold(unique_terms, options), ranker,
+                                                      options['hit_count'])
+        else:
+            # Group queries that share terms, by ordering the queries by their sorted terms.
+            ordering = sorted(distinct.keys(), key=lambda unique_terms: sorted(term for (term, _) in unique_terms))
+            chunks = [ordering[i:(i + chunk_size)] for i in range(0, len(ordering), chunk_size)]
+            postings = ({term: get_postings(term) for unique_terms in chunk for (term, _) in unique_terms}
+                        for chunk in chunks)
+            with ProcessPoolExecutor(max_workers=min(workers, max(1, len(chunks))),
+                                     initializer=_initialize_batch_worker, initargs=(ranker_factory,)) as executor:
+                arguments = (chunks, postings, itertools.repeat(self.__corpus.size()), itertools.repeat(options))
+                for (chunk, chunk_results) in zip(chunks, executor.map(_evaluate_batch_chunk, *arguments)):
+                    for (unique_terms, winners) in zip(chunk, chunk_results):
+                        results[distinct[unique_terms]] = winners
+
+        for i in positions:
+            yield [{"score": score, "document": self.__corpus.get_document(document_id)}
+                   for (score, document_id) in results[i]]
+
+    @staticmethod
+    def __as_numpy(arrays: Tuple[array, array]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Wraps the given pair of document identifier and term frequency arrays as NumPy arrays, without copying.
+        """
+        (document_ids, term_frequencies) = arrays
+        return (np.frombuffer(document_ids, dtype=np.uint32), np.frombuffer(term_frequencies, dtype=np.uint32))
+
+    @staticmethod
+    def __evaluate_by_scanning(posting_list: List[Iterator[Posting]], all_cursors: List[Optional[Posting]],
+                               unique_terms: List[Tuple[str, int]], n: int, ranker: Ranker, sieve: Sieve) -> None:
+        """
+        Document-at-a-time N-out-of-M evaluation, where we do a linear scan over all the cursors to locate the
+        lowest document identifier and to find out how many cursors that are positioned there.
+        """
+        active_cursors = [cursor for cursor in all_cursors if cursor is not None]
+        skippable = any(hasattr(p, "skip_to") for p in posting_list)
         while len(active_cursors) >= n:
             lowest_id = sys.maxsize
+            frontier = 0
             for cursor in active_cursors:
                 if cursor.document_id < lowest_id:
-                    lowest_id = cursor.document_id
-                    frontier = 1
+                    (lowest_id, frontier) = (cursor.document_id, 1)
                 elif cursor.document_id == lowest_id:
                     frontier += 1
+
             if frontier >= n:
                 ranker.reset(lowest_id)
-                for term, postings in zip(unique_terms, all_cursors):
-                    current_term = term[0]
-                    multiplicity = term[1]
-                    if postings is not None and postings.document_id == lowest_id:
-                        ranker.update(current_term, multiplicity, postings)
-                score = ranker.evaluate()
-                sieve.sift(score, lowest_id)
+                for ((current_term, multiplicity), cursor) in zip(unique_terms, all_cursors):
+                    if cursor is not None and cursor.document_id == lowest_id:
+                        ranker.update(current_term, multiplicity, cursor)
+                sieve.sift(ranker.evaluate(), lowest_id)
 
-            cursor_indices = [i if (p is not None and p.document_id ==
-                                    lowest_id) else -1 for i, p in enumerate(all_cursors)]
+            # Advance the cursors, skipping past documents that can't be matches if we can.
+            target = lowest_id + 1
+            if frontier < n and skippable:
+                target = sorted(cursor.document_id for cursor in active_cursors)[n - 1]
+            for (i, cursor) in enumerate(all_cursors):
+                if cursor is not None and cursor.document_id < target:
+                    if hasattr(posting_list[i], "skip_to"):
+                        all_cursors[i] = posting_list[i].skip_to(target)
+                    elif cursor.document_id == lowest_id:
+                        all_cursors[i] = next(posting_list[i], None)
+            active_cursors = [cursor for cursor in all_cursors if cursor is not None]
 
-            for i, cursor in enumerate(all_cursors):
-                if cursor_indices[i] != -1:
-                    all_cursors[i] = next(posting_list[i], None)
+    def __evaluate_with_pruning(self, inverted_index: InvertedIndex, unique_terms: List[Tuple[str, int]], n: int,
+                                ranker: Ranker, sieve: Sieve, block_max: bool) -> None:
+        """
+        Document-at-a-time N-out-of-M evaluation using WAND, as described in "Efficient query evaluation using
+        a two-level retrieval process" by Broder et al. Optionally refined with Block-Max WAND, as described in
+        "Faster top-k document retrieval using block-max indexes" by Ding and Suel.
 
-            active_cursors = [
-                cursor for cursor in all_cursors if cursor is not None]
+        We keep the cursors sorted by document identifier, and find the pivot: The first document where enough
+        cursors are positioned at or before it to satisfy the N-of-M criterion, and where the upper bounds of
+        these cursors sum up to at least the sieve's threshold. No document before the pivot can make it into
+        the result set. With block-max information we can tighten the upper bounds further, using the largest
+        term frequency in the blocks that could contain the pivot.
+        """
+        iterators = [inverted_index[term] for (term, _) in unique_terms]
+        cursors = [next(iterator, None) for iterator in iterators]
+        max_term_frequencies = [inverted_index.get_max_term_frequency(term) for (term, _) in unique_terms]
+        bounds = [ranker.get_upper_bound(term, multiplicity, max_term_frequency)
+                  for ((term, multiplicity), max_term_frequency) in zip(unique_terms, max_term_frequencies)]
+        static_bound = ranker.get_static_upper_bound()
 
-        for doc_score, document in sieve.winners():
-            yield {"score": doc_score, "document": self.__corpus.get_document(document)}
+        while True:
+            ordering = sorted((cursor.document_id, i) for (i, cursor) in enumerate(cursors) if cursor is not None)
+            threshold = sieve.threshold()
+
+            # Find the pivot. Cursors positioned at the pivot document all take part.
+            pivot = None
+            total = static_bound
+            for (j, (_, i)) in enumerate(ordering):
+                total += bounds[i]
+                if j + 1 >= n and (threshold is None or total >= threshold):
+                    pivot = j
+                    break
+            if pivot is None:
+                break
+            pivot_id = ordering[pivot][0]
+            while pivot + 1 < len(ordering) and ordering[pivot + 1][0] == pivot_id:
+                pivot += 1
+            candidates = [i for (_, i) in ordering[:(pivot + 1)]]
+
+            # Check the tighter block-level upper bounds. If these rule out the pivot, they also rule out all
+            # documents up to where the first of the involved blocks ends.
+            if block_max and threshold is not None:
+                total = static_bound
+                target = ordering[pivot + 1][0] if pivot + 1 < len(ordering) else sys.maxsize
+                for i in candidates:
+                    (last_document_id, max_term_frequency) = (sys.maxsize, max_term_frequencies[i])
+                    if hasattr(iterators[i], "get_block_bound"):
+                        (last_document_id, max_term_frequency) = iterators[i].get_block_bound(pivot_id)
+                    (term, multiplicity) = unique_terms[i]
+                    total += ranker.get_upper_bound(term, multiplicity, max_term_frequency)
+                    target = min(target, last_document_id + 1)
+                if total < threshold:
+                    for i in candidates:
+                        cursors[i] = PostingsMerger.skip_to(iterators[i], target)
+                    continue
+
+            # Either all the involved cursors are at the pivot and we score it, or we advance the ones that are not.
+            if ordering[0][0] == pivot_id:
+                ranker.reset(pivot_id)
+                for (i, (term, multiplicity)) in enumerate(unique_terms):
+                    if cursors[i] is not None and cursors[i].document_id == pivot_id:
+                        ranker.update(term, multiplicity, cursors[i])
+                sieve.sift(ranker.evaluate(), pivot_id)
+                for i in candidates:
+                    cursors[i] = next(iterators[i], None)
+            else:
+                for i in candidates:
+                    if cursors[i].document_id < pivot_id:
+                        cursors[i] = PostingsMerger.skip_to(iterators[i], pivot_id)
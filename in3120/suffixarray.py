@@ -1,15 +1,77 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import heapq
 import itertools
-import sys
-from bisect import bisect_left
-from typing import Any, Dict, Iterator, Iterable, Tuple, List
+import mmap
+import os
+import struct
+import numpy as np
+from typing import Any, Dict, Iterator, Iterable, List, Optional, Tuple
 from collections import Counter
 from .corpus import Corpus
 from .normalizer import Normalizer
 from .tokenizer import Tokenizer
-from .sieve import Sieve
+
+
+def _sort_suffixes(symbols: np.ndarray, history: Optional[List[np.ndarray]] = None) -> np.ndarray:
+    """
+    Sorts the suffixes of the given sequence of integer symbols, and returns their starting positions in
+    sorted order. A suffix that is a prefix of another suffix sorts first. Uses prefix doubling, as described by
+    Manber and Myers, vectorized using NumPy: After round k, the suffixes are sorted by their first 2^k symbols
+    and we know their ranks in that order. The ranks after the next round are given by sorting on pairs of
+    current ranks. Each round is a single sort, and the number of rounds is logarithmic in the length of the
+    longest repeated substring.
+
+    If a history list is given, the ranks after each round but the last are appended to it, since the LCPs
+    can be computed from these.
+    """
+    n = symbols.size
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    (_, ranks) = np.unique(symbols, return_inverse=True)
+    ranks = ranks.astype(np.int64)
+    k = 1
+    while True:
+        # Rank 0 means that the suffix has ended, so shift the real ranks up by one.
+        following = np.zeros(n, dtype=np.int64)
+        following[:(n - k)] = ranks[k:] + 1
+        keys = ranks * (n + 1) + following
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        updated = np.empty(n, dtype=np.int64)
+        updated[order] = np.concatenate(([0], np.cumsum(sorted_keys[1:] != sorted_keys[:-1])))
+        if history is not None:
+            history.append(ranks.astype(np.int32))
+        ranks = updated
+        if ranks[order[-1]] == n - 1:
+            return order
+        k *= 2
+
+
+def _normalize(buffer: str, normalizer: Normalizer, tokenizer: Tokenizer) -> str:
+    """
+    Produces a normalized version of the given string. Both queries and documents need to be
+    identically processed for lookups to succeed.
+    """
+    # Tokenize and join to be robust to nuances in whitespace and punctuation.
+    tokens = tokenizer.strings(normalizer.canonicalize(buffer))
+    return " ".join(term for term in (normalizer.normalize(t) for t in tokens) if term)
+
+
+def _read_texts(corpus: Corpus, fields: Iterable[str], normalizer: Normalizer,
+                tokenizer: Tokenizer) -> Iterator[Tuple[int, List[str], bytes]]:
+    """
+    Yields the document identifier, the normalized field values, and the UTF-8 encoded text for each document
+    that has any content in the named fields. The text holds the values separated by " \\0 ", and ends with "\\0".
+    Empty values are left out.
+    """
+    fields = list(fields)
+    for document in corpus:
+        values = [_normalize(document.get_field(f, ""), normalizer, tokenizer) for f in fields]
+        values = [value for value in values if value]
+        if values:
+            yield (document.document_id, values, (" \0 ".join(values) + "\0").encode("utf-8"))
 
 
 class SuffixArray:
@@ -17,129 +79,433 @@ class SuffixArray:
     A simple suffix array implementation. Allows us to conduct efficient substring searches.
     The prefix of a suffix is an infix!
 
-    In a serious application we'd make use of least common prefixes (LCPs), pay more attention
-    to memory usage, and add more lookup/evaluation features.
+    The normalized contents of all documents are concatenated into a single text buffer, and
+    suffixes are represented as offsets into this buffer. We only index suffixes that start on
+    a token boundary. Fields are separated by " \\0 " and documents by "\\0", so that no match can
+    span more than a single field. A separate table tells where each document starts.
+
+    Suffixes are compared in place, without slicing out copies of them. Lookups are done using the
+    binary search algorithm by Manber and Myers, see "Suffix arrays: A new method for on-line string
+    searches". Besides the suffix array itself we keep the longest common prefix (LCP) of each pair of
+    adjacent suffixes, and derive from these the LCPs that the binary search needs. That way, no
+    character in the needle needs to be compared more than once per binary search step.
+
+    The suffixes that match a query form a range in the suffix array, and we find both ends of it using
+    binary search. Counting the matches is then trivial. We also keep the document that each suffix falls
+    within, so that ranking the documents by how many matches they have is a matter of counting these. To
+    find the documents having the most matches without visiting each match, we keep a wavelet matrix over
+    the same documents, see "The wavelet matrix" by Claude, Navarro and Ordóñez, and "Space-efficient top-k
+    document retrieval" by Navarro and Valenzuela. Each level of the matrix is a bit vector, where each bit
+    tells which half of the remaining document range a suffix belongs to. Given a range of suffixes, we can
+    count how many of them fall within each half by ranking the bits at the ends of the range, and continue
+    with the halves that have the most suffixes first. That pays off when the matches are concentrated in a
+    few documents, but if they're spread out there are more halves to visit than there are matches to count.
+    We therefore give up on the wavelet matrix if it doesn't deliver within a budget that depends on the
+    number of matches.
+
+    The text is UTF-8 encoded, and offsets and LCPs are in bytes. Comparing UTF-8 encoded strings byte by
+    byte gives the same order as comparing them character by character. Everything lives in a single buffer,
+    so that the suffix array can be written to a file and later be memory mapped. Opening it is then instant,
+    and processes that open the same file share a single copy of it in the page cache. The buffer layout is:
+
+       [header]        Magic, version, document count, suffix count, and text length.
+       [bits]          The bit vector for each level of the wavelet matrix, in 64-bit words.
+       [ranks]         For each level and each word, how many bits that are set before the word.
+       [zeros]         For each level, how many bits that are not set.
+       [offsets]       Where each document starts in the text, plus where the text ends.
+       [document ids]  The identifier of each document in the text.
+       [suffixes]      Offsets into the text where the suffixes start, sorted.
+       [documents]     The index of the document that each suffix falls within.
+       [left lcps]     The LCP of each suffix and the left end of its binary search interval.
+       [right lcps]    The LCP of each suffix and the right end of its binary search interval.
+       [text]          The normalized contents of all non-empty documents, concatenated.
+
+    The words are 64-bit integers and all other tables hold 32-bit integers, in native byte order.
     """
 
+    __magic = b"IN3120SA"
+    __version = 2
+    __header = struct.Struct("<8sIIII")  # Magic, version, document count, suffix count, and text length.
+    __node_cost = 64  # The wavelet matrix may visit one node per this many matches, before we count them instead.
+
     def __init__(self, corpus: Corpus, fields: Iterable[str], normalizer: Normalizer, tokenizer: Tokenizer):
         self.__corpus = corpus
         self.__normalizer = normalizer
         self.__tokenizer = tokenizer
-        # The (<document identifier>, <searchable content>) pairs.
-        self.__haystack: List[Tuple[int, str]] = []
-        # The sorted (<haystack index>, <start offset>) pairs.
-        self.__suffixes: List[Tuple[int, int]] = []
-        # Construct the haystack and the suffix array itself.
-        self.__build_suffix_array(fields)
-
-    def __build_suffix_array(self, fields: Iterable[str]) -> None:
-        haystack = self.__haystack
-        suffixes = self.__suffixes
-
-        for docid, doc in enumerate(self.__corpus):
-            concatenated_text = ""  # Initialize concatenated_text for each document
-            for field in fields:
-                text = doc.get_field(field, "")
-                concatenated_text += "".join(text)
-
-            tokens = self.__tokenizer.strings(
-                self.__normalize(concatenated_text))
-            normalized_and_tokenized = " ".join(tokens)
-            haystack.append((docid, normalized_and_tokenized))
-
-        # Create suffixes for each word
-        for docid, text in haystack:
-            words = text.split()
-            offset = 0
-            for i, word in enumerate(words):
-                suffixes.append((docid, offset))
-                offset += len(word) + 1
-
-        suffixes.sort(key=lambda x: self.__get_item(x))
-        """ for i in haystack:
-            print("haystack", haystack)
-        print("suffixes", suffixes)
-        for i in suffixes:
-            print("suffixes", self.__get_item(i))"""
-
-        """
-        haystack = [
-            [docid, self.__normalize(self.__tokenizer.tokens(" ".join([doc.get_field(field, "")
-                                                                       for field in fields])))]
-            for docid, doc in enumerate(self.__corpus)
-        ]
-        suffixes = sorted([(docid, i)
-                          for docid, text in haystack for i in range(len(text))])
-
-        # Store the suffix array in self.__suffixes
-        self.__suffixes = suffixes
-        hayindex,start = element
-        doc, string = self.hsystdsck(hayindx)
-        substring = string[start:]
-        return substring
-
-        Builds a simple suffix array from the set of named fields in the document collection.
-        The suffix array allows us to search across all named fields in one go.
-        """
-        # We allow searching across multiple document fields simultaneously, so join the named fields
-        # to produce the haystack that we'll search for needles in. Avoid cross-field matches.
-        self.__haystack = [(d.document_id, " \0 ".join(self.__normalize(d.get_field(f, "")) for f in fields))
-                           for d in self.__corpus]
-
-        # We don't actually store all suffixes, instead we store (index, offset) pairs which allows us
-        # to generate the suffixes if/when we need them: The index identifies the document, and the
-        # offset identifies where in the document the substring starts. A naive suffix array generation
-        # is fine for now.
-        self.__suffixes = [(index, begin)
-                           for index, (_, buffer) in enumerate(self.__haystack)
-                           for (begin, _) in self.__tokenizer.ranges(buffer)]
-        self.__suffixes.sort(key=self.__get_suffix2)
-
-    def __normalize(self, buffer: str) -> str:
-        """
-        Produces a normalized version of the given string. Both queries and documents need to be
-        identically processed for lookups to succeed.
-        """
-        # Tokenize and join to be robust to nuances in whitespace and punctuation.
-        tokens = self.__tokenizer.strings(
-            self.__normalizer.canonicalize(buffer))
-        return " ".join(self.__normalizer.normalize(t) for t in tokens)
-
-    def __get_suffix1(self, i: int) -> str:
-        """
-        Produces the suffix/substring from the normalized document buffer for the entry i in the suffix array.
-        """
-        return self.__get_suffix2(self.__suffixes[i])
-
-    def __get_suffix2(self, pair: Tuple[int, int]) -> str:
-        """
-        Produces the suffix/substring from the normalized document buffer for the given (index, offset) pair.
-        """
-        # TODO: Slicing implies copying. This should be possible to avoid.
-        return self.__haystack[pair[0]][1][pair[1]:]
-
-    def __binary_search(self, needle: str) -> int:
-        low = 0
-        high = len(self.__suffixes) - 1
-        pos = -1
-
-        """ Kind of silly to roll our own binary search instead of using the bisect module, but seems needed
-        prior to Python 3.10 due to how we represent the suffixes via (index, offset) tuples. Version 3.10
-        added support for specifying a key.
-        """
-        if sys.version_info.major == 3 and sys.version_info.minor >= 10:
-            return bisect_left(self.__suffixes, needle, key=self.__get_suffix2)
-        else:
-            left = 0
-            right = len(self.__suffixes)
-            while left < right:
-                middle = (left + right) // 2
-                suffix = self.__get_suffix1(middle)
-                if suffix < needle:
-                    left = middle + 1
+        self.__attach(self.__build_suffix_array(fields))
+
+    def __attach(self, data) -> None:
+        """
+        Makes the suffix array use the given buffer, after having validated its header. The tables are
+        views into the buffer, and are not copied.
+        """
+        (magic, version, document_count, suffix_count, text_length) = __class__.__header.unpack_from(data, 0)
+        if magic != __class__.__magic or version != __class__.__version:
+            raise IOError("Unsupported suffix array format")
+        view = memoryview(data)
+        (levels, words) = (__class__.__get_level_count(document_count), (suffix_count + 63) // 64)
+        sizes = [8 * levels * words, 4 * levels * (words + 1), 4 * levels, 4 * (document_count + 1),
+                 4 * document_count, 4 * suffix_count, 4 * suffix_count, 4 * suffix_count, 4 * suffix_count,
+                 text_length]
+        ends = list(itertools.accumulate(sizes, initial=__class__.__header.size))
+        (bits, ranks, zeros, offsets, document_ids, suffixes, documents, left_lcps, right_lcps, text) = \
+            (view[a:b] for (a, b) in zip(ends, ends[1:]))
+        self.__data = data  # The buffer that everything below is a view into.
+        self.__view = view  # The view of the buffer that all the tables are sliced from.
+        self.__levels = levels  # The number of levels in the wavelet matrix.
+        self.__words = words  # The number of 64-bit words per level in the wavelet matrix.
+        self.__bits = bits.cast("Q")  # The bit vectors of the wavelet matrix, level by level.
+        self.__ranks = ranks.cast("i")  # The number of bits set before each word, level by level.
+        self.__zeros = zeros.cast("i")  # The number of bits not set on each level.
+        self.__offsets = offsets.cast("i")  # Where each document starts in the text, plus where the text ends.
+        self.__document_ids = document_ids.cast("i")  # The identifier of each document in the text.
+        self.__suffixes = suffixes.cast("i")  # Offsets into the text where the suffixes start, sorted.
+        self.__documents = documents.cast("i")  # The index of the document that each suffix falls within.
+        self.__left_lcps = left_lcps.cast("i")  # The LCP of each suffix and the left end of its search interval.
+        self.__right_lcps = right_lcps.cast("i")  # The LCP of each suffix and the right end of its search interval.
+        self.__text = text  # The normalized and UTF-8 encoded contents of all non-empty documents, concatenated.
+
+    @staticmethod
+    def __get_level_count(document_count: int) -> int:
+        """
+        Returns the number of levels in the wavelet matrix, i.e., the number of bits needed to tell the
+        documents apart.
+        """
+        return max(1, (document_count - 1).bit_length())
+
+    @staticmethod
+    def read(filename: str, corpus: Corpus, normalizer: Normalizer, tokenizer: Tokenizer) -> "SuffixArray":
+        """
+        Opens a suffix array that has previously been written to the named file. The file is memory mapped
+        and not read into memory. The corpus, normalizer and tokenizer must be the same as the ones that the
+        suffix array was built with.
+        """
+        with open(filename, mode="rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        suffix_array = SuffixArray.__new__(SuffixArray)
+        suffix_array.__corpus = corpus
+        suffix_array.__normalizer = normalizer
+        suffix_array.__tokenizer = tokenizer
+        try:
+            suffix_array.__attach(data)
+        except IOError:
+            data.close()
+            raise
+        return suffix_array
+
+    def __enter__(self) -> "SuffixArray":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Releases the views into the buffer, and the memory mapping if the suffix array was opened with
+        read(). The suffix array can't be used afterwards.
+        """
+        for view in (self.__bits, self.__ranks, self.__zeros, self.__offsets, self.__document_ids, self.__suffixes,
+                     self.__documents, self.__left_lcps, self.__right_lcps, self.__text, self.__view):
+            view.release()
+        if isinstance(self.__data, mmap.mmap):
+            self.__data.close()
+
+    def write(self, filename: str) -> None:
+        """
+        Writes the suffix array to the named file, so that it can later be memory mapped.
+        """
+        with open(filename, mode="wb") as file:
+            file.write(self.__data)
+
+    def __build_suffix_array(self, fields: Iterable[str]) -> bytes:
+        """
+        Builds a simple suffix array from the set of named fields in the document collection, and returns
+        the buffer that holds it. The suffix array allows us to search across all named fields in one go.
+        """
+        # Build the text, and note the tokens and what follows each of them.
+        pieces = []
+        offsets = []
+        document_ids = []
+        tokens = []
+        separators = []
+        length = 0
+        for (document_id, values, piece) in _read_texts(self.__corpus, fields, self.__normalizer, self.__tokenizer):
+            offsets.append(length)
+            document_ids.append(document_id)
+            for (i, value) in enumerate(values):
+                value_tokens = value.split(" ")
+                tokens.extend(value_tokens)
+                separators.extend(itertools.repeat(2, len(value_tokens) - 1))
+                separators.append(1 if i + 1 < len(values) else 0)
+            pieces.append(piece)
+            length += len(piece)
+        offsets.append(length)
+
+        # Encode the text as a sequence of integer symbols, one per token. Sorting the suffixes byte by byte
+        # is the same as sorting them symbol by symbol, if a symbol is the token and the separator that follows
+        # it: Separators are always smaller than token bytes, and we order the separators by how they compare
+        # when followed by a token. The "\0" after the last token is the smallest, and a suffix ends there.
+        n = len(tokens)
+        vocabulary = sorted(set(tokens))
+        token_ids = np.fromiter(map({t: i for (i, t) in enumerate(vocabulary)}.__getitem__, tokens), np.int64, n)
+        del tokens
+        vocabulary = [t.encode("utf-8") for t in vocabulary]
+        separators = np.array(separators, dtype=np.int64)
+        token_lengths = np.fromiter(map(len, vocabulary), np.int64, len(vocabulary))[token_ids]
+        starts = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(token_lengths + np.array([1, 3, 1])[separators], out=starts[1:])
+        history = []
+        order = _sort_suffixes(token_ids * 3 + separators, history)
+        lcps = __class__.__compute_lcps(order, history, starts, token_ids, separators, token_lengths, vocabulary)
+        del history
+        (left_lcps, right_lcps) = __class__.__compute_search_lcps(lcps)
+        del lcps
+        offsets = np.array(offsets, dtype=np.int64)
+        suffixes = starts[order]
+        documents = np.searchsorted(offsets, suffixes, side="right") - 1
+        levels = __class__.__get_level_count(len(document_ids))
+        (bits, ranks, zeros) = __class__.__build_wavelet_matrix(documents, levels)
+        header = __class__.__header.pack(__class__.__magic, __class__.__version, len(document_ids), n, length)
+        tables = [ranks, zeros, offsets, np.array(document_ids), suffixes, documents, left_lcps, right_lcps]
+        return b"".join([header, bits.tobytes()] + [__class__.__to_bytes(table) for table in tables] + pieces)
+
+    @staticmethod
+    def __build_wavelet_matrix(values: np.ndarray, levels: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Builds a wavelet matrix over the given values, starting with the most significant bit. On each level,
+        the values are stably reordered so that those having the current bit unset come first. Returns the bit
+        vectors packed into 64-bit words, how many bits that are set before each word, and how many bits that
+        are not set on each level.
+        """
+        n = values.size
+        words = (n + 63) // 64
+        bits = np.zeros((levels, words), dtype=np.uint64)
+        ranks = np.zeros((levels, words + 1), dtype=np.int64)
+        zeros = np.zeros(levels, dtype=np.int64)
+        for level in range(levels):
+            selected = ((values >> (levels - level - 1)) & 1).astype(np.uint8)
+            padded = np.zeros(words * 64, dtype=np.uint8)
+            padded[:n] = selected
+            bits[level] = np.packbits(padded, bitorder="little").view("<u8").astype(np.uint64)
+            np.cumsum(padded.reshape(words, 64).sum(axis=1), out=ranks[level, 1:])
+            zeros[level] = n - ranks[level, -1]
+            values = np.concatenate((values[selected == 0], values[selected == 1]))
+        return (bits, ranks.reshape(-1), zeros)
+
+    @staticmethod
+    def __to_bytes(values: np.ndarray) -> bytes:
+        """
+        Converts the given NumPy array into a compact table of 32-bit integers.
+        """
+        assert values.size == 0 or (values.min() >= 0 and values.max() < (1 << 31))
+        return values.astype(np.int32).tobytes()
+
+    @staticmethod
+    def __compute_lcps(order: np.ndarray, history: List[np.ndarray], starts: np.ndarray, token_ids: np.ndarray,
+                       separators: np.ndarray, token_lengths: np.ndarray, vocabulary: List[bytes]) -> np.ndarray:
+        """
+        Computes the LCP, in bytes, of each suffix and the one before it. We first find how many symbols
+        adjacent suffixes have in common, by binary lifting over the ranks from each prefix doubling round: Two
+        suffixes have their first 2^k symbols in common if they had the same rank after round k. The symbols
+        they have in common cover a known number of bytes. The first symbols that differ might still have
+        some bytes in common, and since the vocabulary is sorted, the LCP of two tokens is the smallest LCP
+        of the adjacent tokens in between.
+        """
+        n = order.size
+        lcps = np.zeros(n, dtype=np.int64)
+        if n < 2:
+            return lcps
+        (a, b) = (order[:-1], order[1:])
+        common = np.zeros(n - 1, dtype=np.int64)
+        for k in reversed(range(len(history))):
+            (i, j) = (a + common, b + common)
+            valid = (i < n) & (j < n)
+            equal = np.zeros(n - 1, dtype=bool)
+            equal[valid] = history[k][i[valid]] == history[k][j[valid]]
+            common += equal.astype(np.int64) << k
+        lcps[1:] = starts[a + common] - starts[a]
+
+        # Add the bytes the first differing symbols have in common, unless a suffix ended.
+        (i, j) = (a + common, b + common)
+        valid = (i < n) & (j < n)
+        (i, j) = (i[valid], j[valid])
+        (x, y) = (token_ids[i], token_ids[j])
+        same = x == y
+        extra = np.where(same, token_lengths[i] + ((separators[i] > 0) & (separators[j] > 0)), 0)
+        (low, high) = (np.minimum(x, y) + 1, np.maximum(x, y))
+        differ = ~same
+        extra[differ] = __class__.__range_minimum(__class__.__vocabulary_lcps(vocabulary), low[differ], high[differ])
+        lcps[1:][valid] += extra
+        return lcps
+
+    @staticmethod
+    def __vocabulary_lcps(vocabulary: List[bytes]) -> np.ndarray:
+        """
+        Computes the LCP of each token in the sorted vocabulary and the one before it.
+        """
+        lcps = np.zeros(len(vocabulary), dtype=np.int64)
+        for i in range(1, len(vocabulary)):
+            lcps[i] = len(os.path.commonprefix((vocabulary[i - 1], vocabulary[i])))
+        return lcps
+
+    @staticmethod
+    def __range_minimum(values: np.ndarray, low: np.ndarray, high: np.ndarray) -> np.ndarray:
+        """
+        Returns the smallest of values[low[i]:(high[i] + 1)] for all i, where low[i] <= high[i]. Builds a
+        sparse table that holds the smallest value in each range of length 2^k, so that each query is covered
+        by two overlapping ranges.
+        """
+        table = [values]
+        while (1 << len(table)) <= values.size:
+            previous = table[-1]
+            width = 1 << (len(table) - 1)
+            table.append(np.minimum(previous[:-width], previous[width:]))
+        levels = np.zeros(low.size, dtype=np.int64)
+        if low.size:
+            levels = np.floor(np.log2(high - low + 1)).astype(np.int64)
+        result = np.empty(low.size, dtype=np.int64)
+        for (k, row) in enumerate(table):
+            selected = levels == k
+            (l, h) = (low[selected], high[selected])
+            result[selected] = np.minimum(row[l], row[h - (1 << k) + 1])
+        return result
+
+    @staticmethod
+    def __compute_search_lcps(lcps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Computes the LCPs that the binary search needs. Each suffix is the midpoint of exactly one interval
+        that the binary search can visit, and we need the LCP of the midpoint and each end of the interval. The
+        LCP of two suffixes is the smallest LCP of the adjacent suffixes in between, and the smallest LCP in an
+        interval is the smaller of the smallest LCPs in its two halves. We therefore first enumerate the intervals
+        level by level, top down, and then compute the smallest LCPs level by level, bottom up.
+        """
+        n = lcps.size
+        padded = np.zeros(n + 1, dtype=np.int64)  # The ends of the suffix array are treated as empty strings.
+        padded[:n] = lcps
+        left_lcps = np.zeros(n, dtype=np.int64)
+        right_lcps = np.zeros(n, dtype=np.int64)
+        levels = [(np.array([-1]), np.array([n]))]
+        while True:
+            (left, right) = levels[-1]
+            inner = right - left > 1
+            (left, right) = (left[inner], right[inner])
+            if left.size == 0:
+                break
+            middle = (left + right) // 2
+            levels.append((np.concatenate((left, middle)), np.concatenate((middle, right))))
+        minimums = None
+        for (left, right) in reversed(levels):
+            inner = right - left > 1
+            result = padded[right]
+            if minimums is not None:
+                count = minimums.size // 2
+                (from_left, from_right) = (minimums[:count], minimums[count:])
+                middle = (left[inner] + right[inner]) // 2
+                left_lcps[middle] = from_left
+                right_lcps[middle] = from_right
+                result[inner] = np.minimum(from_left, from_right)
+            minimums = result
+        return (left_lcps, right_lcps)
+
+    def __extend(self, needle: bytes, offset: int, h: int) -> int:
+        """
+        Returns the LCP of the needle and the suffix starting at the given offset in the text, given that
+        we already know that they have the h first bytes in common.
+        """
+        text = self.__text
+        while h < len(needle) and offset + h < len(text) and text[offset + h] == needle[h]:
+            h += 1
+        return h
+
+    def __binary_search(self, needle: bytes, upper: bool) -> int:
+        """
+        Returns the index of the first suffix that is not smaller than the needle. If we're looking for the
+        upper bound, returns the index of the first suffix that is larger than the needle and doesn't start
+        with it, i.e., the needle is then considered larger than all suffixes that start with it. During the
+        search, we keep track of how many bytes the needle has in common with the suffixes at each end of the
+        interval we're searching in. Comparisons with the midpoint can then start after the bytes we know
+        match, and sometimes be skipped altogether.
+        """
+        text = self.__text
+        (left, right) = (-1, len(self.__suffixes))
+        (left_lcp, right_lcp) = (0, 0)
+        while right - left > 1:
+            middle = (left + right) // 2
+            if left_lcp >= right_lcp:
+                (known, lcp) = (left_lcp, self.__left_lcps[middle])
+            else:
+                (known, lcp) = (right_lcp, self.__right_lcps[middle])
+            if lcp != known:
+                # The midpoint shares more or fewer bytes with the end of the interval than the needle
+                # does, and that decides which side of the needle the midpoint is on.
+                if (lcp > known) == (left_lcp >= right_lcp):
+                    (left, left_lcp) = (middle, min(lcp, known))
                 else:
-                    right = middle
-            return left
+                    (right, right_lcp) = (middle, min(lcp, known))
+                continue
+            offset = self.__suffixes[middle]
+            h = self.__extend(needle, offset, known)
+            larger = not upper if h == len(needle) else text[offset + h] > needle[h]
+            if larger:
+                (right, right_lcp) = (middle, h)
+            else:
+                (left, left_lcp) = (middle, h)
+        return right
+
+    def __get_range(self, query: str) -> Tuple[int, int]:
+        """
+        Returns the range of suffixes that start with the normalized query. Suffixes sharing a prefix are
+        consecutive in the suffix array. The empty query matches nothing, not everything.
+        """
+        needle = _normalize(query, self.__normalizer, self.__tokenizer).encode("utf-8")
+        if not needle:
+            return (0, 0)
+        return (self.__binary_search(needle, False), self.__binary_search(needle, True))
+
+    def __rank(self, level: int, i: int) -> int:
+        """
+        Returns how many of the first i bits on the given level of the wavelet matrix that are set.
+        """
+        (word, bit) = (i >> 6, i & 63)
+        rank = self.__ranks[level * (self.__words + 1) + word]
+        if bit:
+            rank += bin(self.__bits[level * self.__words + word] & ((1 << bit) - 1)).count("1")
+        return rank
+
+    def __get_top_documents(self, start: int, end: int, k: int, budget: int) -> Optional[List[Tuple[int, int]]]:
+        """
+        Returns the indices of the k documents that the most suffixes in the given range fall within, together
+        with how many suffixes that do, in ranked order. We traverse the wavelet matrix best first: A node is a
+        range of documents together with the suffixes that fall within these, and a node has no more suffixes
+        than its parent. So when a single document comes out on top, no other document can have more suffixes.
+        Returns None if we need to visit more nodes than the given budget allows.
+        """
+        ranked = []
+        heap = [(start - end, 0, start, end, 0)]  # Negated suffix count, level, suffix range, and document prefix.
+        while heap and len(ranked) < k:
+            (count, level, start, end, prefix) = heapq.heappop(heap)
+            if level == self.__levels:
+                ranked.append((prefix, -count))
+                continue
+            budget -= 1
+            if budget < 0:
+                return None
+            (start1, end1) = (self.__rank(level, start), self.__rank(level, end))
+            (start0, end0) = (start - start1, end - end1)
+            zeros = self.__zeros[level]
+            if end0 > start0:
+                heapq.heappush(heap, (start0 - end0, level + 1, start0, end0, prefix << 1))
+            if end1 > start1:
+                heapq.heappush(heap, (start1 - end1, level + 1, zeros + start1, zeros + end1, (prefix << 1) | 1))
+        return ranked
+
+    def count(self, query: str) -> int:
+        """
+        Returns how many times the query phrase occurs as a prefix of a suffix, i.e., the total number of
+        matches across all documents. This only requires two binary searches.
+        """
+        (start, end) = self.__get_range(query)
+        return end - start
 
     def evaluate(self, query: str, options: dict) -> Iterator[Dict[str, Any]]:
         """
@@ -157,35 +523,21 @@ class SuffixArray:
         The results yielded back to the client are dictionaries having the keys "score" (int) and
         "document" (Document).
         """
-        # Search for the needle in the haystack, using binary search. Define that the empty query matches
-        # nothing, not everything.
-        needle = self.__normalize(query)
-        if not needle:
-            return
-        where_start = self.__binary_search(needle)
-
-        # Helper predicate. Checks if the identified suffix starts with the needle. Since slicing implies copying,
-        # cap the length of the slice to the length of the needle. The starts-with relation then becomes the same
-        # as equality, which is quick to check.
-        def _is_match(i: int) -> bool:
-            (j, offset) = self.__suffixes[i]
-            return self.__haystack[j][1][offset:(offset + len(needle))] == needle
-
-        # Suffixes sharing a prefix are consecutive in the suffix array. Scan ahead from the located index until
-        # we no longer get a match. We expect a low number of matches for typical queries, and we process all the
-        # matches below anyway. If we just wanted to count the number of matches without processing them, we
-        # could instead of a linear scan do another binary search to locate where the range ends.
-        matches = itertools.takewhile(
-            _is_match, range(where_start, len(self.__suffixes)))
-
-        # Deduplicate. A document in the haystack might contain multiple occurrences of the needle.
-        # Rank according to occurrence count, and emit in ranked order.
-        if matches:
-            debug = options.get("debug", False)
-            pairs = [self.__suffixes[i] for i in matches]
-            if debug:
-                for pair in pairs:
-                    print("*** MATCH", pair, self.__get_suffix2(pair))
-            counter = Counter([i for (i, _) in pairs])
-            for (index, count) in counter.most_common(max(1, min(100, options.get("hit_count", 10)))):
-                yield {"score": count, "document": self.__corpus[self.__haystack[index][0]]}
+        # Search for the needle in the haystack, using binary search.
+        (start, end) = self.__get_range(query)
+        debug = options.get("debug", False)
+        if debug:
+            for (offset, index) in zip(self.__suffixes[start:end], self.__documents[start:end]):
+                limit = self.__offsets[index + 1]
+                print("*** MATCH", offset, bytes(self.__text[offset:limit]).split(b"\0", 1)[0].decode("utf-8"))
+
+        # A document in the haystack might contain multiple occurrences of the needle. Rank according to
+        # occurrence count, and emit in ranked order. Try the wavelet matrix first, unless it's cheaper to
+        # just count the matches.
+        hit_count = max(1, min(100, options.get("hit_count", 10)))
+        budget = (end - start) // __class__.__node_cost
+        ranked = self.__get_top_documents(start, end, hit_count, budget) if budget >= self.__levels else None
+        if ranked is None:
+            ranked = Counter(self.__documents[start:end]).most_common(hit_count)
+        for (index, count) in ranked:
+            yield {"score": count, "document": self.__corpus[self.__document_ids[index]]}
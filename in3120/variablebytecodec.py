@@ -1,14 +1,19 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
-from struct import pack
-from typing import Tuple
+from array import array
+from typing import Iterable, Tuple
+from .integercodec import IntegerCodec
 
 
-class VariableByteCodec:
+class VariableByteCodec(IntegerCodec):
     """
     A simple encoder/decoder for variable-byte encoding. See Figure 5.8 in
     https://nlp.stanford.edu/IR-book/pdf/05comp.pdf for details.
+
+    Besides encoding and decoding one number at a time, there are bulk versions
+    that process a whole sequence of numbers in one pass. The bulk versions produce
+    and consume exactly the same bytes as the single-number versions do.
     """
 
     @staticmethod
@@ -27,7 +32,7 @@ class VariableByteCodec:
             number = number // 128
         values.reverse()
         values[-1] += 128
-        destination.extend(pack('%dB' % len(values), *values))
+        destination.extend(values)
         return len(values)
 
     @staticmethod
@@ -50,3 +55,63 @@ class VariableByteCodec:
             else:
                 number = 128 * number + (byte - 128)
                 return (number, where - start)
+
+    @staticmethod
+    def encode_many(numbers: Iterable[int], destination: bytearray) -> int:
+        """
+        Encodes all the given numbers, and appends the resulting bytes to the given
+        destination buffer. Returns the number of bytes that were appended.
+        """
+        assert destination is not None
+        encoded = bytearray()
+        for number in numbers:
+            assert number >= 0
+            if number < 128:
+                # The common case for small gaps and term frequencies: A single byte.
+                encoded.append(number + 128)
+            else:
+                values = []
+                while number >= 128:
+                    values.append(number & 127)
+                    number >>= 7
+                values.append(number)
+                values.reverse()
+                values[-1] += 128
+                encoded.extend(values)
+        destination.extend(encoded)
+        return len(encoded)
+
+    @staticmethod
+    def decode_many(source: bytearray, count: int, start: int = 0) -> Tuple[array, int]:
+        """
+        Starting at the given position in the source buffer, decodes the next count numbers,
+        or fewer if we reach the end of the buffer first. Returns a pair comprised of an array
+        holding the decoded numbers, and the number of bytes read from the source buffer.
+
+        The returned array has type code "I", so the decoded numbers are assumed to fit in
+        32 bits. That holds for the document identifier gaps and term frequencies we encode.
+        """
+        assert source is not None
+        assert start >= 0
+        assert count >= 0
+        assert start == 0 or source[start - 1] >= 128
+        numbers = array("I")
+        if count == 0:
+            return (numbers, 0)
+        append = numbers.append
+        number = 0
+        consumed = 0
+        remaining = count
+        # Iterating over a memory view spares us both the copying and the per-byte indexing.
+        with memoryview(source)[start:] as view:
+            for byte in view:
+                consumed += 1
+                if byte < 128:
+                    number = (number << 7) | byte
+                else:
+                    append((number << 7) | (byte - 128))
+                    number = 0
+                    remaining -= 1
+                    if remaining == 0:
+                        break
+        return (numbers, consumed)
@@ -43,7 +43,13 @@ def assignment_x_suite() -> unittest.TestSuite:
                              "TestInMemoryInvertedIndexWithCompression", "TestExpressionComposer",
                              "TestShallowCaseExtractor", "TestDocumentPipeline", "TestSimpleRanker",
                              "TestSoundexNormalizer", "TestPorterNormalizer",
-                             "TestSimilaritySearchEngine", "TestEditTable", "TestEditSearchEngine"])
+                             "TestSimilaritySearchEngine", "TestEditTable", "TestEditSearchEngine",
+                             "TestMemoryMappedInvertedIndex", "TestBlockCompressedInMemoryPostingList",
+                             "TestIntegerCodec", "TestCompressedInMemoryPositionalPostingList",
+                             "TestPhraseSearchEngine", "TestBM25Ranker",
+                             "TestUpdatableInMemoryInvertedIndex", "TestFrontCodedDictionary",
+                             "TestPerfectHashDictionary", "TestStreamingCorpus",
+                             "TestMemoryMappedCorpus", "TestResultCache", "TestFMIndex"])
 
 
 def main():
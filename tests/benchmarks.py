@@ -0,0 +1,368 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+from timeit import default_timer as timer
+from typing import List, Tuple
+from context import in3120
+
+
+# Define a small helper so that we get a full absolute path to the named file.
+def data_path(filename: str) -> str:
+    here = os.path.dirname(__file__)
+    data = os.path.join(here, "..", "data")
+    full = os.path.abspath(os.path.join(data, filename))
+    return full
+
+
+# Define a small helper that extracts the posting lists of an uncompressed index, laid
+# out as blocks of at most 128 postings each. Per block we get the gaps and the term
+# frequencies, which is what we compress.
+def posting_blocks(filename: str, block_size: int = 128) -> List[Tuple[List[int], List[int]]]:
+    normalizer = in3120.SimpleNormalizer()
+    tokenizer = in3120.SimpleTokenizer()
+    corpus = in3120.InMemoryCorpus(data_path(filename))
+    index = in3120.InMemoryInvertedIndex(corpus, ["body"], normalizer, tokenizer)
+    blocks = []
+    for term in index.get_vocabulary():
+        postings = list(index[term])
+        previous = 0
+        for i in range(0, len(postings), block_size):
+            block = postings[i:(i + block_size)]
+            gaps = []
+            for posting in block:
+                gaps.append(posting.document_id - previous)
+                previous = posting.document_id
+            blocks.append((gaps, [posting.term_frequency for posting in block]))
+    return blocks
+
+
+def benchmark_codecs():
+    codecs = [in3120.VariableByteCodec, in3120.EliasGammaCodec, in3120.EliasDeltaCodec,
+              in3120.Simple8bCodec, in3120.PForDeltaCodec]
+    for filename in ["cran.xml", "en.txt"]:
+        print(f"Extracting posting lists from {filename}...")
+        blocks = posting_blocks(filename)
+        postings = sum(len(gaps) for (gaps, _) in blocks)
+        print(f"{len(blocks)} blocks, {postings} postings.")
+        print(f"{'codec':<20}{'bytes/posting':>16}{'encode postings/s':>20}{'decode postings/s':>20}")
+        for codec in codecs:
+            data = bytearray()
+            offsets = []
+            start = timer()
+            for (gaps, term_frequencies) in blocks:
+                offsets.append(len(data))
+                codec.encode_many(gaps + term_frequencies, data)
+            encoding = timer() - start
+            start = timer()
+            for ((gaps, _), offset) in zip(blocks, offsets):
+                codec.decode_many(data, 2 * len(gaps), offset)
+            decoding = timer() - start
+            print(f"{codec.__name__:<20}{len(data) / postings:>16.3f}"
+                  f"{postings / encoding:>20.0f}{postings / decoding:>20.0f}")
+
+
+def benchmark_pruning():
+    class CountingRanker(in3120.BetterRanker):
+        def __init__(self, corpus: in3120.Corpus, inverted_index: in3120.InvertedIndex):
+            super().__init__(corpus, inverted_index)
+            self.count = 0
+
+        def reset(self, document_id: int) -> None:
+            super().reset(document_id)
+            self.count += 1
+
+    queries = ["of the disease virus", "the boundary layer", "the pressure", "mach number flow",
+               "the president of the united states", "football world cup", "a new study shows"]
+    normalizer = in3120.SimpleNormalizer()
+    tokenizer = in3120.SimpleTokenizer()
+    for filename in ["cran.xml", "en.txt"]:
+        print(f"Indexing {filename}...")
+        corpus = in3120.InMemoryCorpus(data_path(filename))
+        index = in3120.InMemoryInvertedIndex(corpus, ["body"], normalizer, tokenizer, True, skips=True)
+        engine = in3120.SimpleSearchEngine(corpus, index)
+        print(f"{'pruning':<12}{'scored documents':>20}{'queries/s':>12}")
+        for pruning in [None, "wand", "bmw"]:
+            ranker = CountingRanker(corpus, index)
+            options = {"match_threshold": 0.1, "hit_count": 10, "pruning": pruning}
+            start = timer()
+            for query in queries:
+                list(engine.evaluate(query, options, ranker))
+            elapsed = timer() - start
+            print(f"{str(pruning):<12}{ranker.count:>20}{len(queries) / elapsed:>12.1f}")
+
+
+def benchmark_long_queries():
+    print("Indexing cran.xml...")
+    normalizer = in3120.SimpleNormalizer()
+    tokenizer = in3120.SimpleTokenizer()
+    corpus = in3120.InMemoryCorpus(data_path("cran.xml"))
+    index = in3120.InMemoryInvertedIndex(corpus, ["body"], normalizer, tokenizer)
+    engine = in3120.SimpleSearchEngine(corpus, index)
+    ranker = in3120.SimpleRanker()
+
+    # Emulate pasted paragraphs by using document texts as queries, capped at M unique terms.
+    texts = [list(dict.fromkeys(index.get_terms(document.get_field("body", "")))) for document in corpus]
+    # Compare the heap-based traversal against a linear scan over the cursors.
+    print(f"{'M':>4}{'threshold':>12}{'scan q/s':>12}{'heap q/s':>12}{'speedup':>10}{'postings/s':>14}")
+    for m in [5, 10, 20, 50]:
+        queries = [" ".join(terms[:m]) for terms in texts if len(terms) >= m][:50]
+        postings = sum(index.get_document_frequency(t) for q in queries for t in index.get_terms(q))
+        for threshold in [0.1, 0.5]:
+            elapsed = {}
+            for traversal in ["scan", "daat"]:
+                options = {"match_threshold": threshold, "hit_count": 10, "traversal": traversal}
+                start = timer()
+                for query in queries:
+                    list(engine.evaluate(query, options, ranker))
+                elapsed[traversal] = timer() - start
+            print(f"{m:>4}{threshold:>12}{len(queries) / elapsed['scan']:>12.1f}{len(queries) / elapsed['daat']:>12.1f}"
+                  f"{elapsed['scan'] / elapsed['daat']:>10.2f}{postings / elapsed['daat']:>14.0f}")
+
+
+def benchmark_traversal():
+    queries = ["of the disease virus", "the boundary layer", "the pressure", "mach number flow",
+               "the president of the united states", "football world cup", "a new study shows"]
+    normalizer = in3120.SimpleNormalizer()
+    tokenizer = in3120.SimpleTokenizer()
+    for filename in ["cran.xml", "en.txt"]:
+        print(f"Indexing {filename}...")
+        corpus = in3120.InMemoryCorpus(data_path(filename))
+        index = in3120.InMemoryInvertedIndex(corpus, ["body"], normalizer, tokenizer, True, skips=True)
+        engine = in3120.SimpleSearchEngine(corpus, index)
+        ranker = in3120.BetterRanker(corpus, index)
+        print(f"{'traversal':<12}{'queries/s':>12}")
+        for traversal in ["daat", "taat"]:
+            options = {"match_threshold": 0.1, "hit_count": 10, "traversal": traversal}
+            start = timer()
+            for query in queries:
+                list(engine.evaluate(query, options, ranker))
+            elapsed = timer() - start
+            print(f"{traversal:<12}{len(queries) / elapsed:>12.1f}")
+
+
+def benchmark_rankers():
+    queries = ["of the disease virus", "the boundary layer", "the pressure", "mach number flow",
+               "the president of the united states", "football world cup", "a new study shows"]
+    normalizer = in3120.SimpleNormalizer()
+    tokenizer = in3120.SimpleTokenizer()
+    for filename in ["cran.xml", "en.txt"]:
+        print(f"Indexing {filename}...")
+        corpus = in3120.InMemoryCorpus(data_path(filename))
+        index = in3120.InMemoryInvertedIndex(corpus, ["body"], normalizer, tokenizer)
+        engine = in3120.SimpleSearchEngine(corpus, index)
+        print(f"{'ranker':<16}{'queries/s':>12}")
+        for ranker in [in3120.SimpleRanker(), in3120.BetterRanker(corpus, index), in3120.BM25Ranker(corpus, index)]:
+            options = {"match_threshold": 0.1, "hit_count": 10}
+            start = timer()
+            for query in queries:
+                list(engine.evaluate(query, options, ranker))
+            elapsed = timer() - start
+            print(f"{type(ranker).__name__:<16}{len(queries) / elapsed:>12.1f}")
+
+
+def benchmark_updates():
+    normalizer = in3120.SimpleNormalizer()
+    tokenizer = in3120.SimpleTokenizer()
+    corpus = in3120.InMemoryCorpus(data_path("en.txt"))
+    options = {"match_threshold": 0.5, "hit_count": 10}
+    ranker = in3120.SimpleRanker()
+    for buffer_size in [100, 1000]:
+        index = in3120.UpdatableInMemoryInvertedIndex(in3120.InMemoryCorpus(), ["body"], normalizer, tokenizer,
+                                                      buffer_size=buffer_size)
+        engine = in3120.SimpleSearchEngine(corpus, index)
+        latencies = []
+        start = timer()
+        for document in corpus:
+            before = timer()
+            index.add_document(document)
+            latencies.append(timer() - before)
+            if document.document_id % 100 == 0:
+                list(engine.evaluate("the president of the united states", options, ranker))
+        elapsed = timer() - start
+        index.wait_for_merges()
+        latencies.sort()
+        print(f"buffer_size={buffer_size}: {len(corpus) / elapsed:.1f} documents/s, "
+              f"median add latency {1000 * latencies[len(latencies) // 2]:.3f} ms, "
+              f"99th percentile {1000 * latencies[99 * len(latencies) // 100]:.3f} ms, "
+              f"{index.get_segment_count()} segments")
+        index.close()
+
+
+def benchmark_dictionary():
+    import tracemalloc
+    corpus = in3120.InMemoryCorpus(data_path("en.txt"))
+    index = in3120.InMemoryInvertedIndex(corpus, ["body"], in3120.SimpleNormalizer(), in3120.SimpleTokenizer())
+    terms = list(index.get_vocabulary())
+    print(f"{len(terms)} terms")
+    print(f"{'dictionary':<24}{'bytes':>12}{'lookups/s':>12}")
+    candidates = [("InMemoryDictionary", lambda: in3120.InMemoryDictionary())]
+    candidates += [(f"FrontCodedDictionary/{b}", lambda b=b: in3120.FrontCodedDictionary(terms, b)) for b in [4, 16, 64]]
+    candidates += [("PerfectHashDictionary", lambda: in3120.PerfectHashDictionary(terms))]
+    for (name, factory) in candidates:
+        tracemalloc.start()
+        baseline = tracemalloc.take_snapshot()
+        dictionary = factory()
+        if isinstance(dictionary, in3120.InMemoryDictionary):
+            for term in terms:
+                dictionary.add_if_absent(term)
+        size = sum(statistic.size_diff for statistic in tracemalloc.take_snapshot().compare_to(baseline, "filename"))
+        tracemalloc.stop()
+        start = timer()
+        for term in terms:
+            dictionary.get_term_id(term)
+        elapsed = timer() - start
+        print(f"{name:<24}{size:>12}{len(terms) / elapsed:>12.1f}")
+
+
+def benchmark_documents():
+    import random
+    import tempfile
+    filename = data_path("imdb.csv")
+    corpus = in3120.InMemoryCorpus(filename)
+    rng = random.Random(42)
+    document_ids = [rng.randrange(corpus.size()) for _ in range(10000)]
+    print(f"{corpus.size()} documents, {os.path.getsize(filename)} bytes")
+    print(f"{'corpus':<28}{'bytes':>12}{'lookups/s':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        candidates = [("InMemoryCorpus", corpus, ""), ("StreamingCorpus", in3120.StreamingCorpus(filename), "")]
+        for block_size in [16, 64, 256]:
+            path = os.path.join(directory, f"corpus-{block_size}.bin")
+            in3120.MemoryMappedCorpus.write(path, corpus, block_size)
+            candidates.append((f"MemoryMappedCorpus/{block_size}", in3120.MemoryMappedCorpus(path), os.path.getsize(path)))
+        for (name, candidate, size) in candidates:
+            start = timer()
+            for document_id in document_ids:
+                candidate.get_document(document_id)
+            elapsed = timer() - start
+            print(f"{name:<28}{size:>12}{len(document_ids) / elapsed:>12.1f}")
+
+
+def benchmark_batch():
+    import functools
+    import random
+    print("Indexing mesh.txt...")
+    normalizer = in3120.SimpleNormalizer()
+    tokenizer = in3120.SimpleTokenizer()
+    corpus = in3120.InMemoryCorpus(data_path("mesh.txt"))
+    index = in3120.InMemoryInvertedIndex(corpus, ["body"], normalizer, tokenizer, compressed=True)
+    engine = in3120.SimpleSearchEngine(corpus, index)
+    factory = functools.partial(in3120.BM25Ranker, corpus, index)
+
+    # Emulate a query log with a skewed distribution, by sampling short queries from the documents.
+    rng = random.Random(42)
+    texts = [document.get_field("body", "").split() for document in corpus]
+    popular = [" ".join(rng.sample(words, min(2, len(words)))) for words in rng.sample(texts, 500)]
+    queries = [rng.choice(popular) if rng.random() < 0.5 else " ".join(rng.sample(words, min(3, len(words))))
+               for words in rng.choices(texts, k=5000)]
+    options = {"match_threshold": 0.5, "hit_count": 10}
+    print(f"{len(queries)} queries")
+    print(f"{'method':<24}{'queries/s':>12}")
+    for traversal in ["daat", "taat"]:
+        ranker = factory()
+        start = timer()
+        for query in queries:
+            list(engine.evaluate(query, dict(options, traversal=traversal), ranker))
+        elapsed = timer() - start
+        print(f"{'evaluate/' + traversal:<24}{len(queries) / elapsed:>12.1f}")
+    for workers in [1, 2, 4]:
+        start = timer()
+        list(engine.evaluate_batch(queries, options, factory, workers))
+        elapsed = timer() - start
+        print(f"{'evaluate_batch/' + str(workers):<24}{len(queries) / elapsed:>12.1f}")
+
+
+def benchmark_suffix_array():
+    import tempfile
+    import tracemalloc
+    normalizer = in3120.SimpleNormalizer()
+    tokenizer = in3120.SimpleTokenizer()
+    queries = ["the", "of a", "visc", "new york", "a", "zzz"]
+    data = [("en.txt", ["body"]), ("pantheon.tsv", ["name", "birthcity", "occupation"])]
+
+    def measure(engine, repetitions: int = 10, counting: bool = False) -> float:
+        start = timer()
+        for _ in range(repetitions):
+            for query in queries:
+                if counting:
+                    engine.count(query)
+                else:
+                    list(engine.evaluate(query, {"hit_count": 10}))
+        return repetitions * len(queries) / (timer() - start)
+
+    print(f"{'corpus':<16}{'build':>10}{'open':>10}{'queries/s':>12}{'mapped/s':>12}")
+    with tempfile.TemporaryDirectory() as directory:
+        for (filename, fields) in data:
+            corpus = in3120.InMemoryCorpus(data_path(filename))
+            start = timer()
+            engine = in3120.SuffixArray(corpus, fields, normalizer, tokenizer)
+            build = timer() - start
+            path = os.path.join(directory, filename + ".sa")
+            engine.write(path)
+            start = timer()
+            mapped = in3120.SuffixArray.read(path, corpus, normalizer, tokenizer)
+            opening = timer() - start
+            print(f"{filename:<16}{build:>10.3f}{opening:>10.4f}{measure(engine):>12.1f}{measure(mapped):>12.1f}")
+            mapped.close()
+
+    print()
+    print(f"{'corpus':<16}{'engine':<16}{'build':>10}{'megabytes':>12}{'queries/s':>12}{'counts/s':>12}")
+    for (filename, fields) in data:
+        corpus = in3120.InMemoryCorpus(data_path(filename))
+        for engine_class in [in3120.SuffixArray, in3120.FMIndex]:
+            start = timer()
+            engine = engine_class(corpus, fields, normalizer, tokenizer)
+            build = timer() - start
+            del engine
+            tracemalloc.start()
+            engine = engine_class(corpus, fields, normalizer, tokenizer)
+            megabytes = tracemalloc.get_traced_memory()[0] / (1 << 20)
+            tracemalloc.stop()
+            name = engine_class.__name__
+            (evaluations, counts) = (measure(engine, 1), measure(engine, 10, True))
+            print(f"{filename:<16}{name:<16}{build:>10.3f}{megabytes:>12.2f}{evaluations:>12.1f}{counts:>12.1f}")
+
+
+def _extract_cases(document: in3120.Document) -> in3120.Document:
+    document["cases"] = ", ".join(in3120.ShallowCaseExtractor().extract(document.get_field("body", "")))
+    return document
+
+
+def benchmark_pipeline():
+    filename = data_path("en.txt")
+    pipeline = in3120.DocumentPipeline([_extract_cases])
+    print(f"{'workers':<12}{'seconds':>12}")
+    for workers in [1, 2, 4]:
+        start = timer()
+        corpus = in3120.InMemoryCorpus(filename, pipeline, workers)
+        elapsed = timer() - start
+        print(f"{workers:<12}{elapsed:>12.3f}")
+    print(f"{corpus.size()} documents")
+
+
+def main():
+    benchmarks = {
+        "codecs": benchmark_codecs,
+        "pruning": benchmark_pruning,
+        "long-queries": benchmark_long_queries,
+        "traversal": benchmark_traversal,
+        "rankers": benchmark_rankers,
+        "updates": benchmark_updates,
+        "dictionary": benchmark_dictionary,
+        "documents": benchmark_documents,
+        "pipeline": benchmark_pipeline,
+        "batch": benchmark_batch,
+        "suffix-array": benchmark_suffix_array,
+    }
+    targets = sys.argv[1:]
+    if not targets:
+        print(f"{sys.argv[0]} [{'|'.join(key for key in benchmarks.keys())}]")
+    else:
+        for target in (target.lower() for target in targets):
+            if target in benchmarks:
+                benchmarks[target]()
+
+
+if __name__ == "__main__":
+    main()
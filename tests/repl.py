@@ -151,11 +151,12 @@ def repl_b_4():
     tokenizer = in3120.SimpleTokenizer()
     corpus = in3120.InMemoryCorpus(data_path("pantheon.tsv"))
     engine = in3120.SuffixArray(corpus, ["name"], normalizer, tokenizer)
+    cache = in3120.ResultCache(engine, normalizer=normalizer, tokenizer=tokenizer)
     options = {"debug": False, "hit_count": 5}
     print("Enter a prefix phrase query and find matching people.")
     print(f"Lookup options are {options}.")
     print("Returned scores are occurrence counts.")
-    simple_ajax(lambda q: list(engine.evaluate(q, options)))
+    simple_ajax(lambda q: list(cache.evaluate(q, options)))
 
 
 def repl_c_1():
@@ -314,6 +315,20 @@ def repl_x_5():
     simple_repl("query", lambda q: list(engine.evaluate(q, options)))
 
 
+def repl_x_6():
+    print("Building positional inverted index from Cranfield corpus...")
+    normalizer = in3120.SimpleNormalizer()
+    tokenizer = in3120.SimpleTokenizer()
+    corpus = in3120.InMemoryCorpus(data_path("cran.xml"))
+    index = in3120.InMemoryInvertedIndex(corpus, ["body"], normalizer, tokenizer, True, positional=True)
+    engine = in3120.PhraseSearchEngine(corpus, index)
+    options = {"debug": False, "hit_count": 5}
+    print("Enter a phrase query like 'boundary layer', or a proximity query like 'mach NEAR/3 pressure'.")
+    print(f"Lookup options are {options}.")
+    print("Returned scores are occurrence counts.")
+    simple_repl("query", lambda q: list(engine.evaluate(q, options)))
+
+
 def main():
     repls = {
         "a-1": repl_a_1,
@@ -333,6 +348,7 @@ def main():
         "x-3": repl_x_3,
         "x-4": repl_x_4,
         "x-5": repl_x_5,
+        "x-6": repl_x_6,
     }  # The first letter of each key aligns with an obligatory assignment.
     targets = sys.argv[1:]
     if not targets:
@@ -26,6 +26,8 @@ class TestBetterRanker(unittest.TestCase):
             7, {"title": "the baz baz"}))
         index = in3120.InMemoryInvertedIndex(
             corpus, ["title"], normalizer, tokenizer)
+        self.__corpus = corpus
+        self.__index = index
         self.__ranker = in3120.BetterRanker(corpus, index)
 
     def test_term_frequency(self):
@@ -58,6 +60,83 @@ class TestBetterRanker(unittest.TestCase):
         self.assertGreater(score2, 0.0)
         self.assertGreater(score1, score2)
 
+    def test_upper_bound(self):
+        for (term, document_id, term_frequency) in [("foo", 2, 2), ("bar", 4, 2), ("the", 0, 1)]:
+            self.__ranker.reset(document_id)
+            self.__ranker.update(term, 1, in3120.Posting(document_id, term_frequency))
+            score = self.__ranker.evaluate()
+            bound = self.__ranker.get_upper_bound(term, 1, term_frequency) + self.__ranker.get_static_upper_bound()
+            self.assertGreaterEqual(bound, score)
+            self.assertLess(self.__ranker.get_upper_bound(term, 1, term_frequency - 1), bound)
+        self.assertAlmostEqual(self.__ranker.get_static_upper_bound(), 0.9)
+
+    def test_contributions(self):
+        import numpy as np
+        document_ids = np.array([0, 2, 7])
+        contributions = self.__ranker.get_contributions("foo", 1, document_ids, np.array([1, 2, 3]))
+        static = self.__ranker.get_static_contributions(document_ids)
+        for (i, document_id) in enumerate(document_ids):
+            self.__ranker.reset(int(document_id))
+            self.__ranker.update("foo", 1, in3120.Posting(int(document_id), i + 1))
+            self.assertAlmostEqual(contributions[i] + static[i], self.__ranker.evaluate(), 5)
+
+    def test_prepare_computes_idf_once(self):
+        class CountingIndex:
+            def __init__(self, index):
+                self.index = index
+                self.lookups = 0
+
+            def get_document_frequency(self, term):
+                self.lookups += 1
+                return self.index.get_document_frequency(term)
+
+        index = CountingIndex(self.__index)
+        ranker = in3120.BetterRanker(self.__corpus, index)
+        ranker.prepare([("foo", 1), ("bar", 1)])
+        self.assertEqual(index.lookups, 2)
+        for document_id in range(3):
+            ranker.reset(document_id)
+            ranker.update("foo", 1, in3120.Posting(document_id, 1))
+            ranker.evaluate()
+        self.assertEqual(index.lookups, 2)
+        ranker.prepare([("foo", 1)])
+        self.assertEqual(index.lookups, 3)
+
+    def test_static_scores_are_precomputed(self):
+        class CountingCorpus(in3120.InMemoryCorpus):
+            lookups = 0
+
+            def get_document(self, document_id):
+                self.lookups += 1
+                return super().get_document(document_id)
+
+        corpus = CountingCorpus()
+        for document in self.__corpus:
+            corpus.add_document(document)
+        ranker = in3120.BetterRanker(corpus, self.__index)
+        for document_id in range(len(corpus)):
+            ranker.reset(document_id)
+            score = ranker.evaluate()
+            self.assertAlmostEqual(score, self.__corpus[document_id].get_field("static_quality_score", 0.0), 5)
+        self.assertEqual(corpus.lookups, 0)
+
+    def test_documents_added_after_construction(self):
+        normalizer = in3120.SimpleNormalizer()
+        tokenizer = in3120.SimpleTokenizer()
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(0, {"title": "foo", "static_quality_score": 0.5}))
+        index = in3120.UpdatableInMemoryInvertedIndex(corpus, ["title"], normalizer, tokenizer)
+        self.addCleanup(index.close)
+        ranker = in3120.BetterRanker(corpus, index)
+        engine = in3120.SimpleSearchEngine(corpus, index)
+        document = in3120.InMemoryDocument(1, {"title": "foo", "static_quality_score": 2.0})
+        corpus.add_document(document)
+        index.add_document(document)
+        matches = list(engine.evaluate("foo", {"match_threshold": 1.0, "hit_count": 10}, ranker))
+        self.assertListEqual([m["document"].document_id for m in matches], [1, 0])
+        self.assertAlmostEqual(matches[0]["score"], 2.0, 5)
+        self.assertAlmostEqual(ranker.get_static_upper_bound(), 2.0, 5)
+
     def test_static_quality_score(self):
         self.__ranker.reset(0)
         self.__ranker.update("foo", 1, in3120.Posting(0, 1))
@@ -0,0 +1,119 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+from test_inmemorypostinglist import TestInMemoryPostingList
+from context import in3120
+
+
+class TestBlockCompressedInMemoryPostingList(unittest.TestCase):
+
+    def setUp(self):
+        self._tester = TestInMemoryPostingList()
+        self._tester.setUp()
+
+    def test_append_and_iterate(self):
+        self._tester._test_append_and_iterate(in3120.BlockCompressedInMemoryPostingList())
+        self._tester._test_append_and_iterate(in3120.BlockCompressedInMemoryPostingList(2))
+
+    def test_invalid_append(self):
+        self._tester._test_invalid_append(in3120.BlockCompressedInMemoryPostingList())
+
+    def test_invalid_block_size(self):
+        with self.assertRaises(AssertionError):
+            in3120.BlockCompressedInMemoryPostingList(0)
+
+    def test_max_term_frequency(self):
+        self._tester._test_max_term_frequency(in3120.BlockCompressedInMemoryPostingList())
+        self._tester._test_max_term_frequency(in3120.BlockCompressedInMemoryPostingList(2))
+
+    def test_block_bound(self):
+        postings = in3120.BlockCompressedInMemoryPostingList(2)
+        for (document_id, term_frequency) in [(1, 3), (2, 7), (5, 1), (8, 2), (13, 4)]:
+            postings.append_posting(in3120.Posting(document_id, term_frequency))
+        iterator = iter(postings)
+        self.assertEqual(iterator.get_block_bound(0), (2, 7))
+        self.assertEqual(iterator.get_block_bound(3), (8, 2))
+        self.assertEqual(iterator.get_block_bound(8), (8, 2))
+        self.assertEqual(iterator.get_block_bound(9), (13, 4))
+        self.assertEqual(iterator.get_block_bound(14)[1], 0)
+        self.assertEqual(iterator.skip_to(13).document_id, 13)
+        self.assertEqual(iterator.get_block_bound(0), (13, 4))
+
+    def test_skip_to(self):
+        postings = in3120.BlockCompressedInMemoryPostingList(4)
+        document_ids = list(range(3, 300, 7))
+        for document_id in document_ids:
+            postings.append_posting(in3120.Posting(document_id, document_id % 5 + 1))
+        postings.finalize_postings()
+        for target in range(0, 310):
+            iterator = iter(postings)
+            posting = iterator.skip_to(target)
+            expected = [d for d in document_ids if d >= target]
+            if expected:
+                self.assertEqual(posting.document_id, expected[0])
+                self.assertEqual(posting.term_frequency, expected[0] % 5 + 1)
+                self.assertListEqual([p.document_id for p in iterator], expected[1:])
+            else:
+                self.assertIsNone(posting)
+                self.assertIsNone(next(iterator, None))
+
+    def test_skip_to_is_monotonic(self):
+        postings = in3120.BlockCompressedInMemoryPostingList(3)
+        for document_id in range(0, 100, 2):
+            postings.append_posting(in3120.Posting(document_id, 1))
+        iterator = iter(postings)
+        self.assertEqual(iterator.skip_to(11).document_id, 12)
+        self.assertEqual(iterator.skip_to(5).document_id, 14)
+        self.assertEqual(next(iterator).document_id, 16)
+        self.assertEqual(iterator.skip_to(17).document_id, 18)
+        self.assertEqual(iterator.skip_to(98).document_id, 98)
+        self.assertIsNone(iterator.skip_to(99))
+        self.assertIsNone(iterator.skip_to(0))
+
+    def test_iterate_while_appending(self):
+        postings = in3120.BlockCompressedInMemoryPostingList(2)
+        postings.append_posting(in3120.Posting(1, 1))
+        postings.append_posting(in3120.Posting(2, 1))
+        postings.append_posting(in3120.Posting(5, 1))
+        self.assertEqual(iter(postings).skip_to(4).document_id, 5)
+        postings.append_posting(in3120.Posting(9, 1))
+        self.assertEqual(iter(postings).skip_to(6).document_id, 9)
+        self.assertListEqual([p.document_id for p in postings], [1, 2, 5, 9])
+
+    def test_codecs(self):
+        document_ids = list(range(3, 3000, 7)) + [5000, 100000]
+        for codec in [in3120.VariableByteCodec, in3120.EliasGammaCodec, in3120.EliasDeltaCodec,
+                      in3120.Simple8bCodec, in3120.PForDeltaCodec]:
+            postings = in3120.BlockCompressedInMemoryPostingList(128, codec)
+            for document_id in document_ids:
+                postings.append_posting(in3120.Posting(document_id, document_id % 5 + 1))
+            self.assertListEqual([p.document_id for p in postings], document_ids)
+            postings.finalize_postings()
+            self.assertListEqual([(p.document_id, p.term_frequency) for p in postings],
+                                 [(d, d % 5 + 1) for d in document_ids])
+            self.assertEqual(iter(postings).skip_to(2000).document_id, 2005)
+            self.assertEqual(iter(postings).skip_to(5001).document_id, 100000)
+
+    def test_mesh_corpus(self):
+        normalizer = in3120.SimpleNormalizer()
+        tokenizer = in3120.SimpleTokenizer()
+        corpus = in3120.InMemoryCorpus("../data/mesh.txt")
+        index1 = in3120.InMemoryInvertedIndex(corpus, ["body"], normalizer, tokenizer, True, skips=True)
+        index2 = in3120.InMemoryInvertedIndex(corpus, ["body"], normalizer, tokenizer, False)
+        merger = in3120.PostingsMerger()
+        for (term1, term2) in [("hiv", "protein"), ("water", "toxic"), ("acid", "a"), ("of", "disease")]:
+            result1 = [p.document_id for p in merger.intersection(index1[term1], index1[term2])]
+            result2 = [p.document_id for p in merger.intersection(index2[term1], index2[term2])]
+            self.assertListEqual(result1, result2)
+            result1 = [p.document_id for p in merger.intersection(index1[term2], index1[term1])]
+            self.assertListEqual(result1, result2)
+        index3 = in3120.InMemoryInvertedIndex(corpus, ["body"], normalizer, tokenizer, True,
+                                              codec=in3120.PForDeltaCodec)
+        for term in ["hiv", "protein", "of", "a"]:
+            self.assertListEqual([(p.document_id, p.term_frequency) for p in index3[term]],
+                                 [(p.document_id, p.term_frequency) for p in index2[term]])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
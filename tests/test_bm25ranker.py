@@ -0,0 +1,119 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import math
+import unittest
+from context import in3120
+
+
+class TestBM25Ranker(unittest.TestCase):
+
+    def setUp(self):
+        self._normalizer = in3120.SimpleNormalizer()
+        self._tokenizer = in3120.SimpleTokenizer()
+        self._corpus = in3120.InMemoryCorpus()
+        self._corpus.add_document(in3120.InMemoryDocument(0, {"title": "foo", "body": "the bar baz qux"}))
+        self._corpus.add_document(in3120.InMemoryDocument(1, {"title": "bar", "body": "foo"}))
+        self._corpus.add_document(in3120.InMemoryDocument(2, {"title": "baz", "body": "the foo the foo the"}))
+        self._corpus.add_document(in3120.InMemoryDocument(3, {"title": "", "body": "the bar"}))
+        self._index = in3120.InMemoryInvertedIndex(self._corpus, ["title", "body"], self._normalizer, self._tokenizer)
+        self._ranker = in3120.BM25Ranker(self._corpus, self._index)
+
+    def _score(self, ranker, document_id, term, multiplicity=1):
+        posting = next(p for p in self._index[term] if p.document_id == document_id)
+        ranker.reset(document_id)
+        ranker.update(term, multiplicity, posting)
+        return ranker.evaluate()
+
+    def test_document_lengths(self):
+        self.assertListEqual(list(self._index.get_document_lengths("title")), [1, 1, 1, 0])
+        self.assertListEqual(list(self._index.get_document_lengths("body")), [4, 1, 5, 2])
+        self.assertListEqual(list(self._index.get_document_lengths()), [5, 2, 6, 2])
+
+    def test_formula(self):
+        (k1, b, n, df, tf, dl, avgdl) = (1.2, 0.75, 4, 3, 2, 6, 3.75)
+        idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+        expected = idf * tf * (k1 + 1.0) / (tf + k1 * (1.0 - b + b * dl / avgdl))
+        self.assertAlmostEqual(self._score(self._ranker, 2, "foo"), expected, 5)
+        self.assertAlmostEqual(self._score(self._ranker, 2, "foo", 2), 2 * expected, 5)
+
+    def test_length_normalization(self):
+        # Same term frequency, but document 1 is shorter than document 0.
+        self.assertGreater(self._score(self._ranker, 1, "foo"), self._score(self._ranker, 0, "foo"))
+        ranker = in3120.BM25Ranker(self._corpus, self._index, b=0.0)
+        self.assertAlmostEqual(self._score(ranker, 1, "foo"), self._score(ranker, 0, "foo"), 8)
+
+    def test_idf(self):
+        self.assertGreater(self._score(self._ranker, 2, "baz"), self._score(self._ranker, 0, "bar"))
+        self.assertGreater(self._score(self._ranker, 3, "the"), 0.0)
+
+    def test_prepare_computes_idf_once(self):
+        class CountingInvertedIndex(in3120.InvertedIndex):
+            def __init__(self, wrapped: in3120.InvertedIndex):
+                self.__wrapped = wrapped
+                self.count = 0
+
+            def get_terms(self, buffer: str):
+                return self.__wrapped.get_terms(buffer)
+
+            def get_postings_iterator(self, term: str):
+                return self.__wrapped.get_postings_iterator(term)
+
+            def get_document_frequency(self, term: str) -> int:
+                self.count += 1
+                return self.__wrapped.get_document_frequency(term)
+
+            def get_document_lengths(self, field=None):
+                return self.__wrapped.get_document_lengths(field)
+
+        index = CountingInvertedIndex(self._index)
+        ranker = in3120.BM25Ranker(self._corpus, index)
+        ranker.prepare([("foo", 1), ("the", 1)])
+        self.assertEqual(index.count, 2)
+        for document_id in [0, 1, 2]:
+            self._score(ranker, document_id, "foo")
+        for document_id in [0, 2, 3]:
+            self._score(ranker, document_id, "the")
+        self.assertEqual(index.count, 2)
+
+    def test_upper_bound_and_contributions(self):
+        import numpy as np
+        for term in ["foo", "bar", "the", "baz"]:
+            bound = self._ranker.get_upper_bound(term, 2, self._index.get_max_term_frequency(term))
+            (document_ids, term_frequencies) = self._index.get_postings_arrays(term)
+            contributions = self._ranker.get_contributions(term, 2, np.frombuffer(document_ids, dtype=np.uint32),
+                                                           np.frombuffer(term_frequencies, dtype=np.uint32))
+            for (document_id, contribution) in zip(document_ids, contributions):
+                score = self._score(self._ranker, document_id, term, 2)
+                self.assertLessEqual(score, bound)
+                self.assertAlmostEqual(contribution, score, 5)
+
+    def test_documents_added_after_construction(self):
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(0, {"body": "foo bar"}))
+        index = in3120.UpdatableInMemoryInvertedIndex(corpus, ["body"], self._normalizer, self._tokenizer)
+        self.addCleanup(index.close)
+        ranker = in3120.BM25Ranker(corpus, index)
+        engine = in3120.SimpleSearchEngine(corpus, index)
+        for (document_id, body) in [(1, "foo foo foo"), (2, "foo baz baz baz baz baz baz")]:
+            document = in3120.InMemoryDocument(document_id, {"body": body})
+            corpus.add_document(document)
+            index.add_document(document)
+        matches = list(engine.evaluate("foo", {"match_threshold": 1.0, "hit_count": 10}, ranker))
+        self.assertListEqual([m["document"].document_id for m in matches], [1, 0, 2])
+        expected = in3120.BM25Ranker(corpus, index)
+        expected.prepare([("foo", 1)])
+        for match in matches:
+            posting = next(p for p in index["foo"] if p.document_id == match["document"].document_id)
+            expected.reset(posting.document_id)
+            expected.update("foo", 1, posting)
+            self.assertAlmostEqual(match["score"], expected.evaluate(), 5)
+
+    def test_document_id_mismatch(self):
+        self._ranker.reset(21)
+        with self.assertRaises(AssertionError):
+            self._ranker.update("foo", 1, in3120.Posting(42, 4))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
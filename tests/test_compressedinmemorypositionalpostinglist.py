@@ -0,0 +1,42 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+from test_inmemorypostinglist import TestInMemoryPostingList
+from context import in3120
+
+
+class TestCompressedInMemoryPositionalPostingList(unittest.TestCase):
+
+    def setUp(self):
+        self._tester = TestInMemoryPostingList()
+        self._tester.setUp()
+
+    def test_append_and_iterate_positions(self):
+        self._tester._test_append_and_iterate_positions(in3120.CompressedInMemoryPositionalPostingList())
+
+    def test_max_term_frequency(self):
+        postings = in3120.CompressedInMemoryPositionalPostingList()
+        postings.append_posting(in3120.PositionalPosting(1, [1, 2]))
+        postings.append_posting(in3120.PositionalPosting(4, [0, 5, 9]))
+        postings.append_posting(in3120.PositionalPosting(6, [7]))
+        self.assertEqual(postings.get_max_term_frequency(), 3)
+
+    def test_invalid_append(self):
+        postings = in3120.CompressedInMemoryPositionalPostingList()
+        postings.append_posting(in3120.PositionalPosting(21, [1, 2]))
+        for i in range(0, 2):
+            with self.assertRaises(AssertionError):
+                postings.append_posting(in3120.PositionalPosting(21 - i, [1]))
+
+    def test_iterate_while_appending(self):
+        postings = in3120.CompressedInMemoryPositionalPostingList()
+        postings.append_posting(in3120.PositionalPosting(1, [4]))
+        iterator = iter(postings)
+        postings.append_posting(in3120.PositionalPosting(2, [0, 1]))
+        self.assertListEqual([p.positions for p in iterator], [[4]])
+        self.assertListEqual([p.positions for p in postings], [[4], [0, 1]])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -21,6 +21,12 @@ class TestCompressedInMemoryPostingList(unittest.TestCase):
     def test_invalid_append(self):
         self._tester1._test_invalid_append(in3120.CompressedInMemoryPostingList())
 
+    def test_max_term_frequency(self):
+        self._tester1._test_max_term_frequency(in3120.CompressedInMemoryPostingList())
+
+    def test_get_arrays(self):
+        self._tester1._test_get_arrays(in3120.CompressedInMemoryPostingList())
+
     def test_mesh_corpus(self):
         self._tester2._test_mesh_corpus(True)
 
@@ -6,6 +6,15 @@ from typing import Optional
 from context import in3120
 
 
+def _drop_if_odd(document: in3120.Document) -> Optional[in3120.Document]:
+    return None if document["foo"] % 2 else document
+
+
+def _double_foo(document: in3120.Document) -> in3120.Document:
+    document["foo"] = 2 * document["foo"]
+    return document
+
+
 class TestDocumentPipeline(unittest.TestCase):
 
     def setUp(self) -> None:
@@ -51,6 +60,15 @@ class TestDocumentPipeline(unittest.TestCase):
         self.assertIsNone(pipeline.process_document(in3120.InMemoryDocument(10, {"foo": 1000})))
         self.assertIsNotNone(pipeline.process_document(in3120.InMemoryDocument(10, {"foo": 999})))
 
+    def test_map(self):
+        pipeline = in3120.DocumentPipeline([_drop_if_odd, _double_foo])
+        expected = [(i, 2 * i) for i in range(0, 100, 2)]
+        for (workers, chunk_size) in [(1, 1), (1, 64), (2, 1), (3, 7), (4, 1000)]:
+            documents = (in3120.InMemoryDocument(i, {"foo": i}) for i in range(100))
+            results = pipeline.map(documents, workers, chunk_size)
+            self.assertListEqual([(d.document_id, d["foo"]) for d in results], expected)
+        self.assertListEqual(list(pipeline.map([], 2)), [])
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
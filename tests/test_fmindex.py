@@ -0,0 +1,128 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+from context import in3120
+
+
+class TestFMIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.__normalizer = in3120.SimpleNormalizer()
+        self.__tokenizer = in3120.SimpleTokenizer()
+
+    def __process_query_and_verify_winner(self, engine, query, winners, score):
+        options = {"debug": False, "hit_count": 5}
+        matches = list(engine.evaluate(query, options))
+        if winners:
+            self.assertGreaterEqual(len(matches), 1)
+            self.assertLessEqual(len(matches), 5)
+            self.assertIn(matches[0]["document"].document_id, winners)
+            if score:
+                self.assertEqual(matches[0]["score"], score)
+        else:
+            self.assertEqual(len(matches), 0)
+
+    def test_canonicalized_corpus(self):
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(corpus.size(), {"a": "Japanese リンク"}))
+        corpus.add_document(in3120.InMemoryDocument(corpus.size(), {"a": "Cedilla \u0043\u0327 and \u00C7 foo"}))
+        engine = in3120.FMIndex(corpus, ["a"], self.__normalizer, self.__tokenizer)
+        self.__process_query_and_verify_winner(engine, "ﾘﾝｸ", [0], 1)
+        self.__process_query_and_verify_winner(engine, "\u00C7", [1], 2)
+
+    def test_cran_corpus(self):
+        corpus = in3120.InMemoryCorpus("../data/cran.xml")
+        engine = in3120.FMIndex(corpus, ["body"], self.__normalizer, self.__tokenizer)
+        self.__process_query_and_verify_winner(engine, "visc", [328], 11)
+        self.__process_query_and_verify_winner(engine, "Of  A", [946], 10)
+        self.__process_query_and_verify_winner(engine, "", [], None)
+        self.__process_query_and_verify_winner(engine, "approximate solution", [159, 1374], 3)
+        self.assertEqual(engine.count("approximate solution"), 38)
+        self.assertEqual(engine.count("zzz"), 0)
+
+    def test_multiple_fields(self):
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(0, {"field1": "a b c", "field2": "b c d"}))
+        corpus.add_document(in3120.InMemoryDocument(1, {"field1": "x", "field2": "y"}))
+        corpus.add_document(in3120.InMemoryDocument(2, {"field1": "y", "field2": "z"}))
+        engine0 = in3120.FMIndex(corpus, ["field1", "field2"], self.__normalizer, self.__tokenizer)
+        engine1 = in3120.FMIndex(corpus, ["field1"], self.__normalizer, self.__tokenizer)
+        self.__process_query_and_verify_winner(engine0, "b c", [0], 2)
+        self.__process_query_and_verify_winner(engine0, "c d", [0], 1)
+        self.__process_query_and_verify_winner(engine0, "c b", [], None)
+        self.__process_query_and_verify_winner(engine0, "y", [1, 2], 1)
+        self.__process_query_and_verify_winner(engine1, "y", [2], 1)
+        self.__process_query_and_verify_winner(engine1, "z", [], None)
+
+    def test_matches_suffix_array(self):
+        import random
+        rng = random.Random(1234)
+        words = ["a", "ab", "aba", "b", "ba", "bab", "abab", "æøå"]
+        corpus = in3120.InMemoryCorpus()
+        for document_id in range(60):
+            fields = {f: " ".join(rng.choices(words, k=rng.randint(0, 30))) for f in ["x", "y"]}
+            corpus.add_document(in3120.InMemoryDocument(document_id, fields))
+        expected = in3120.SuffixArray(corpus, ["x", "y"], self.__normalizer, self.__tokenizer)
+        queries = ["a", "b", "ab", "a b", "ab a", "aba b", "a ba", "b a b", "abab ab", "bab ba", "c", "æ", "øå"]
+        for sample_rate in [1, 5, 32]:
+            engine = in3120.FMIndex(corpus, ["x", "y"], self.__normalizer, self.__tokenizer, sample_rate)
+            for query in queries:
+                self.assertEqual(engine.count(query), expected.count(query))
+                matches = {m["document"].document_id: m["score"] for m in engine.evaluate(query, {"hit_count": 100})}
+                self.assertDictEqual(matches, {m["document"].document_id: m["score"]
+                                               for m in expected.evaluate(query, {"hit_count": 100})})
+
+    def test_locate_limit(self):
+        corpus = in3120.InMemoryCorpus()
+        for document_id in range(20):
+            corpus.add_document(in3120.InMemoryDocument(document_id, {"body": " ".join(["a"] * (document_id + 1))}))
+        engine = in3120.FMIndex(corpus, ["body"], self.__normalizer, self.__tokenizer)
+        exact = [(m["document"].document_id, m["score"]) for m in engine.evaluate("a", {"hit_count": 3})]
+        self.assertListEqual(exact, [(19, 20), (18, 19), (17, 18)])
+        self.assertListEqual(exact, [(m["document"].document_id, m["score"])
+                                     for m in engine.evaluate("a", {"hit_count": 3, "locate_limit": 210})])
+        matches = list(engine.evaluate("a", {"hit_count": 100, "locate_limit": 21}))
+        self.assertLessEqual(len(matches), 21)
+        self.assertAlmostEqual(sum(m["score"] for m in matches), engine.count("a"), delta=len(matches))
+        self.assertLessEqual(len(list(engine.evaluate("a", {"hit_count": 100, "locate_limit": 5}))), 5)
+
+    def test_frequent_queries_match_suffix_array(self):
+        corpus = in3120.InMemoryCorpus("../data/en.txt")
+        engine = in3120.FMIndex(corpus, ["body"], self.__normalizer, self.__tokenizer)
+        expected = in3120.SuffixArray(corpus, ["body"], self.__normalizer, self.__tokenizer)
+        for query in ["the", "a"]:
+            matches = [(m["score"], m["document"].document_id) for m in engine.evaluate(query, {"hit_count": 100})]
+            baseline = [(m["score"], m["document"].document_id) for m in expected.evaluate(query, {"hit_count": 100})]
+            self.assertListEqual([score for (score, _) in matches], [score for (score, _) in baseline])
+            cutoff = matches[-1][0]
+            self.assertSetEqual({m for m in matches if m[0] > cutoff}, {m for m in baseline if m[0] > cutoff})
+
+    def test_empty_corpus(self):
+        engine = in3120.FMIndex(in3120.InMemoryCorpus(), ["a"], self.__normalizer, self.__tokenizer)
+        self.assertListEqual(list(engine.evaluate("a", {})), [])
+        self.assertEqual(engine.count("a"), 0)
+
+    def test_uses_less_memory_than_suffix_array(self):
+        import tracemalloc
+        corpus = in3120.InMemoryCorpus("../data/cran.xml")
+        sizes = []
+        for engine_class in [in3120.SuffixArray, in3120.FMIndex]:
+            tracemalloc.start()
+            engine = engine_class(corpus, ["body"], self.__normalizer, self.__tokenizer)
+            sizes.append(tracemalloc.get_traced_memory()[0])
+            tracemalloc.stop()
+            self.assertIsNotNone(engine)
+        self.assertLess(sizes[1], sizes[0] // 2)
+
+    def test_uses_yield(self):
+        import types
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(0, {"a": "the foo bar"}))
+        engine = in3120.FMIndex(corpus, ["a"], self.__normalizer, self.__tokenizer)
+        matches = engine.evaluate("foo", {})
+        self.assertIsInstance(matches, types.GeneratorType, "Are you using yield?")
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,92 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from context import in3120
+
+
+class TestFrontCodedDictionary(unittest.TestCase):
+
+    def setUp(self):
+        self.__terms = ["foo", "foobar", "food", "fo", "bar", "baz", "zed", "æøå", "æble", "a"]
+
+    def test_access_vocabulary(self):
+        vocabulary = in3120.FrontCodedDictionary(["foo", "bar", "foo"])
+        self.assertEqual(len(vocabulary), 2)
+        self.assertEqual(vocabulary.size(), 2)
+        self.assertEqual(vocabulary.get_term_id("bar"), 0)
+        self.assertEqual(vocabulary.get_term_id("foo"), 1)
+        self.assertEqual(vocabulary["foo"], 1)
+        self.assertEqual(vocabulary.add_if_absent("foo"), 1)
+        self.assertIn("bar", vocabulary)
+        self.assertNotIn("wtf", vocabulary)
+        self.assertIsNone(vocabulary.get_term_id("wtf"))
+        self.assertListEqual([v for v in vocabulary], [("bar", 0), ("foo", 1)])
+        with self.assertRaisesRegex(TypeError, "read-only"):
+            vocabulary.add_if_absent("wtf")
+
+    def test_sorted_order(self):
+        expected = sorted(self.__terms, key=lambda term: term.encode("utf-8"))
+        for block_size in [1, 2, 3, 16]:
+            vocabulary = in3120.FrontCodedDictionary(self.__terms, block_size)
+            self.assertListEqual([term for (term, _) in vocabulary], expected)
+            for (term_id, term) in enumerate(expected):
+                self.assertEqual(vocabulary.get_term_id(term), term_id)
+                self.assertEqual(vocabulary.get_term(term_id), term)
+            for term in ["", "b", "fooa", "foobars", "zz", "æ", "ø"]:
+                self.assertIsNone(vocabulary.get_term_id(term))
+
+    def test_prefix_range(self):
+        for block_size in [1, 2, 3, 16]:
+            vocabulary = in3120.FrontCodedDictionary(self.__terms, block_size)
+            for prefix in ["", "f", "fo", "foo", "food", "foods", "b", "ba", "æ", "x", "zed", "zz"]:
+                expected = sorted((term for term in self.__terms if term.startswith(prefix)),
+                                  key=lambda term: term.encode("utf-8"))
+                matches = list(vocabulary.get_prefix_matches(prefix))
+                self.assertListEqual([term for (term, _) in matches], expected)
+                self.assertListEqual([vocabulary.get_term_id(term) for (term, _) in matches],
+                                     [term_id for (_, term_id) in matches])
+                (start, end) = vocabulary.prefix_range(prefix)
+                self.assertEqual(end - start, len(expected))
+
+    def test_empty_dictionary(self):
+        vocabulary = in3120.FrontCodedDictionary([])
+        self.assertEqual(len(vocabulary), 0)
+        self.assertIsNone(vocabulary.get_term_id("foo"))
+        self.assertListEqual(list(vocabulary), [])
+        self.assertEqual(vocabulary.prefix_range("foo"), (0, 0))
+
+    def test_mesh_corpus(self):
+        corpus = in3120.InMemoryCorpus("../data/mesh.txt")
+        index = in3120.InMemoryInvertedIndex(corpus, ["body"], in3120.SimpleNormalizer(), in3120.SimpleTokenizer())
+        terms = list(index.get_vocabulary())
+        vocabulary = in3120.FrontCodedDictionary(terms)
+        self.assertEqual(len(vocabulary), len(terms))
+        for term in terms:
+            self.assertEqual(vocabulary.get_term(vocabulary.get_term_id(term)), term)
+        self.assertListEqual([term for (term, _) in vocabulary.get_prefix_matches("hydro")],
+                             sorted(term for term in terms if term.startswith("hydro")))
+
+    def test_write_and_read(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "dictionary.bin")
+            in3120.FrontCodedDictionary(self.__terms, 3).write(filename)
+            vocabulary = in3120.FrontCodedDictionary.read(filename)
+            self.assertListEqual(list(vocabulary), list(in3120.FrontCodedDictionary(self.__terms, 3)))
+            self.assertEqual(vocabulary.get_term_id("food"), 6)
+            self.assertListEqual([term for (term, _) in vocabulary.get_prefix_matches("æ")], ["æble", "æøå"])
+            del vocabulary
+
+    def test_invalid_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "dictionary.bin")
+            with open(filename, mode="wb") as file:
+                file.write(b"\0" * 64)
+            with self.assertRaises(IOError):
+                in3120.FrontCodedDictionary.read(filename)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
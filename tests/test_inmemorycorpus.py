@@ -6,6 +6,15 @@ from typing import Optional
 from context import in3120
 
 
+def _drop_document_if_it_contains_the_in_body(document: in3120.Document) -> Optional[in3120.Document]:
+    return None if "the" in document.get_field("body", "") else document
+
+
+def _uppercase_body(document: in3120.Document) -> in3120.Document:
+    document["body"] = document.get_field("body", "").upper()
+    return document
+
+
 class TestInMemoryCorpus(unittest.TestCase):
 
     def test_access_documents(self):
@@ -41,6 +50,14 @@ class TestInMemoryCorpus(unittest.TestCase):
         corpus = in3120.InMemoryCorpus("../data/imdb.csv", pipeline)
         self.assertEqual(corpus.size(), 1000)
 
+    def test_load_from_file_in_parallel(self):
+        pipeline = in3120.DocumentPipeline([_drop_document_if_it_contains_the_in_body, _uppercase_body])
+        for filename in ["../data/mesh.txt", "../data/cran.xml", "../data/docs.json"]:
+            expected = in3120.InMemoryCorpus(filename, pipeline)
+            corpus = in3120.InMemoryCorpus(filename, pipeline, 3)
+            self.assertListEqual([d.to_dict() for d in corpus], [d.to_dict() for d in expected])
+            self.assertListEqual([d.document_id for d in corpus], list(range(corpus.size())))
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -16,12 +16,24 @@ class TestInMemoryInvertedIndexWithCompression(unittest.TestCase):
     def test_access_postings(self):
         self._tester.test_access_postings()
 
+    def test_postings_arrays(self):
+        self._tester.test_postings_arrays()
+
     def test_mesh_corpus(self):
         self._tester.test_mesh_corpus()
 
     def test_multiple_fields(self):
         self._tester.test_multiple_fields()
 
+    def test_front_coded_dictionary(self):
+        self._tester.test_front_coded_dictionary()
+
+    def test_parallel_build(self):
+        self._tester.test_parallel_build()
+
+    def test_positions(self):
+        self._tester.test_positions()
+
     def test_memory_usage(self):
         import tracemalloc
         import inspect
@@ -35,15 +47,21 @@ class TestInMemoryInvertedIndexWithCompression(unittest.TestCase):
         self.assertIsNotNone(index_compressed)
         snapshot_compressed = tracemalloc.take_snapshot()
         tracemalloc.stop()
-        for statistic in snapshot_uncompressed.compare_to(snapshot_baseline, "filename"):
-            if statistic.traceback[0].filename == inspect.getfile(in3120.InMemoryInvertedIndex):
-                size_uncompressed = statistic.size_diff
-        for statistic in snapshot_compressed.compare_to(snapshot_uncompressed, "filename"):
-            if statistic.traceback[0].filename == inspect.getfile(in3120.InMemoryInvertedIndex):
-                size_compressed = statistic.size_diff
-        compression_ratio = size_uncompressed / size_compressed
-        self.assertGreater(compression_ratio, 14)
 
+        # The posting lists are created by the index, and their contents are allocated by the posting lists
+        # themselves and by the codec.
+        filenames = {inspect.getfile(in3120.InMemoryInvertedIndex), inspect.getfile(in3120.PostingList),
+                     inspect.getfile(in3120.VariableByteCodec)}
+        size_uncompressed = sum(statistic.size_diff for statistic in snapshot_uncompressed.compare_to(snapshot_baseline, "filename")
+                                if statistic.traceback[0].filename in filenames)
+        size_compressed = sum(statistic.size_diff for statistic in snapshot_compressed.compare_to(snapshot_uncompressed, "filename")
+                              if statistic.traceback[0].filename in filenames)
+
+        # Uncompressed postings are stored column-wise, at 8 bytes per posting plus some per-list overhead.
+        postings = sum(index_uncompressed.get_document_frequency(term) for term in index_uncompressed.get_vocabulary())
+        self.assertLess(size_uncompressed / postings, 24)
+        compression_ratio = size_uncompressed / size_compressed
+        self.assertGreater(compression_ratio, 1.5)
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
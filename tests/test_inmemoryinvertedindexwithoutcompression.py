@@ -25,6 +25,14 @@ class TestInMemoryInvertedIndexWithoutCompression(unittest.TestCase):
         self.assertEqual(index.get_document_frequency("prøve"), 1)
         self.assertEqual(index.get_document_frequency("test"), 2)
 
+    def test_postings_arrays(self):
+        corpus = in3120.InMemoryCorpus("../data/mesh.txt")
+        index = in3120.InMemoryInvertedIndex(corpus, ["body"], self._normalizer, self._tokenizer, self._compressed)
+        for term in ["hydrogen", "of", "xyzzy"]:
+            (document_ids, term_frequencies) = index.get_postings_arrays(term)
+            self.assertListEqual(list(zip(document_ids, term_frequencies)),
+                                 [(p.document_id, p.term_frequency) for p in index[term]])
+
     def test_mesh_corpus(self):
         corpus = in3120.InMemoryCorpus("../data/mesh.txt")
         index = in3120.InMemoryInvertedIndex(corpus, ["body"], self._normalizer, self._tokenizer, self._compressed)
@@ -44,6 +52,46 @@ class TestInMemoryInvertedIndexWithoutCompression(unittest.TestCase):
         self.assertEqual(posting.document_id, 0)
         self.assertEqual(posting.term_frequency, 5)
 
+    def test_front_coded_dictionary(self):
+        corpus = in3120.InMemoryCorpus("../data/mesh.txt")
+        original = in3120.InMemoryInvertedIndex(corpus, ["body"], self._normalizer, self._tokenizer, self._compressed)
+        index = in3120.InMemoryInvertedIndex(corpus, ["body"], self._normalizer, self._tokenizer, self._compressed,
+                                             front_coded=True)
+        vocabulary = list(index.get_vocabulary())
+        self.assertListEqual(vocabulary, sorted(original.get_vocabulary(), key=lambda term: term.encode("utf-8")))
+        for term in vocabulary[::50]:
+            self.assertListEqual([(p.document_id, p.term_frequency) for p in index[term]],
+                                 [(p.document_id, p.term_frequency) for p in original[term]])
+        self.assertListEqual(list(index.get_prefix_matches("hydro")), sorted(original.get_prefix_matches("hydro")))
+        self.assertIn("hydrocephalus", list(index.get_prefix_matches("hydro")))
+        self.assertListEqual(list(index.get_prefix_matches("xyzzy")), [])
+
+    def test_parallel_build(self):
+        corpus = in3120.InMemoryCorpus("../data/mesh.txt")
+        serial = in3120.InMemoryInvertedIndex(corpus, ["body"], self._normalizer, self._tokenizer, self._compressed)
+        parallel = in3120.InMemoryInvertedIndex(corpus, ["body"], self._normalizer, self._tokenizer, self._compressed, 4)
+        self.assertListEqual(list(serial.get_vocabulary()), list(parallel.get_vocabulary()))
+        self.assertListEqual(list(serial.get_document_lengths()), list(parallel.get_document_lengths()))
+        for term in serial.get_vocabulary():
+            self.assertEqual(serial.get_document_frequency(term), parallel.get_document_frequency(term))
+            self.assertListEqual([(p.document_id, p.term_frequency) for p in serial[term]],
+                                 [(p.document_id, p.term_frequency) for p in parallel[term]])
+
+    def test_positions(self):
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(0, {"a": "to be or not to be", "b": "be quick"}))
+        corpus.add_document(in3120.InMemoryDocument(1, {"a": "quick", "b": "to"}))
+        index = in3120.InMemoryInvertedIndex(corpus, ["a", "b"], self._normalizer, self._tokenizer, self._compressed,
+                                             positional=True)
+        self.assertListEqual([(p.document_id, p.term_frequency, p.positions) for p in index["be"]], [(0, 3, [1, 5, 7])])
+        self.assertListEqual([(p.document_id, p.positions) for p in index["to"]], [(0, [0, 4]), (1, [2])])
+        self.assertListEqual([(p.document_id, p.positions) for p in index["quick"]], [(0, [8]), (1, [0])])
+        parallel = in3120.InMemoryInvertedIndex(corpus, ["a", "b"], self._normalizer, self._tokenizer, self._compressed,
+                                                2, positional=True)
+        for term in index.get_vocabulary():
+            self.assertListEqual([(p.document_id, p.positions) for p in index[term]],
+                                 [(p.document_id, p.positions) for p in parallel[term]])
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
@@ -36,18 +36,65 @@ class TestInMemoryPostingList(unittest.TestCase):
         self.assertEqual(entries[1].term_frequency, 1)
         self.assertEqual(entries[2].term_frequency, 3)
 
+    def _test_max_term_frequency(self, postings: in3120.PostingList):
+        self.assertEqual(postings.get_max_term_frequency(), 0)
+        for (document_id, term_frequency) in [(1, 3), (2, 7), (5, 1), (8, 7), (13, 2)]:
+            postings.append_posting(in3120.Posting(document_id, term_frequency))
+        postings.finalize_postings()
+        self.assertEqual(postings.get_max_term_frequency(), 7)
+
     def _test_invalid_append(self, postings: in3120.PostingList):
         postings.append_posting(in3120.Posting(21, 2))
         for i in range(0, 2):
             with self.assertRaises(AssertionError):
                 postings.append_posting(in3120.Posting(21 - i, 2))
 
+    def _test_append_and_iterate_positions(self, postings: in3120.PostingList):
+        postings.append_posting(in3120.PositionalPosting(21, [0, 5]))
+        postings.append_posting(in3120.PositionalPosting(42, [300]))
+        postings.append_posting(in3120.PositionalPosting(70, [1, 2, 3, 1000]))
+        postings.finalize_postings()
+        self.assertEqual(postings.get_length(), 3)
+        entries = list(postings)
+        self.assertListEqual([p.document_id for p in entries], [21, 42, 70])
+        self.assertListEqual([p.term_frequency for p in entries], [2, 1, 4])
+        self.assertListEqual([p.positions for p in entries], [[0, 5], [300], [1, 2, 3, 1000]])
+
+    def _test_get_arrays(self, postings: in3120.PostingList):
+        (document_ids, term_frequencies) = postings.get_arrays()
+        self.assertListEqual(list(document_ids), [])
+        self.assertListEqual(list(term_frequencies), [])
+        for (document_id, term_frequency) in [(1, 3), (2, 7), (5, 1)]:
+            postings.append_posting(in3120.Posting(document_id, term_frequency))
+        postings.finalize_postings()
+        (document_ids, term_frequencies) = postings.get_arrays()
+        self.assertEqual(document_ids.typecode, "I")
+        self.assertEqual(term_frequencies.typecode, "I")
+        self.assertListEqual(list(document_ids), [1, 2, 5])
+        self.assertListEqual(list(term_frequencies), [3, 7, 1])
+
     def test_append_and_iterate(self):
         self._test_append_and_iterate(in3120.InMemoryPostingList())
 
     def test_invalid_append(self):
         self._test_invalid_append(in3120.InMemoryPostingList())
 
+    def test_max_term_frequency(self):
+        self._test_max_term_frequency(in3120.InMemoryPostingList())
+
+    def test_append_and_iterate_positions(self):
+        self._test_append_and_iterate_positions(in3120.InMemoryPostingList())
+
+    def test_get_arrays(self):
+        self._test_get_arrays(in3120.InMemoryPostingList())
+
+    def test_compact_postings(self):
+        posting = in3120.Posting(21, 2)
+        self.assertFalse(hasattr(posting, "__dict__"))
+        with self.assertRaises(AttributeError):
+            posting.foo = 42
+        self.assertFalse(hasattr(in3120.InMemoryPostingList(), "__dict__"))
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
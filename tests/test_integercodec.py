@@ -0,0 +1,69 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import random
+import unittest
+from context import in3120
+
+
+class TestIntegerCodec(unittest.TestCase):
+
+    def setUp(self):
+        self._codecs = [in3120.VariableByteCodec, in3120.EliasGammaCodec, in3120.EliasDeltaCodec,
+                        in3120.Simple8bCodec, in3120.PForDeltaCodec]
+
+    def _test_round_trip(self, codec, numbers):
+        data = bytearray(b"\xff\xff")
+        written = codec.encode_many(iter(numbers), data)
+        self.assertEqual(written, len(data) - 2)
+        data.extend(b"\xff")
+        (decoded, consumed) = codec.decode_many(data, len(numbers), 2)
+        self.assertListEqual(list(decoded), numbers)
+        self.assertEqual(consumed, written)
+
+    def test_round_trip(self):
+        rng = random.Random(1234)
+        inputs = [[], [0], [1], [0] * 300, [2 ** 32 - 1], list(range(1000)),
+                  [21, 4, 70, 0, 127, 128, 512, 999, 214577, 134217728],
+                  [rng.randint(0, 10) for _ in range(500)],
+                  [rng.choice([1, 2, 3, 100000]) for _ in range(333)],
+                  [rng.randint(0, 2 ** 31) for _ in range(200)]]
+        for codec in self._codecs:
+            for numbers in inputs:
+                self._test_round_trip(codec, numbers)
+
+    def test_consecutive_sequences(self):
+        for codec in self._codecs:
+            data = bytearray()
+            written1 = codec.encode_many([5, 6, 7], data)
+            written2 = codec.encode_many([8, 0, 900], data)
+            self.assertEqual(len(data), written1 + written2)
+            self.assertListEqual(list(codec.decode_many(data, 3)[0]), [5, 6, 7])
+            self.assertListEqual(list(codec.decode_many(data, 3, written1)[0]), [8, 0, 900])
+
+    def test_known_sizes(self):
+        # Elias-gamma codes 1, 2, 3 (i.e., 0, 1, 2 + 1) as 1, 010, 011, i.e., 7 bits. Plus the length byte.
+        data = bytearray()
+        self.assertEqual(in3120.EliasGammaCodec.encode_many([0, 1, 2], data), 2)
+        self.assertEqual(data[1], 0b10100110)
+        # Sixty small numbers fit in a single Simple-8b word.
+        self.assertEqual(in3120.Simple8bCodec.encode_many([1] * 60, bytearray()), 8)
+        # Runs of zeros are very compact with Simple-8b.
+        self.assertEqual(in3120.Simple8bCodec.encode_many([0] * 240, bytearray()), 8)
+
+    def test_pfordelta_exceptions(self):
+        # A few outliers should not blow up the bit width of the whole block.
+        numbers = [3] * 127 + [1000000]
+        data = bytearray()
+        written = in3120.PForDeltaCodec.encode_many(numbers, data)
+        self.assertLess(written, 40)
+        self.assertListEqual(list(in3120.PForDeltaCodec.decode_many(data, len(numbers))[0]), numbers)
+
+    def test_invalid_input(self):
+        for codec in self._codecs:
+            with self.assertRaises(AssertionError):
+                codec.encode_many([1, -1], bytearray())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
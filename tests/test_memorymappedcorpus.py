@@ -0,0 +1,87 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from context import in3120
+
+
+class TestMemoryMappedCorpus(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self._filename = os.path.join(self._directory.name, "corpus.bin")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def __assert_same_documents(self, expected: in3120.Corpus, block_size: int):
+        in3120.MemoryMappedCorpus.write(self._filename, expected, block_size)
+        corpus = in3120.MemoryMappedCorpus(self._filename)
+        self.assertEqual(corpus.size(), expected.size())
+        self.assertListEqual([d.to_dict() for d in corpus], [d.to_dict() for d in expected])
+        for document_id in reversed(range(corpus.size())):
+            self.assertDictEqual(corpus[document_id].to_dict(), expected[document_id].to_dict())
+
+    def test_load_from_file(self):
+        for filename in ["mesh.txt", "cran.xml", "docs.json", "imdb.csv", "pantheon.tsv"]:
+            self.__assert_same_documents(in3120.InMemoryCorpus("../data/" + filename), 64)
+
+    def test_block_sizes(self):
+        corpus = in3120.InMemoryCorpus()
+        for i in range(10):
+            corpus.add_document(in3120.InMemoryDocument(i, {"body": f"dokument nummer {i} æøå", "rank": i / 2}))
+        for block_size in [1, 3, 10, 100]:
+            self.__assert_same_documents(corpus, block_size)
+
+    def test_empty_corpus(self):
+        self.__assert_same_documents(in3120.InMemoryCorpus(), 16)
+
+    def test_compresses(self):
+        filename = "../data/cran.xml"
+        in3120.MemoryMappedCorpus.write(self._filename, in3120.InMemoryCorpus(filename))
+        self.assertLess(os.path.getsize(self._filename), os.path.getsize(filename) // 2)
+
+    def test_block_cache(self):
+        in3120.MemoryMappedCorpus.write(self._filename, in3120.InMemoryCorpus("../data/cran.xml"), 10)
+        corpus = in3120.MemoryMappedCorpus(self._filename, 2)
+        self.assertEqual(corpus.get_cached_block_count(), 0)
+        self.assertListEqual([d.document_id for d in corpus][:3], [0, 1, 2])
+        self.assertEqual(corpus.get_cached_block_count(), 0)
+        document = corpus[5]
+        document.set_field("body", "changed")
+        self.assertNotEqual(corpus[5]["body"], "changed")
+        self.assertEqual(corpus.get_cached_block_count(), 1)
+        for document_id in [15, 25, 9, 35]:
+            self.assertEqual(corpus[document_id].document_id, document_id)
+            self.assertLessEqual(corpus.get_cached_block_count(), 2)
+
+    def test_unsupported_format(self):
+        with self.assertRaises(IOError):
+            in3120.MemoryMappedCorpus("../data/cran.xml")
+
+    def test_close(self):
+        in3120.MemoryMappedCorpus.write(self._filename, in3120.InMemoryCorpus("../data/mesh.txt"))
+        with in3120.MemoryMappedCorpus(self._filename) as corpus:
+            document = corpus[0]
+        self.assertTrue(document.get_field("body", ""))
+        with self.assertRaises(ValueError):
+            corpus.get_document(1)
+
+    def test_serve_search_results(self):
+        in3120.MemoryMappedCorpus.write(self._filename, in3120.InMemoryCorpus("../data/cran.xml"), 32)
+        corpus = in3120.MemoryMappedCorpus(self._filename)
+        normalizer = in3120.SimpleNormalizer()
+        tokenizer = in3120.SimpleTokenizer()
+        index = in3120.InMemoryInvertedIndex(corpus, ["body"], normalizer, tokenizer)
+        engine = in3120.SimpleSearchEngine(corpus, index)
+        ranker = in3120.SimpleRanker()
+        hits = list(engine.evaluate("supersonic flow", {"match_threshold": 1.0, "hit_count": 5}, ranker))
+        self.assertEqual(len(hits), 5)
+        for hit in hits:
+            self.assertIn("supersonic", hit["document"]["body"])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
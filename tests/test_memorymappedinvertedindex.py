@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from context import in3120
+
+
+class TestMemoryMappedInvertedIndex(unittest.TestCase):
+
+    def setUp(self):
+        self._normalizer = in3120.SimpleNormalizer()
+        self._tokenizer = in3120.SimpleTokenizer()
+        self._directory = tempfile.TemporaryDirectory()
+        self._filename = os.path.join(self._directory.name, "index.bin")
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def _write_and_open(self, corpus: in3120.Corpus, fields) -> in3120.MemoryMappedInvertedIndex:
+        index = in3120.InMemoryInvertedIndex(corpus, fields, self._normalizer, self._tokenizer)
+        in3120.MemoryMappedInvertedIndex.write(self._filename, index)
+        return in3120.MemoryMappedInvertedIndex(self._filename, self._normalizer, self._tokenizer)
+
+    def test_access_postings(self):
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(0, {"body": "this is a Test"}))
+        corpus.add_document(in3120.InMemoryDocument(1, {"body": "test TEST prØve"}))
+        index = self._write_and_open(corpus, ["body"])
+        self.assertListEqual(list(index.get_terms("PRøvE wtf tesT")), ["prøve", "wtf", "test"])
+        self.assertListEqual([(p.document_id, p.term_frequency) for p in index["prøve"]], [(1, 1)])
+        self.assertListEqual([(p.document_id, p.term_frequency) for p in index.get_postings_iterator("wtf")], [])
+        self.assertListEqual([(p.document_id, p.term_frequency) for p in index["test"]], [(0, 1), (1, 2)])
+        self.assertEqual(index.get_document_frequency("wtf"), 0)
+        self.assertEqual(index.get_document_frequency("prøve"), 1)
+        self.assertEqual(index.get_document_frequency("test"), 2)
+        self.assertListEqual(list(index.get_vocabulary()), ["a", "is", "prøve", "test", "this"])
+        self.assertIn("this", index)
+        self.assertNotIn("that", index)
+
+    def test_empty_corpus(self):
+        index = self._write_and_open(in3120.InMemoryCorpus(), ["body"])
+        self.assertListEqual(list(index.get_vocabulary()), [])
+        self.assertListEqual(list(index["foo"]), [])
+        self.assertEqual(index.get_document_frequency("foo"), 0)
+
+    def test_mesh_corpus(self):
+        corpus = in3120.InMemoryCorpus("../data/mesh.txt")
+        original = in3120.InMemoryInvertedIndex(corpus, ["body"], self._normalizer, self._tokenizer)
+        in3120.MemoryMappedInvertedIndex.write(self._filename, original)
+        index = in3120.MemoryMappedInvertedIndex(self._filename, self._normalizer, self._tokenizer)
+        self.assertEqual(len(list(index["hydrogen"])), 8)
+        self.assertEqual(len(list(index["hydrocephalus"])), 2)
+        for term in original.get_vocabulary():
+            self.assertEqual(index.get_document_frequency(term), original.get_document_frequency(term))
+            self.assertListEqual([(p.document_id, p.term_frequency) for p in index[term]],
+                                 [(p.document_id, p.term_frequency) for p in original[term]])
+
+    def test_document_lengths(self):
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(0, {"title": "foo", "body": "foo bar baz"}))
+        corpus.add_document(in3120.InMemoryDocument(1, {"title": "a b", "body": ""}))
+        corpus.add_document(in3120.InMemoryDocument(2, {"body": "foo " * 300}))
+        original = in3120.InMemoryInvertedIndex(corpus, ["title", "body"], self._normalizer, self._tokenizer)
+        with self._write_and_open(corpus, ["title", "body"]) as index:
+            self.assertListEqual(list(index.get_document_lengths()), [4, 2, 300])
+            for field in ["title", "body"]:
+                self.assertListEqual(list(index.get_document_lengths(field)),
+                                     list(original.get_document_lengths(field)))
+        with self._write_and_open(in3120.InMemoryCorpus(), ["body"]) as index:
+            self.assertListEqual(list(index.get_document_lengths()), [])
+
+    def test_bm25_ranker(self):
+        corpus = in3120.InMemoryCorpus("../data/mesh.txt")
+        original = in3120.InMemoryInvertedIndex(corpus, ["body"], self._normalizer, self._tokenizer)
+        in3120.MemoryMappedInvertedIndex.write(self._filename, original)
+        with in3120.MemoryMappedInvertedIndex(self._filename, self._normalizer, self._tokenizer) as index:
+            options = {"match_threshold": 0.5, "hit_count": 10}
+            for query in ["water pollution", "hiv protein virus disease"]:
+                expected = [(m["score"], m["document"].document_id) for m in in3120.SimpleSearchEngine(
+                    corpus, original).evaluate(query, options, in3120.BM25Ranker(corpus, original))]
+                actual = [(m["score"], m["document"].document_id) for m in in3120.SimpleSearchEngine(
+                    corpus, index).evaluate(query, options, in3120.BM25Ranker(corpus, index))]
+                self.assertListEqual(actual, expected)
+
+    def test_close(self):
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(0, {"body": "this is a test"}))
+        with self._write_and_open(corpus, ["body"]) as index:
+            self.assertListEqual([p.document_id for p in index["test"]], [0])
+        with self.assertRaises(ValueError):
+            index.get_document_frequency("test")
+
+    def test_invalid_file(self):
+        with open(self._filename, mode="wb") as file:
+            file.write(b"\0" * 64)
+        with self.assertRaises(IOError):
+            in3120.MemoryMappedInvertedIndex(self._filename, self._normalizer, self._tokenizer)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
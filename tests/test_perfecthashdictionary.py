@@ -0,0 +1,69 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from context import in3120
+
+
+class TestPerfectHashDictionary(unittest.TestCase):
+
+    def test_access_vocabulary(self):
+        vocabulary = in3120.PerfectHashDictionary(["foo", "bar", "foo"])
+        self.assertEqual(len(vocabulary), 2)
+        self.assertEqual(vocabulary.size(), 2)
+        self.assertSetEqual({vocabulary.get_term_id("foo"), vocabulary.get_term_id("bar")}, {0, 1})
+        self.assertEqual(vocabulary["foo"], vocabulary.get_term_id("foo"))
+        self.assertEqual(vocabulary.add_if_absent("foo"), vocabulary.get_term_id("foo"))
+        self.assertIn("bar", vocabulary)
+        self.assertNotIn("wtf", vocabulary)
+        self.assertIsNone(vocabulary.get_term_id("wtf"))
+        self.assertListEqual(sorted(vocabulary), sorted([("foo", vocabulary["foo"]), ("bar", vocabulary["bar"])]))
+        with self.assertRaisesRegex(TypeError, "read-only"):
+            vocabulary.add_if_absent("wtf")
+
+    def test_minimal_perfect_hash(self):
+        corpus = in3120.InMemoryCorpus("../data/mesh.txt")
+        index = in3120.InMemoryInvertedIndex(corpus, ["body"], in3120.SimpleNormalizer(), in3120.SimpleTokenizer())
+        terms = list(index.get_vocabulary())
+        for bucket_size in [1, 4]:
+            vocabulary = in3120.PerfectHashDictionary(terms, bucket_size)
+            self.assertEqual(len(vocabulary), len(terms))
+            self.assertListEqual(sorted(vocabulary.get_term_id(term) for term in terms), list(range(len(terms))))
+            self.assertListEqual(sorted(vocabulary), sorted((term, vocabulary[term]) for term in terms))
+            false_positives = sum(1 for term in terms if vocabulary.get_term_id(term + "#") is not None)
+            self.assertLess(false_positives, 5)
+
+    def test_empty_dictionary(self):
+        vocabulary = in3120.PerfectHashDictionary([])
+        self.assertEqual(len(vocabulary), 0)
+        self.assertIsNone(vocabulary.get_term_id("foo"))
+        self.assertListEqual(list(vocabulary), [])
+
+    def test_write_and_read(self):
+        terms = ["foo", "bar", "baz", "æøå", "a", "hello", "world"]
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "dictionary.bin")
+            original = in3120.PerfectHashDictionary(terms)
+            original.write(filename)
+            vocabulary = in3120.PerfectHashDictionary.read(filename)
+            self.assertEqual(len(vocabulary), len(terms))
+            for term in terms:
+                self.assertEqual(vocabulary.get_term_id(term), original.get_term_id(term))
+            self.assertIsNone(vocabulary.get_term_id("wtf"))
+            self.assertListEqual(list(vocabulary), list(original))
+            self.assertLess(os.path.getsize(filename), 32 + 4 * len(terms) + sum(len(t.encode()) + 1 for t in terms))
+            del vocabulary
+
+    def test_invalid_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "dictionary.bin")
+            with open(filename, mode="wb") as file:
+                file.write(b"\0" * 64)
+            with self.assertRaises(IOError):
+                in3120.PerfectHashDictionary.read(filename)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
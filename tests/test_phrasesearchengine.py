@@ -0,0 +1,68 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+from context import in3120
+
+
+class TestPhraseSearchEngine(unittest.TestCase):
+
+    def setUp(self):
+        self._normalizer = in3120.SimpleNormalizer()
+        self._tokenizer = in3120.SimpleTokenizer()
+
+    def _process_query(self, engine, query):
+        options = {"debug": False, "hit_count": 5}
+        return [(match["document"].document_id, match["score"]) for match in engine.evaluate(query, options)]
+
+    def test_phrases_and_proximity(self):
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(0, {"a": "to be or not to be", "b": "that is"}))
+        corpus.add_document(in3120.InMemoryDocument(1, {"a": "not to be outdone", "b": "be or not"}))
+        corpus.add_document(in3120.InMemoryDocument(2, {"a": "the question", "b": "is that"}))
+        for compressed in [False, True]:
+            index = in3120.InMemoryInvertedIndex(corpus, ["a", "b"], self._normalizer, self._tokenizer, compressed,
+                                                 positional=True)
+            engine = in3120.PhraseSearchEngine(corpus, index)
+            self.assertListEqual(self._process_query(engine, '"to be"'), [(0, 2), (1, 1)])
+            self.assertListEqual(self._process_query(engine, "TO BE or not"), [(0, 1)])
+            self.assertListEqual(self._process_query(engine, "be or not"), [(1, 1), (0, 1)])
+            self.assertListEqual(self._process_query(engine, "not"), [(1, 2), (0, 1)])
+            self.assertListEqual(self._process_query(engine, "be that"), [])  # Phrases don't span fields.
+            self.assertListEqual(self._process_query(engine, "that is"), [(0, 1)])
+            self.assertListEqual(self._process_query(engine, "is NEAR/1 that"), [(2, 1), (0, 1)])
+            self.assertListEqual(self._process_query(engine, "outdone NEAR/2 to"), [(1, 1)])
+            self.assertListEqual(self._process_query(engine, "outdone NEAR/1 to"), [])
+            self.assertListEqual(self._process_query(engine, '"not to" NEAR/3 "or not"'), [(0, 1)])
+            self.assertListEqual(self._process_query(engine, "question NEAR/5 is NEAR/1 that"), [(2, 1)])
+            self.assertListEqual(self._process_query(engine, "be NEAR/0 be"), [])
+            self.assertListEqual(self._process_query(engine, "foo bar"), [])
+            self.assertListEqual(self._process_query(engine, ""), [])
+
+    def test_cran_corpus(self):
+        corpus = in3120.InMemoryCorpus("../data/cran.xml")
+        index = in3120.InMemoryInvertedIndex(corpus, ["body"], self._normalizer, self._tokenizer, True,
+                                             positional=True)
+        engine = in3120.PhraseSearchEngine(corpus, index)
+        matches = self._process_query(engine, "boundary layer")
+        self.assertIn(matches[0][0], [23, 271, 1224])
+        self.assertEqual(matches[0][1], 9)
+
+        # Compare against a brute force scan over the document texts.
+        for query in ["approximate solution", "of the", "at high mach numbers"]:
+            phrase = list(index.get_terms(query))
+            expected = {}
+            for document in corpus:
+                terms = list(index.get_terms(document.get_field("body", "")))
+                count = sum(terms[i:(i + len(phrase))] == phrase for i in range(len(terms)))
+                if count:
+                    expected[document.document_id] = count
+            options = {"debug": False, "hit_count": 100}
+            matches = list(engine.evaluate(query, options))
+            self.assertEqual(len(matches), min(100, len(expected)))
+            for match in matches:
+                self.assertEqual(match["score"], expected[match["document"].document_id])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
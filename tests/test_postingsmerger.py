@@ -55,6 +55,23 @@ class TestPostingsMerger(unittest.TestCase):
         self.assertIsInstance(result2, types.GeneratorType,
                               "Are you using yield?")
 
+    def test_positional_intersection(self):
+        postings1 = [in3120.PositionalPosting(1, [0, 7]), in3120.PositionalPosting(2, [3, 9, 20]),
+                     in3120.PositionalPosting(4, [5])]
+        postings2 = [in3120.PositionalPosting(2, [1, 4, 10, 18]), in3120.PositionalPosting(3, [1]),
+                     in3120.PositionalPosting(4, [5, 9])]
+        result = list(self._merger.positional_intersection(iter(postings1), iter(postings2), 1))
+        self.assertListEqual([(p.document_id, p.positions, p.term_frequency) for p in result], [(2, [4, 10], 2)])
+        result = list(self._merger.positional_intersection(iter(postings1), iter(postings2), 4))
+        self.assertListEqual([(p.document_id, p.positions) for p in result], [(2, [4, 10]), (4, [9])])
+        result = list(self._merger.positional_intersection(iter(postings1), iter(postings2), 2, False))
+        self.assertListEqual([(p.document_id, p.positions) for p in result], [(2, [1, 4, 10, 18])])
+        result = list(self._merger.positional_intersection(iter(postings2), iter(postings1), 2, False))
+        self.assertListEqual([(p.document_id, p.positions) for p in result], [(2, [3, 9, 20])])
+        self.assertListEqual(list(self._merger.positional_intersection(iter([]), iter(postings2), 1)), [])
+        with self.assertRaises(AssertionError):
+            list(self._merger.positional_intersection(iter(postings1), iter(postings2), 0))
+
     def _process_query_with_two_terms(self, corpus, index, query, operator, expected):
         terms = list(index.get_terms(query))
         postings = [index[terms[i]] for i in range(len(terms))]
@@ -0,0 +1,160 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+from typing import Any, Dict, Iterator, List
+from context import in3120
+
+
+class TestResultCache(unittest.TestCase):
+
+    class CountingEngine:
+        def __init__(self):
+            self.queries: List[str] = []
+
+        def evaluate(self, query: str, options: dict, *args: Any) -> Iterator[Dict[str, Any]]:
+            self.queries.append(query)
+            yield {"score": len(self.queries), "query": query}
+
+    class Clock:
+        def __init__(self):
+            self.now = 0.0
+
+        def __call__(self) -> float:
+            return self.now
+
+    def setUp(self):
+        self.__engine = __class__.CountingEngine()
+
+    def __evaluate(self, cache: in3120.ResultCache, query: str, options: dict = None) -> List[Dict[str, Any]]:
+        return list(cache.evaluate(query, options or {}))
+
+    def test_repeated_queries_are_cached(self):
+        cache = in3120.ResultCache(self.__engine)
+        first = self.__evaluate(cache, "foo")
+        self.assertListEqual(self.__evaluate(cache, "foo"), first)
+        self.__evaluate(cache, "bar")
+        self.__evaluate(cache, "foo", {"hit_count": 5})
+        self.__evaluate(cache, "foo", {"hit_count": 5})
+        self.assertListEqual(self.__engine.queries, ["foo", "bar", "foo"])
+        statistics = cache.get_statistics()
+        self.assertEqual(statistics["hits"], 2)
+        self.assertEqual(statistics["misses"], 3)
+        self.assertEqual(statistics["size"], 3)
+        self.assertAlmostEqual(statistics["hit_rate"], 0.4)
+
+    def test_normalized_keys(self):
+        cache = in3120.ResultCache(self.__engine, normalizer=in3120.SimpleNormalizer(),
+                                   tokenizer=in3120.SimpleTokenizer())
+        for query in ["Foo  bar", "foo bar", "FOO BAR!", "bar foo"]:
+            self.__evaluate(cache, query)
+        self.assertListEqual(self.__engine.queries, ["Foo  bar", "bar foo"])
+
+    def test_lru_eviction(self):
+        cache = in3120.ResultCache(self.__engine, capacity=2, policy="lru")
+        for query in ["a", "b", "a", "c", "b", "a"]:
+            self.__evaluate(cache, query)
+        self.assertListEqual(self.__engine.queries, ["a", "b", "c", "b", "a"])
+        self.assertEqual(cache.get_statistics()["evictions"], 3)
+        self.assertEqual(len(cache), 2)
+
+    def test_lfu_eviction(self):
+        cache = in3120.ResultCache(self.__engine, capacity=2, policy="lfu")
+        for query in ["a", "a", "a", "b", "c", "b", "a", "d", "c"]:
+            self.__evaluate(cache, query)
+        self.assertListEqual(self.__engine.queries, ["a", "b", "c", "b", "d", "c"])
+        self.assertEqual(cache.get_statistics()["evictions"], 4)
+        self.assertEqual(len(cache), 2)
+
+    def test_ttl(self):
+        clock = __class__.Clock()
+        cache = in3120.ResultCache(self.__engine, ttl=10.0, clock=clock)
+        self.__evaluate(cache, "foo")
+        clock.now = 9.0
+        self.__evaluate(cache, "foo")
+        clock.now = 10.0
+        self.__evaluate(cache, "foo")
+        self.__evaluate(cache, "foo")
+        self.assertListEqual(self.__engine.queries, ["foo", "foo"])
+        self.assertEqual(cache.get_statistics()["expirations"], 1)
+
+    def test_explicit_invalidation(self):
+        cache = in3120.ResultCache(self.__engine)
+        self.__evaluate(cache, "foo")
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+        self.__evaluate(cache, "foo")
+        self.assertListEqual(self.__engine.queries, ["foo", "foo"])
+        self.assertEqual(cache.get_statistics()["invalidations"], 1)
+
+    def test_invalidation_on_index_change(self):
+        normalizer = in3120.SimpleNormalizer()
+        tokenizer = in3120.SimpleTokenizer()
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(0, {"body": "foo bar"}))
+        index = in3120.UpdatableInMemoryInvertedIndex(corpus, ["body"], normalizer, tokenizer)
+        self.addCleanup(index.close)
+        engine = in3120.SimpleSearchEngine(corpus, index)
+        ranker = in3120.SimpleRanker()
+        cache = in3120.ResultCache(engine, inverted_index=index)
+        options = {"match_threshold": 1.0, "hit_count": 10}
+        self.assertListEqual([m["document"].document_id for m in cache.evaluate("foo", options, ranker)], [0])
+        self.assertListEqual([m["document"].document_id for m in cache.evaluate("foo", options, ranker)], [0])
+        self.assertEqual(cache.get_statistics()["hits"], 1)
+        document = in3120.InMemoryDocument(1, {"body": "foo"})
+        corpus.add_document(document)
+        index.add_document(document)
+        self.assertSetEqual({m["document"].document_id for m in cache.evaluate("foo", options, ranker)}, {0, 1})
+        self.assertEqual(cache.get_statistics()["invalidations"], 1)
+        index.delete_document(0)
+        self.assertListEqual([m["document"].document_id for m in cache.evaluate("foo", options, ranker)], [1])
+        self.assertEqual(cache.get_statistics()["hits"], 1)
+
+    def test_no_caching_if_index_changes_during_evaluation(self):
+        class ChangingIndex:
+            def __init__(self):
+                self.generation = 0
+
+            def get_generation(self) -> int:
+                return self.generation
+
+        class ChangingEngine:
+            def __init__(self, index: ChangingIndex):
+                self.index = index
+
+            def evaluate(self, query: str, options: dict) -> Iterator[Dict[str, Any]]:
+                self.index.generation += 1
+                yield {"score": self.index.generation, "query": query}
+
+        index = ChangingIndex()
+        cache = in3120.ResultCache(ChangingEngine(index), inverted_index=index)
+        self.assertListEqual(self.__evaluate(cache, "foo"), [{"score": 1, "query": "foo"}])
+        self.assertEqual(len(cache), 0)
+        self.assertListEqual(self.__evaluate(cache, "foo"), [{"score": 2, "query": "foo"}])
+        self.assertEqual(len(cache), 0)
+
+    def test_wraps_other_engines(self):
+        normalizer = in3120.SimpleNormalizer()
+        tokenizer = in3120.SimpleTokenizer()
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(0, {"body": "water pollution"}))
+        corpus.add_document(in3120.InMemoryDocument(1, {"body": "air pollution"}))
+        index = in3120.InMemoryInvertedIndex(corpus, ["body"], normalizer, tokenizer, positional=True)
+        engine = in3120.PhraseSearchEngine(corpus, index)
+        cache = in3120.ResultCache(engine, capacity=10, policy="lfu", normalizer=normalizer, tokenizer=tokenizer)
+        expected = [m["document"].document_id for m in engine.evaluate("air pollution", {})]
+        for query in ["air pollution", "AIR  Pollution"]:
+            self.assertListEqual([m["document"].document_id for m in cache.evaluate(query, {})], expected)
+        self.assertEqual(cache.get_statistics()["hits"], 1)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(AssertionError):
+            in3120.ResultCache(self.__engine, capacity=0)
+        with self.assertRaises(AssertionError):
+            in3120.ResultCache(self.__engine, policy="fifo")
+        with self.assertRaises(AssertionError):
+            in3120.ResultCache(self.__engine, normalizer=in3120.SimpleNormalizer())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
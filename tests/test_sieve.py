@@ -21,6 +21,18 @@ class TestSieve(unittest.TestCase):
         sieve.sift(4.0, "four")
         self.assertListEqual(list(sieve.winners()), [(10.0, "ten"), (9.0, "nine"), (8.0, "eight")])
 
+    def test_threshold(self):
+        sieve = in3120.Sieve(2)
+        self.assertIsNone(sieve.threshold())
+        sieve.sift(5.0, "five")
+        self.assertIsNone(sieve.threshold())
+        sieve.sift(3.0, "three")
+        self.assertEqual(sieve.threshold(), 3.0)
+        sieve.sift(4.0, "four")
+        self.assertEqual(sieve.threshold(), 4.0)
+        sieve.sift(1.0, "one")
+        self.assertEqual(sieve.threshold(), 4.0)
+
     def test_invalid_size(self):
         for i in [-1, 0]:
             with self.assertRaises(AssertionError):
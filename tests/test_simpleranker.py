@@ -20,6 +20,16 @@ class TestSimpleRanker(unittest.TestCase):
         self.__ranker.update("baz", 2, in3120.Posting(42, 2))
         self.assertEqual(self.__ranker.evaluate(), 5)
 
+    def test_upper_bound(self):
+        self.assertEqual(self.__ranker.get_upper_bound("foo", 2, 4), 8)
+        self.assertEqual(self.__ranker.get_static_upper_bound(), 0.0)
+
+    def test_contributions(self):
+        import numpy as np
+        contributions = self.__ranker.get_contributions("foo", 2, np.array([1, 5, 7]), np.array([4, 1, 2]))
+        self.assertListEqual(list(contributions), [8.0, 2.0, 4.0])
+        self.assertListEqual(list(self.__ranker.get_static_contributions(np.array([1, 5]))), [0.0, 0.0])
+
     def test_document_id_mismatch(self):
         self.__ranker.reset(21)
         with self.assertRaises(AssertionError):
@@ -1,6 +1,7 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import itertools
 import unittest
 from context import in3120
 
@@ -221,6 +222,153 @@ class TestSimpleSearchEngine(unittest.TestCase):
         # Strict.
         self.assertTrue(history == ordering1 or history == ordering2)
 
+    def test_skips_yield_same_results(self):
+        corpus = in3120.InMemoryCorpus("../data/mesh.txt")
+        index1 = in3120.InMemoryInvertedIndex(corpus, ["body"], self.__normalizer, self.__tokenizer)
+        index2 = in3120.InMemoryInvertedIndex(corpus, ["body"], self.__normalizer, self.__tokenizer, True, skips=True)
+        engine1 = in3120.SimpleSearchEngine(corpus, index1)
+        engine2 = in3120.SimpleSearchEngine(corpus, index2)
+        ranker = in3120.SimpleRanker()
+        for query in ["water pollution", "acid of the", "hiv protein virus disease", "a b c d e"]:
+            for threshold in [0.1, 0.5, 0.7, 1.0]:
+                options = {"match_threshold": threshold, "hit_count": 1000}
+                matches1 = [(m["score"], m["document"].document_id) for m in engine1.evaluate(query, options, ranker)]
+                matches2 = [(m["score"], m["document"].document_id) for m in engine2.evaluate(query, options, ranker)]
+                self.assertListEqual(sorted(matches1), sorted(matches2))
+
+    def test_long_queries(self):
+        from collections import Counter
+        corpus = in3120.InMemoryCorpus("../data/cran.xml")
+        index1 = in3120.InMemoryInvertedIndex(corpus, ["body"], self.__normalizer, self.__tokenizer)
+        index2 = in3120.InMemoryInvertedIndex(corpus, ["body"], self.__normalizer, self.__tokenizer, True, skips=True)
+        documents = [Counter(index1.get_terms(d.get_field("body", ""))) for d in corpus]
+        ranker = in3120.SimpleRanker()
+        for document_id in [1, 500, 1000]:
+            query = " ".join(list(documents[document_id])[:40])
+            terms = Counter(index1.get_terms(query))
+            for threshold in [0.1, 0.3, 0.6]:
+                n = max(1, min(len(terms), int(threshold * len(terms))))
+                expected = []
+                for counts in documents:
+                    if sum(1 for t in terms if t in counts) >= n:
+                        expected.append(float(sum(m * counts[t] for (t, m) in terms.items())))
+                expected = sorted(expected, reverse=True)[:20]
+                options = {"match_threshold": threshold, "hit_count": 20}
+                for index in [index1, index2]:
+                    engine = in3120.SimpleSearchEngine(corpus, index)
+                    matches = [m["score"] for m in engine.evaluate(query, options, ranker)]
+                    self.assertListEqual(matches, expected)
+
+    def test_term_at_a_time(self):
+        corpus = in3120.InMemoryCorpus("../data/mesh.txt")
+        index1 = in3120.InMemoryInvertedIndex(corpus, ["body"], self.__normalizer, self.__tokenizer)
+        index2 = in3120.InMemoryInvertedIndex(corpus, ["body"], self.__normalizer, self.__tokenizer, True, skips=True)
+        rankers = [in3120.SimpleRanker(), in3120.BetterRanker(corpus, index1), in3120.BM25Ranker(corpus, index1)]
+        for (index, ranker) in itertools.product([index1, index2], rankers):
+            engine = in3120.SimpleSearchEngine(corpus, index)
+            for query in ["water pollution", "acid of the acid", "hiv protein virus disease", "a b c d e", "xyzzy"]:
+                for threshold in [0.1, 0.5, 1.0]:
+                    options = {"match_threshold": threshold, "hit_count": 10}
+                    expected = [m["score"] for m in engine.evaluate(query, options, ranker)]
+                    options["traversal"] = "taat"
+                    matches = list(engine.evaluate(query, options, ranker))
+                    self.assertEqual(len(matches), len(expected))
+                    for (match, score) in zip(matches, expected):
+                        self.assertAlmostEqual(match["score"], score, delta=1e-5 * max(1.0, score))
+                        self.assertIsInstance(match["document"], in3120.Document)
+
+        # Rankers need to opt in.
+        class DocumentAtATimeRanker(in3120.Ranker):
+            def reset(self, document_id: int) -> None:
+                pass
+
+            def update(self, term: str, multiplicity: int, posting: in3120.Posting) -> None:
+                pass
+
+            def evaluate(self) -> float:
+                return 0.0
+
+        options = {"match_threshold": 0.5, "hit_count": 10, "traversal": "taat"}
+        with self.assertRaises(NotImplementedError):
+            list(engine.evaluate("water", options, DocumentAtATimeRanker()))
+
+    def test_scan_traversal(self):
+        corpus = in3120.InMemoryCorpus("../data/mesh.txt")
+        index1 = in3120.InMemoryInvertedIndex(corpus, ["body"], self.__normalizer, self.__tokenizer)
+        index2 = in3120.InMemoryInvertedIndex(corpus, ["body"], self.__normalizer, self.__tokenizer, True, skips=True)
+        ranker = in3120.SimpleRanker()
+        for index in [index1, index2]:
+            engine = in3120.SimpleSearchEngine(corpus, index)
+            for query in ["water pollution", "acid of the acid", "hiv protein virus disease", "a b c d e", "xyzzy"]:
+                for threshold in [0.1, 0.5, 1.0]:
+                    options = {"match_threshold": threshold, "hit_count": 10}
+                    expected = [(m["score"], m["document"].document_id) for m in engine.evaluate(query, options, ranker)]
+                    options["traversal"] = "scan"
+                    matches = [(m["score"], m["document"].document_id) for m in engine.evaluate(query, options, ranker)]
+                    self.assertListEqual(matches, expected)
+
+    def test_evaluate_batch(self):
+        import functools
+        corpus = in3120.InMemoryCorpus("../data/mesh.txt")
+        index = in3120.InMemoryInvertedIndex(corpus, ["body"], self.__normalizer, self.__tokenizer, True)
+        engine = in3120.SimpleSearchEngine(corpus, index)
+        queries = ["water pollution", "acid of the acid", "POLLUTION water", "hiv protein virus disease", "",
+                   "a b c d e", "xyzzy", "water pollution", "virus", "acid acid of the"]
+        factories = [in3120.SimpleRanker, functools.partial(in3120.BM25Ranker, corpus, index)]
+        for (factory, threshold) in itertools.product(factories, [0.1, 0.5, 1.0]):
+            options = {"match_threshold": threshold, "hit_count": 10}
+            ranker = factory()
+            expected = [[(m["score"], m["document"].document_id) for m in engine.evaluate(query, options, ranker)]
+                        for query in queries]
+            for (workers, chunk_size) in [(1, 256), (2, 1), (3, 4)]:
+                results = list(engine.evaluate_batch(queries, options, factory, workers, chunk_size))
+                self.assertEqual(len(results), len(queries))
+                for (matches, winners) in zip(results, expected):
+                    self.assertEqual(len(matches), len(winners))
+                    for (match, (score, _)) in zip(matches, winners):
+                        self.assertAlmostEqual(match["score"], score, delta=1e-5 * max(1.0, score))
+                        self.assertIsInstance(match["document"], in3120.Document)
+        self.assertListEqual(list(engine.evaluate_batch([], options, in3120.SimpleRanker)), [])
+
+    def test_pruning_yields_same_results(self):
+        class CountingRanker(in3120.BetterRanker):
+            def __init__(self, corpus: in3120.Corpus, inverted_index: in3120.InvertedIndex):
+                super().__init__(corpus, inverted_index)
+                self.count = 0
+
+            def reset(self, document_id: int) -> None:
+                super().reset(document_id)
+                self.count += 1
+
+        corpus = in3120.InMemoryCorpus("../data/mesh.txt")
+        index1 = in3120.InMemoryInvertedIndex(corpus, ["body"], self.__normalizer, self.__tokenizer)
+        index2 = in3120.InMemoryInvertedIndex(corpus, ["body"], self.__normalizer, self.__tokenizer, True, skips=True)
+        rankers = [in3120.SimpleRanker(), in3120.BetterRanker(corpus, index1), in3120.BM25Ranker(corpus, index1)]
+        for (index, ranker) in itertools.product([index1, index2], rankers):
+            engine = in3120.SimpleSearchEngine(corpus, index)
+            for query in ["water pollution", "acid of the acid", "hiv protein virus disease", "a b c d e", "xyzzy"]:
+                for threshold in [0.1, 0.5, 1.0]:
+                    for hit_count in [1, 10, 100]:
+                        options = {"match_threshold": threshold, "hit_count": hit_count}
+                        expected = [(m["score"], m["document"].document_id)
+                                    for m in engine.evaluate(query, options, ranker)]
+                        for pruning in ["wand", "bmw"]:
+                            options["pruning"] = pruning
+                            matches = [(m["score"], m["document"].document_id)
+                                       for m in engine.evaluate(query, options, ranker)]
+                            self.assertListEqual(matches, expected)
+
+        # For OR-like queries, far fewer documents need to be scored.
+        engine = in3120.SimpleSearchEngine(corpus, index2)
+        counts = {}
+        for pruning in [None, "wand", "bmw"]:
+            ranker = CountingRanker(corpus, index2)
+            options = {"match_threshold": 0.1, "hit_count": 10, "pruning": pruning}
+            self.assertEqual(len(list(engine.evaluate("of the disease virus", options, ranker))), 10)
+            counts[pruning] = ranker.count
+        self.assertLess(counts["wand"] * 2, counts[None])
+        self.assertLess(counts["bmw"], counts["wand"])
+
     def test_uses_yield(self):
         import types
         corpus = in3120.InMemoryCorpus()
@@ -0,0 +1,68 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import tempfile
+import unittest
+from typing import Optional
+from context import in3120
+
+
+class TestStreamingCorpus(unittest.TestCase):
+
+    def __assert_same_documents(self, filename: str, pipeline: Optional[in3120.DocumentPipeline] = None):
+        expected = in3120.InMemoryCorpus(filename, pipeline)
+        corpus = in3120.StreamingCorpus(filename, pipeline)
+        self.assertEqual(corpus.size(), expected.size())
+        self.assertListEqual([d.to_dict() for d in corpus], [d.to_dict() for d in expected])
+        step = max(1, corpus.size() // 50)
+        for document_id in reversed(range(0, corpus.size(), step)):
+            self.assertDictEqual(corpus[document_id].to_dict(), expected[document_id].to_dict())
+
+    def test_load_from_file(self):
+        for filename in ["mesh.txt", "cran.xml", "docs.json", "imdb.csv", "pantheon.tsv"]:
+            self.__assert_same_documents("../data/" + filename)
+
+    def _drop_document_if_it_contains_the_in_body(self, document: in3120.Document) -> Optional[in3120.Document]:
+        return None if "the" in document.get_field("body", "") else document
+
+    def test_load_from_file_but_drop_documents_that_contain_the_in_body(self):
+        pipeline = in3120.DocumentPipeline([self._drop_document_if_it_contains_the_in_body])
+        for filename in ["mesh.txt", "cran.xml", "docs.json"]:
+            self.__assert_same_documents("../data/" + filename, pipeline)
+        self.assertEqual(in3120.StreamingCorpus("../data/cran.xml", pipeline).size(), 8)
+
+    def test_tricky_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            contents = {
+                "tricky.xml": "<docs>\n<doc>før <b>bold</b> etter</doc><doc/><doc><![CDATA[skipped]]>kept</doc>\n</docs>",
+                "tricky.csv": "title,body\r\nfoo,\"multi\r\nline\"\r\n\r\nbar,\"æøå, \"\"quoted\"\"\"\r\n",
+                "tricky.txt": "første\tmeta\n\n\nandre\r\ntredje",
+            }
+            for (name, content) in contents.items():
+                filename = os.path.join(directory, name)
+                with open(filename, mode="w", encoding="utf-8", newline="") as file:
+                    file.write(content)
+                self.__assert_same_documents(filename)
+            corpus = in3120.StreamingCorpus(os.path.join(directory, "tricky.xml"))
+            self.assertListEqual([d["body"] for d in corpus], ["før   etter", "", "kept"])
+
+    def test_unsupported_extension(self):
+        with self.assertRaises(IOError):
+            in3120.StreamingCorpus("../data/README.md")
+
+    def test_memory_usage(self):
+        import tracemalloc
+        tracemalloc.start()
+        corpus = in3120.StreamingCorpus("../data/mesh.txt")
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        count = sum(1 for _ in corpus)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+        tracemalloc.stop()
+        self.assertEqual(count, corpus.size())
+        self.assertLess(peak, os.path.getsize("../data/mesh.txt") // 10)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
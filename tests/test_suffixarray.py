@@ -93,6 +93,96 @@ class TestSuffixArray(unittest.TestCase):
         self.__process_query_and_verify_winner(engine1, "z", [], None)
         self.__process_query_and_verify_winner(engine2, "z", [2], 1)
 
+    def test_matches_brute_force(self):
+        import random
+        rng = random.Random(1234)
+        words = ["a", "ab", "aba", "b", "ba", "bab", "abab"]
+        corpus = in3120.InMemoryCorpus()
+        for document_id in range(60):
+            fields = {f: " ".join(rng.choices(words, k=rng.randint(0, 30))) for f in ["x", "y"]}
+            corpus.add_document(in3120.InMemoryDocument(document_id, fields))
+        engine = in3120.SuffixArray(corpus, ["x", "y"], self.__normalizer, self.__tokenizer)
+        queries = ["a", "b", "ab", "a b", "ab a", "aba b", "a ba", "b a b", "abab ab", "bab ba", "c", "a a a a"]
+        for query in queries:
+            expected = {}
+            for document in corpus:
+                for field in ["x", "y"]:
+                    text = document[field]
+                    count = sum(1 for i in range(len(text)) if (i == 0 or text[i - 1] == " ") and text.startswith(query, i))
+                    if count:
+                        expected[document.document_id] = expected.get(document.document_id, 0) + count
+            matches = {m["document"].document_id: m["score"] for m in engine.evaluate(query, {"hit_count": 100})}
+            self.assertDictEqual(matches, expected)
+
+    def test_count(self):
+        corpus = in3120.InMemoryCorpus("../data/cran.xml")
+        engine = in3120.SuffixArray(corpus, ["body"], self.__normalizer, self.__tokenizer)
+        self.assertEqual(engine.count("approximate solution"), 38)
+        self.assertEqual(engine.count("approximate solution"),
+                         sum(m["score"] for m in engine.evaluate("approximate solution", {"hit_count": 100})))
+        self.assertGreater(engine.count("visc"), sum(m["score"] for m in engine.evaluate("visc", {"hit_count": 100})))
+        self.assertEqual(engine.count("zzz"), 0)
+        self.assertEqual(engine.count(""), 0)
+
+    def test_top_documents_in_large_ranges(self):
+        corpus = in3120.InMemoryCorpus()
+        for document_id in range(200):
+            fields = {"a": "ab cd " * (100 + (document_id * 37) % 200)}
+            corpus.add_document(in3120.InMemoryDocument(document_id, fields))
+        engine = in3120.SuffixArray(corpus, ["a"], self.__normalizer, self.__tokenizer)
+        expected = sorted(((100 + (document_id * 37) % 200, document_id) for document_id in range(200)), reverse=True)
+        for query in ["ab", "ab cd a", "c"]:
+            count = sum(c for (c, _) in expected) - (200 if query == "ab cd a" else 0)
+            self.assertEqual(engine.count(query), count)
+            for hit_count in [1, 10, 100]:
+                matches = list(engine.evaluate(query, {"hit_count": hit_count}))
+                self.assertEqual(len(matches), hit_count)
+                scores = [m["score"] for m in matches]
+                self.assertListEqual(scores, sorted(scores, reverse=True))
+                for match in matches:
+                    document_id = match["document"].document_id
+                    self.assertEqual(match["score"], 100 + (document_id * 37) % 200 - (query == "ab cd a"))
+                self.assertEqual(scores[-1], expected[hit_count - 1][0] - (query == "ab cd a"))
+
+    def test_write_and_read(self):
+        import os
+        import tempfile
+        corpus = in3120.InMemoryCorpus("../data/cran.xml")
+        corpus.add_document(in3120.InMemoryDocument(corpus.size(), {"body": "Japanese リンク and Cedilla \u00C7"}))
+        corpus.add_document(in3120.InMemoryDocument(corpus.size(), {"body": ""}))
+        engine = in3120.SuffixArray(corpus, ["body"], self.__normalizer, self.__tokenizer)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "suffixes.bin")
+            engine.write(filename)
+            mapped = in3120.SuffixArray.read(filename, corpus, self.__normalizer, self.__tokenizer)
+            for query in ["visc", "Of  A", "approximate solution", "ﾘﾝｸ", "\u00C7", "", "zzz"]:
+                expected = [(m["document"].document_id, m["score"]) for m in engine.evaluate(query, {"hit_count": 100})]
+                actual = [(m["document"].document_id, m["score"]) for m in mapped.evaluate(query, {"hit_count": 100})]
+                self.assertListEqual(sorted(actual), sorted(expected))
+            self.__process_query_and_verify_winner(mapped, "visc", [328], 11)
+            self.__process_query_and_verify_winner(mapped, "ﾘﾝｸ", [corpus.size() - 2], 1)
+            mapped.close()
+
+    def test_close(self):
+        import os
+        import tempfile
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(0, {"a": "the foo bar"}))
+        engine = in3120.SuffixArray(corpus, ["a"], self.__normalizer, self.__tokenizer)
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "suffixes.bin")
+            engine.write(filename)
+            with engine, in3120.SuffixArray.read(filename, corpus, self.__normalizer, self.__tokenizer) as mapped:
+                self.assertEqual(mapped.count("foo"), 1)
+            with self.assertRaises(ValueError):
+                mapped.count("foo")
+            with self.assertRaises(ValueError):
+                engine.count("foo")
+
+    def test_read_unsupported_format(self):
+        with self.assertRaises(IOError):
+            in3120.SuffixArray.read("../data/cran.xml", in3120.InMemoryCorpus(), self.__normalizer, self.__tokenizer)
+
     def test_uses_yield(self):
         import types
         corpus = in3120.InMemoryCorpus()
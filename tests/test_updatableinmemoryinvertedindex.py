@@ -0,0 +1,116 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+from context import in3120
+
+
+class TestUpdatableInMemoryInvertedIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.__normalizer = in3120.SimpleNormalizer()
+        self.__tokenizer = in3120.SimpleTokenizer()
+
+    def __create_index(self, corpus, **kwargs):
+        index = in3120.UpdatableInMemoryInvertedIndex(corpus, ["body"], self.__normalizer, self.__tokenizer, **kwargs)
+        self.addCleanup(index.close)
+        return index
+
+    @staticmethod
+    def __postings(index, term):
+        return [(p.document_id, p.term_frequency) for p in index[term]]
+
+    def test_initial_corpus(self):
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(0, {"body": "this is a Test"}))
+        corpus.add_document(in3120.InMemoryDocument(1, {"body": "test TEST prØve"}))
+        index = self.__create_index(corpus)
+        self.assertListEqual(list(index.get_terms("PRøvE wtf tesT")), ["prøve", "wtf", "test"])
+        self.assertListEqual(self.__postings(index, "test"), [(0, 1), (1, 2)])
+        self.assertListEqual(self.__postings(index, "wtf"), [])
+        self.assertEqual(index.get_document_frequency("test"), 2)
+        self.assertEqual(index.get_max_term_frequency("test"), 2)
+        self.assertListEqual(list(index.get_document_lengths()), [4, 3])
+        self.assertListEqual(list(index.get_vocabulary()), ["a", "is", "prøve", "test", "this"])
+        self.assertEqual(index.get_segment_count(), 1)
+
+    def test_add_and_delete_documents(self):
+        index = self.__create_index(in3120.InMemoryCorpus(), buffer_size=2)
+        index.add_document(in3120.InMemoryDocument(0, {"body": "foo bar"}))
+        self.assertListEqual(self.__postings(index, "foo"), [(0, 1)])
+        index.add_document(in3120.InMemoryDocument(1, {"body": "foo foo"}))
+        index.add_document(in3120.InMemoryDocument(2, {"body": "bar foo"}))
+        self.assertListEqual(self.__postings(index, "foo"), [(0, 1), (1, 2), (2, 1)])
+        self.assertEqual(index.get_max_term_frequency("foo"), 2)
+        index.delete_document(1)
+        index.delete_document(42)
+        self.assertListEqual(self.__postings(index, "foo"), [(0, 1), (2, 1)])
+        self.assertListEqual(self.__postings(index, "bar"), [(0, 1), (2, 1)])
+        with self.assertRaises(AssertionError):
+            index.add_document(in3120.InMemoryDocument(2, {"body": "foo"}))
+
+    def test_generation_changes_on_updates(self):
+        index = self.__create_index(in3120.InMemoryCorpus(), buffer_size=1, merge_factor=2)
+        generations = [index.get_generation()]
+        index.add_document(in3120.InMemoryDocument(0, {"body": "foo"}))
+        generations.append(index.get_generation())
+        index.delete_document(0)
+        generations.append(index.get_generation())
+        index.delete_document(42)
+        self.assertEqual(index.get_generation(), generations[-1])
+        index.add_document(in3120.InMemoryDocument(1, {"body": "foo"}))
+        index.wait_for_merges()
+        self.assertEqual(index.get_segment_count(), 1)
+        generations.append(index.get_generation())
+        self.assertEqual(len(set(generations)), len(generations))
+
+    def test_snapshot_isolation(self):
+        index = self.__create_index(in3120.InMemoryCorpus(), buffer_size=2)
+        index.add_document(in3120.InMemoryDocument(0, {"body": "foo"}))
+        snapshot = index.snapshot()
+        index.add_document(in3120.InMemoryDocument(1, {"body": "foo bar"}))
+        index.delete_document(0)
+        index.flush()
+        index.wait_for_merges()
+        self.assertListEqual(self.__postings(snapshot, "foo"), [(0, 1)])
+        self.assertListEqual(self.__postings(snapshot, "bar"), [])
+        self.assertEqual(snapshot.get_document_frequency("foo"), 1)
+        self.assertListEqual(self.__postings(index, "foo"), [(1, 1)])
+        self.assertListEqual(self.__postings(index, "bar"), [(1, 1)])
+
+    def test_merges_match_batch_build(self):
+        corpus = in3120.InMemoryCorpus("../data/mesh.txt")
+        for compressed in [False, True]:
+            index = self.__create_index(in3120.InMemoryCorpus(), compressed=compressed, buffer_size=50, merge_factor=3)
+            for document in corpus:
+                index.add_document(document)
+                if document.document_id % 7 == 3:
+                    index.delete_document(document.document_id - 2)
+            index.flush()
+            index.wait_for_merges()
+            self.assertLess(index.get_segment_count(), 3 * 6)
+            original = in3120.InMemoryInvertedIndex(corpus, ["body"], self.__normalizer, self.__tokenizer)
+            self.assertListEqual(list(index.get_document_lengths()), list(original.get_document_lengths()))
+            for term in original.get_vocabulary():
+                expected = [(p.document_id, p.term_frequency) for p in original[term]
+                            if p.document_id % 7 != 1 or p.document_id + 2 >= len(corpus)]
+                self.assertListEqual(self.__postings(index, term), expected)
+                self.assertGreaterEqual(index.get_document_frequency(term), len(expected))
+
+    def test_search_engine_sees_updates(self):
+        corpus = in3120.InMemoryCorpus()
+        corpus.add_document(in3120.InMemoryDocument(0, {"body": "the quick brown fox"}))
+        index = self.__create_index(corpus, buffer_size=1)
+        engine = in3120.SimpleSearchEngine(corpus, index)
+        options = {"match_threshold": 1.0, "hit_count": 10}
+        ranker = in3120.SimpleRanker()
+        self.assertListEqual([h["document"].document_id for h in engine.evaluate("brown fox", options, ranker)], [0])
+        corpus.add_document(in3120.InMemoryDocument(1, {"body": "brown fox brown fox"}))
+        index.add_document(corpus[1])
+        self.assertListEqual([h["document"].document_id for h in engine.evaluate("brown fox", options, ranker)], [1, 0])
+        index.delete_document(1)
+        self.assertListEqual([h["document"].document_id for h in engine.evaluate("brown fox", options, ranker)], [0])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
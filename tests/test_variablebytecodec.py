@@ -31,10 +31,36 @@ class TestVariableByteCodec(unittest.TestCase):
         self.assertEqual(in3120.VariableByteCodec.decode(data, 11), (214577, 3))
         self.assertEqual(in3120.VariableByteCodec.decode(data, 14), (134217728, 4))
 
+    def test_encode_and_decode_many(self):
+        numbers = [21, 4, 70, 0, 127, 128, 512, 999, 214577, 134217728]
+        data1 = bytearray()
+        data2 = bytearray()
+        for number in numbers:
+            in3120.VariableByteCodec.encode(number, data1)
+        self.assertEqual(in3120.VariableByteCodec.encode_many(iter(numbers), data2), 18)
+        self.assertEqual(data1, data2)
+        self.assertEqual(in3120.VariableByteCodec.encode_many([], data2), 0)
+        self.assertEqual(len(data2), 18)
+        (decoded, consumed) = in3120.VariableByteCodec.decode_many(data2, len(numbers))
+        self.assertListEqual(list(decoded), numbers)
+        self.assertEqual(consumed, 18)
+        (decoded, consumed) = in3120.VariableByteCodec.decode_many(data2, 3, 5)
+        self.assertListEqual(list(decoded), [128, 512, 999])
+        self.assertEqual(consumed, 6)
+        (decoded, consumed) = in3120.VariableByteCodec.decode_many(data2, 100, 11)
+        self.assertListEqual(list(decoded), [214577, 134217728])
+        self.assertEqual(consumed, 7)
+        (decoded, consumed) = in3120.VariableByteCodec.decode_many(memoryview(bytes(data2)), 0, 3)
+        self.assertListEqual(list(decoded), [])
+        self.assertEqual(consumed, 0)
+        data2.append(0)  # We can still resize the buffer after decoding.
+
     def test_negative_numbers(self):
         for i in range(1, 5):
             with self.assertRaises(AssertionError):
                 in3120.VariableByteCodec.encode(-i, bytearray())
+            with self.assertRaises(AssertionError):
+                in3120.VariableByteCodec.encode_many([i, -i], bytearray())
 
     def test_illegal_decoding_offsets(self):
         data = bytearray()
@@ -46,12 +72,19 @@ class TestVariableByteCodec(unittest.TestCase):
                 in3120.VariableByteCodec.decode(data, i)
         with self.assertRaises(IndexError):
             in3120.VariableByteCodec.decode(data, 4)
+        for i in range(1, 3):
+            with self.assertRaises(AssertionError):
+                in3120.VariableByteCodec.decode_many(data, 1, i)
 
     def test_missing_buffer(self):
         with self.assertRaises(AssertionError):
             in3120.VariableByteCodec.encode(210470, None)
         with self.assertRaises(AssertionError):
             in3120.VariableByteCodec.decode(None, 0)
+        with self.assertRaises(AssertionError):
+            in3120.VariableByteCodec.encode_many([210470], None)
+        with self.assertRaises(AssertionError):
+            in3120.VariableByteCodec.decode_many(None, 1)
 
 
 if __name__ == '__main__':